@@ -0,0 +1,164 @@
+"""
+Control de admisión para /confirmar_reserva.
+
+Cuando abre una clase muy pedida llegan cientos de reservas a la vez para el
+mismo horario. En la base se serializan igual (el horario se bloquea en cada
+admisión), así que dejarlas pasar todas juntas solo ocupa workers y
+conexiones esperando ese bloqueo. Por cada clase (horario_id, fecha):
+
+- una cubeta de tokens limita el ritmo de admisiones (tasa por segundo con
+  ráfaga inicial),
+- a lo sumo `concurrencia` admisiones corren a la vez,
+- el resto espera en una cola acotada, en orden de llegada, hasta
+  `espera_maxima` segundos; si la cola está llena se rechaza en el acto, y
+  quien espera se va apenas la clase se completa.
+
+Los límites son por proceso. El rechazo rápido de clases completas (sin ir a
+la base) lo hace la ruta con la tabla de ocupación compartida.
+
+SalaEspera es el modo opcional de sala de espera: cada visitante toma un
+turno y los turnos se habilitan a una tasa fija, compartida entre workers.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+COLA_LLENA = 'cola_llena'
+ESPERA_AGOTADA = 'espera_agotada'
+SIN_CUPO = 'sin_cupo'
+
+MAX_CLASES = 1024  # al superarlas se descartan las inactivas
+
+
+class AdmisionRechazada(Exception):
+    def __init__(self, motivo):
+        super().__init__(motivo)
+        self.motivo = motivo
+
+
+class _Clase:
+    __slots__ = ('tokens', 'actualizado', 'en_curso', 'fila')
+
+    def __init__(self, rafaga, ahora):
+        self.tokens = float(rafaga)
+        self.actualizado = ahora
+        self.en_curso = 0
+        self.fila = deque()  # pedidos esperando, en orden de llegada
+
+
+class ControlAdmision:
+    def __init__(self, tasa=20.0, rafaga=10, concurrencia=2, cola=50, espera_maxima=5.0):
+        self.tasa = tasa
+        self.rafaga = rafaga
+        self.concurrencia = concurrencia
+        self.cola = cola
+        self.espera_maxima = espera_maxima
+        self._cond = threading.Condition()
+        self._clases = {}
+        self._stats = {'admitidas': 0, 'esperas': 0, 'rechazos_cola': 0, 'rechazos_espera': 0,
+                       'rechazos_sin_cupo': 0}
+
+    def _recargar(self, clase, ahora):
+        clase.tokens = min(self.rafaga, clase.tokens + (ahora - clase.actualizado) * self.tasa)
+        clase.actualizado = ahora
+
+    @contextmanager
+    def permiso(self, clave, completa=None):
+        """Espera el turno de la clave; lanza AdmisionRechazada si no llega a tiempo.
+
+        completa: función opcional (rápida, se llama con el lock tomado) que
+        indica si la clase ya no tiene cupo, para no seguir esperando.
+        """
+        self._entrar(clave, completa)
+        try:
+            yield
+        finally:
+            self._salir(clave)
+
+    def _entrar(self, clave, completa):
+        limite = time.monotonic() + self.espera_maxima
+        with self._cond:
+            clase = self._clases.get(clave)
+            if clase is None:
+                if len(self._clases) >= MAX_CLASES:
+                    for otra in list(self._clases):
+                        self._olvidar_si_inactiva(otra, self._clases[otra])
+                clase = self._clases[clave] = _Clase(self.rafaga, time.monotonic())
+            if len(clase.fila) >= self.cola:
+                self._stats['rechazos_cola'] += 1
+                raise AdmisionRechazada(COLA_LLENA)
+
+            pedido = object()
+            clase.fila.append(pedido)
+            espero = False
+            try:
+                while True:
+                    ahora = time.monotonic()
+                    self._recargar(clase, ahora)
+                    if clase.fila[0] is pedido and clase.en_curso < self.concurrencia and clase.tokens >= 1:
+                        break
+                    restante = limite - ahora
+                    if restante <= 0:
+                        self._stats['rechazos_espera'] += 1
+                        raise AdmisionRechazada(ESPERA_AGOTADA)
+                    if espero and completa is not None and completa():
+                        self._stats['rechazos_sin_cupo'] += 1
+                        raise AdmisionRechazada(SIN_CUPO)
+                    if clase.fila[0] is pedido and clase.tokens < 1:
+                        espera = (1 - clase.tokens) / self.tasa  # hasta el próximo token
+                    else:
+                        espera = restante
+                    if not espero:
+                        espero = True
+                        self._stats['esperas'] += 1
+                    self._cond.wait(min(restante, espera))
+            except AdmisionRechazada:
+                clase.fila.remove(pedido)
+                self._olvidar_si_inactiva(clave, clase)
+                self._cond.notify_all()
+                raise
+
+            clase.fila.popleft()
+            clase.tokens -= 1
+            clase.en_curso += 1
+            self._stats['admitidas'] += 1
+            self._cond.notify_all()
+
+    def _salir(self, clave):
+        with self._cond:
+            clase = self._clases[clave]
+            clase.en_curso -= 1
+            self._olvidar_si_inactiva(clave, clase)
+            self._cond.notify_all()
+
+    def _olvidar_si_inactiva(self, clave, clase):
+        # Sin pedidos y con la cubeta llena, equivale a una clase nueva
+        if not clase.en_curso and not clase.fila:
+            self._recargar(clase, time.monotonic())
+            if clase.tokens >= self.rafaga:
+                del self._clases[clave]
+
+    def estadisticas(self):
+        with self._cond:
+            return dict(self._stats, clases_activas=len(self._clases))
+
+
+class SalaEspera:
+    """Sala de espera: turnos habilitados a `tasa` por segundo entre todos los workers"""
+
+    def __init__(self, compartida, tasa):
+        self.compartida = compartida
+        self.tasa = tasa
+
+    def tomar_turno(self):
+        return self.compartida.tomar_turno(self.tasa)
+
+    def posicion(self, turno):
+        """Turnos que faltan habilitar antes de este (0 si ya está habilitado)"""
+        return max(0, turno - self.compartida.habilitados(self.tasa))
+
+    def espera_estimada(self, posicion):
+        """Segundos aproximados hasta habilitar esa posición"""
+        return int(posicion / self.tasa + 0.999)
@@ -1,15 +1,31 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
-from datetime import datetime, time, timedelta
+from flask import Flask, Response, make_response, render_template, request, redirect, url_for, flash, session, jsonify
+from markupsafe import Markup
+from datetime import date, datetime, time, timedelta
+import hashlib
+import io
 import os
+import tempfile
+from urllib.parse import urlparse
 
-# --- PyMySQL debe emular MySQLdb antes de cualquier importación MySQL ---
-import pymysql
-pymysql.install_as_MySQLdb()
+import click
+from werkzeug.datastructures import MultiDict
 
-# --- Ahora sí, podés importar Flask-MySQLdb ---
-from flask_mysqldb import MySQL
+import admision
+import archivado
+import credenciales
+import exportacion
+import idempotencia
+import importacion
+import lotes
+import motor_reservas
+import plantillas
+from catalogo import CacheCatalogo
+from comprobantes import AlmacenComprobantes
+from eventos import Publicador, estado_slot
+from memoria_compartida import CambiosCompartidos, ContadorCompartido, OcupacionCompartida, SalaEsperaCompartida
+from metricas import CursorMedido, Metricas, token_valido
+from pool_mysql import PoolMySQL
+from repositorio import Repositorio
 
 app = Flask(__name__)
 app.secret_key = 'tu_clave_secreta_super_segura_cambiala'
@@ -24,62 +40,172 @@ def inject_now():
         'datetime_now': dt.now()  # Agregar también la fecha/hora actual como objeto
     }
 
-# Configuración MySQL
-app.config['MYSQL_HOST'] = 'localhost'
-app.config['MYSQL_USER'] = 'root'
-app.config['MYSQL_PASSWORD'] = ''
-app.config['MYSQL_DB'] = 'gimnasio_reservas'
+# Motor de base de datos: 'mysql' (servidor) o 'sqlite' (embebido, un solo nodo)
+app.config['DB_BACKEND'] = os.environ.get('DB_BACKEND', 'mysql')
+app.config['SQLITE_PATH'] = os.environ.get('SQLITE_PATH', 'gimnasio_reservas.db')
+
+# Configuración MySQL (desde variables de entorno)
+app.config['MYSQL_HOST'] = os.environ.get('MYSQL_HOST', 'localhost')
+app.config['MYSQL_PORT'] = int(os.environ.get('MYSQL_PORT', 3306))
+app.config['MYSQL_USER'] = os.environ.get('MYSQL_USER', 'root')
+app.config['MYSQL_PASSWORD'] = os.environ.get('MYSQL_PASSWORD', '')
+app.config['MYSQL_DB'] = os.environ.get('MYSQL_DB', 'gimnasio_reservas')
+
+# Pool de conexiones (también lo usa el backend SQLite)
+app.config['MYSQL_POOL_SIZE'] = int(os.environ.get('MYSQL_POOL_SIZE', 10))
+app.config['MYSQL_POOL_TIMEOUT'] = float(os.environ.get('MYSQL_POOL_TIMEOUT', 5))      # espera máxima por una conexión (seg)
+app.config['MYSQL_POOL_RECYCLE'] = int(os.environ.get('MYSQL_POOL_RECYCLE', 3600))     # reabrir conexiones más viejas (seg)
+app.config['MYSQL_POOL_PING'] = int(os.environ.get('MYSQL_POOL_PING', 30))             # ping si estuvo inactiva más de (seg)
 
 # Configuración de archivos
 UPLOAD_FOLDER = 'static/uploads/comprobantes'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'pdf'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024  # 5MB máximo
+app.config['COMPROBANTES_WORKERS'] = 2  # Hilos para validar y generar miniaturas
+# Subidas a medio escribir: fuera de static/, en el mismo disco que UPLOAD_FOLDER
+app.config['COMPROBANTES_TMP'] = os.environ.get('COMPROBANTES_TMP', 'tmp/comprobantes')
+
+# Nombre de la base, para separar los archivos compartidos de cada instalación
+if app.config['DB_BACKEND'] == 'sqlite':
+    BASE = os.path.splitext(os.path.basename(app.config['SQLITE_PATH']))[0]
+else:
+    BASE = app.config['MYSQL_DB']
+
+# Tabla de ocupación compartida entre workers (ver memoria_compartida.py)
+SHM_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+app.config['OCUPACION_SHM_PATH'] = os.path.join(SHM_DIR, f"gimnasio_ocupacion_{BASE}.bin")
+app.config['OCUPACION_RECONCILIAR_SEGUNDOS'] = 300
+
+# Eventos de disponibilidad (SSE) para las páginas de reserva abiertas
+app.config['EVENTOS_SHM_PATH'] = os.path.join(SHM_DIR, f"gimnasio_cambios_{BASE}.bin")
+# Cada stream abierto ocupa un hilo del worker: el límite queda bien por debajo
+# de los hilos (--threads de gunicorn) para que las reservas y el admin siempre
+# tengan hilos libres
+app.config['WORKER_HILOS'] = int(os.environ.get('WORKER_HILOS', 100))
+app.config['EVENTOS_MAX_SUSCRIPCIONES'] = int(os.environ.get(
+    'EVENTOS_MAX_SUSCRIPCIONES', max(1, app.config['WORKER_HILOS'] // 2)))  # por proceso
+app.config['EVENTOS_DURACION_SEGUNDOS'] = 300  # luego el navegador reconecta
+app.config['EVENTOS_LATIDO_SEGUNDOS'] = 15
+
+# Control de admisión de /confirmar_reserva, por clase y por proceso (ver admision.py)
+app.config['ADMISION_TASA_POR_CLASE'] = float(os.environ.get('ADMISION_TASA_POR_CLASE', 20))  # admisiones/seg
+app.config['ADMISION_RAFAGA'] = int(os.environ.get('ADMISION_RAFAGA', 10))
+app.config['ADMISION_CONCURRENCIA_POR_CLASE'] = int(os.environ.get('ADMISION_CONCURRENCIA_POR_CLASE', 2))
+app.config['ADMISION_COLA_POR_CLASE'] = int(os.environ.get('ADMISION_COLA_POR_CLASE', 50))
+app.config['ADMISION_ESPERA_SEGUNDOS'] = float(os.environ.get('ADMISION_ESPERA_SEGUNDOS', 5))
+
+# Sala de espera opcional para aperturas de inscripción
+app.config['SALA_ESPERA'] = os.environ.get('SALA_ESPERA') == '1'
+app.config['SALA_ESPERA_TASA'] = float(os.environ.get('SALA_ESPERA_TASA', 5))   # visitantes habilitados/seg
+app.config['SALA_ESPERA_VENTANA_SEGUNDOS'] = 600  # tiempo para reservar una vez habilitado
+app.config['SALA_ESPERA_SHM_PATH'] = os.path.join(SHM_DIR, f"gimnasio_sala_{BASE}.bin")
+
+# Envíos repetidos del formulario de reserva (por proceso)
+app.config['ENVIOS_TTL_SEGUNDOS'] = int(os.environ.get('ENVIOS_TTL_SEGUNDOS', 600))
+app.config['ENVIOS_MAXIMO'] = int(os.environ.get('ENVIOS_MAXIMO', 10000))
+app.config['ENVIOS_ESPERA_SEGUNDOS'] = 15  # lo que espera un reintento al pedido original
+
+# Login de administradores: verificación scrypt en procesos aparte y límite de intentos
+app.config['ADMIN_LOGIN_WORKERS'] = int(os.environ.get('ADMIN_LOGIN_WORKERS', 2))
+app.config['ADMIN_LOGIN_COLA'] = int(os.environ.get('ADMIN_LOGIN_COLA', 8))          # verificaciones en espera
+app.config['ADMIN_LOGIN_INTENTOS_USUARIO'] = int(os.environ.get('ADMIN_LOGIN_INTENTOS_USUARIO', 5))
+app.config['ADMIN_LOGIN_INTENTOS_IP'] = int(os.environ.get('ADMIN_LOGIN_INTENTOS_IP', 20))
+app.config['ADMIN_LOGIN_VENTANA_SEGUNDOS'] = 300
+app.config['PASSWORD_METODO'] = os.environ.get('PASSWORD_METODO', credenciales.METODO)  # ej. scrypt o scrypt:32768:8:1
+
+# Archivado: las reservas de clases anteriores a este horizonte pasan a reservas_archivo
+app.config['ARCHIVO_HORIZONTE_DIAS'] = int(os.environ.get('ARCHIVO_HORIZONTE_DIAS', 180))
+
+# Semanas que muestra el panel de ocupación del dashboard
+app.config['RESUMEN_SEMANAS'] = 8
 
-mysql = MySQL(app)
+# Instrumentación: cada cursor mide sus consultas; /metrics expone los totales
+app.config['MYSQL_CURSORCLASS'] = CursorMedido
+app.config['METRICAS_SHM_PATH'] = os.path.join(SHM_DIR, f"gimnasio_metricas_{BASE}.bin")
+app.config['METRICAS_LENTO_SEGUNDOS'] = float(os.environ.get('METRICAS_LENTO_SEGUNDOS', 0.5))
+app.config['METRICAS_TOKEN'] = os.environ.get('METRICAS_TOKEN')  # Bearer para scrapers sin sesión
+
+if app.config['DB_BACKEND'] == 'sqlite':
+    from backend_sqlite import PoolSQLite
+    db = PoolSQLite(app)
+else:
+    db = PoolMySQL(app)
+repo = Repositorio(db)
+metricas = Metricas(app)
+ocupacion = OcupacionCompartida(app.config['OCUPACION_SHM_PATH'])
+catalogo = CacheCatalogo(ContadorCompartido(
+    os.path.join(SHM_DIR, f"gimnasio_catalogo_{BASE}.bin")))
+publicador = Publicador(CambiosCompartidos(app.config['EVENTOS_SHM_PATH']), ocupacion,
+                        app.config['EVENTOS_MAX_SUSCRIPCIONES'])
+control_admision = admision.ControlAdmision(app.config['ADMISION_TASA_POR_CLASE'],
+                                            app.config['ADMISION_RAFAGA'],
+                                            app.config['ADMISION_CONCURRENCIA_POR_CLASE'],
+                                            app.config['ADMISION_COLA_POR_CLASE'],
+                                            app.config['ADMISION_ESPERA_SEGUNDOS'])
+verificador = credenciales.VerificadorPasswords(app.config['ADMIN_LOGIN_WORKERS'],
+                                               app.config['ADMIN_LOGIN_COLA'],
+                                               metodo=app.config['PASSWORD_METODO'])
+intentos_login = credenciales.LimitadorIntentos(app.config['ADMIN_LOGIN_VENTANA_SEGUNDOS'])
+sala = admision.SalaEspera(SalaEsperaCompartida(app.config['SALA_ESPERA_SHM_PATH']),
+                           app.config['SALA_ESPERA_TASA'])
+envios_reserva = idempotencia.RegistroEnvios(app.config['ENVIOS_TTL_SEGUNDOS'],
+                                             app.config['ENVIOS_MAXIMO'],
+                                             app.config['ENVIOS_ESPERA_SEGUNDOS'])
+
+DIAS_SEMANA = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+MAX_DIAS_DISPONIBILIDAD = 31  # Rango máximo aceptado por /disponibilidad
+ESTADOS_RESERVA = ('pendiente', 'confirmada', 'cancelada')
+
+# Campos del formulario de reserva que identifican un envío (con su token)
+CAMPOS_RESERVA = ('horario_id', 'fecha_clase', 'nombre', 'apellido', 'dni')
+
+# Acciones masivas del listado de reservas: estado final (None = eliminar)
+ACCIONES_LOTE = {'cancelar': 'cancelada', 'confirmar': 'confirmada', 'pendiente': 'pendiente', 'eliminar': None}
+RESERVAS_POR_PAGINA = 50
+
+# Páginas públicas: el navegador guarda la copia pero la revalida siempre
+# (privada porque la barra cambia con la sesión de admin); la ocupación,
+# igual para todos, puede revalidarse en caches compartidas
+CACHE_PAGINAS = 'private, no-cache'
+CACHE_OCUPACION = 'public, no-cache'
+
+# Mensajes para cada motivo de rechazo de motor_reservas
+MENSAJES_RECHAZO = {
+    motor_reservas.INEXISTENTE: ('Horario no encontrado', 'danger'),
+    motor_reservas.PASADA: ('No se puede reservar en horarios que ya pasaron', 'warning'),
+    motor_reservas.DUPLICADA: ('Ya existe una reserva con este DNI para esta clase', 'warning'),
+    motor_reservas.COMPLETA: ('Este horario ya no tiene cupos disponibles', 'danger'),
+    admision.COLA_LLENA: ('Hay mucha demanda para este horario. Intentá de nuevo en unos segundos', 'warning'),
+    admision.ESPERA_AGOTADA: ('Hay mucha demanda para este horario. Intentá de nuevo en unos segundos', 'warning'),
+    admision.SIN_CUPO: ('Este horario ya no tiene cupos disponibles', 'danger'),
+}
 
 # Crear carpeta de uploads si no existe
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+os.makedirs(app.config['COMPROBANTES_TMP'], exist_ok=True)
+comprobantes = AlmacenComprobantes(UPLOAD_FOLDER, app.config['COMPROBANTES_TMP'],
+                                   app.config['COMPROBANTES_WORKERS'])
 
 # ==================== FILTROS PERSONALIZADOS ====================
 
-@app.template_filter('format_timedelta')
-def format_timedelta(td):
-    """Convierte timedelta a formato HH:MM"""
-    total = int(td.total_seconds())
-    h = total // 3600
-    m = (total % 3600) // 60
-    return f"{h:02d}:{m:02d}"
-
 @app.template_filter('format_time')
 def format_time(value):
-    """Convierte diferentes formatos de tiempo a HH:MM"""
-    # Si ya es un datetime.time
+    """datetime.time (como llegan las columnas TIME) a HH:MM"""
     if isinstance(value, time):
-        return value.strftime("%H:%M")
-
-    # Si es un timedelta (por si MySQL lo devuelve así)
-    if isinstance(value, timedelta):
-        total = int(value.total_seconds())
-        h = total // 3600
-        m = (total % 3600) // 60
-        return f"{h:02d}:{m:02d}"
-
-    # Si viene como string "HH:MM:SS"
-    if isinstance(value, str):
-        try:
-            return datetime.strptime(value, "%H:%M:%S").strftime("%H:%M")
-        except ValueError:
-            pass
+        return f"{value.hour:02d}:{value.minute:02d}"
+    # Texto "HH:MM" o "HH:MM:SS"
+    return str(value)[:5]
 
-        # Si viene como "HH:MM"
-        try:
-            return datetime.strptime(value, "%H:%M").strftime("%H:%M")
-        except ValueError:
-            pass
+@app.template_filter('miniatura')
+def miniatura(comprobante):
+    """Miniatura de un comprobante (ruta relativa a la carpeta de uploads) o None"""
+    return comprobantes.miniatura(comprobante)
 
-    # Si no matchea nada, lo devolvemos tal cual
-    return str(value)
+@app.template_filter('comprobante_invalido')
+def comprobante_invalido(comprobante):
+    """True si la validación en segundo plano rechazó el archivo"""
+    return comprobantes.es_invalido(comprobante)
 
 # ==================== FUNCIONES AUXILIARES ====================
 
@@ -92,114 +218,438 @@ def get_week_dates():
     start = today - timedelta(days=today.weekday())
     return [start + timedelta(days=i) for i in range(7)]
 
+def cargar_catalogo():
+    """Lee disciplinas y horarios y arma la grilla de reserva de cada disciplina"""
+    disciplinas = {d.id: d for d in repo.disciplinas()}
+    horarios = repo.horarios()
+    
+    grillas = {disciplina_id: {'horarios': [], 'horarios_map': {}, 'horas_ordenadas': []}
+               for disciplina_id in disciplinas}
+    disciplina_de = {}
+    for horario in horarios:
+        grilla = grillas.get(horario.disciplina_id)
+        if grilla is None:
+            continue
+        disciplina_de[horario.id] = horario.disciplina_id
+        grilla['horarios'].append(horario)
+        grilla['horarios_map'].setdefault(horario.dia_semana, {})[horario.hora_inicio] = horario.id
+    
+    for grilla in grillas.values():
+        grilla['horas_ordenadas'] = sorted({h.hora_inicio for h in grilla['horarios']})
+    
+    return {
+        'disciplinas': disciplinas,
+        'activas': [d for d in disciplinas.values() if d.activa],
+        'grillas': grillas,
+        'disciplina_de': disciplina_de
+    }
+
+def obtener_disponibilidad(horarios, desde, hasta):
+    """Ocupación de cada (horario, fecha) del rango para los horarios dados.
+
+    horarios es la lista de Horario de la grilla.
+    Responde desde la tabla compartida y, si no puede, con una única consulta
+    agrupada. Devuelve un dict indexado por "<horario_id>_<YYYY-MM-DD>".
+    """
+    slots = []
+    for offset in range((hasta - desde).days + 1):
+        fecha = desde + timedelta(days=offset)
+        dia = DIAS_SEMANA[fecha.weekday()]
+        slots += [(h.id, fecha, h.cupo_maximo) for h in horarios if h.dia_semana == dia]
+    
+    conteos = {}
+    ocupacion_vigente()
+    for horario_id, fecha, _ in slots:
+        resultado = ocupacion.consultar(horario_id, fecha)
+        if resultado is None:
+            conteos = None
+            break
+        conteos[(horario_id, fecha)] = resultado[0]
+    
+    if conteos is None and slots:
+        conteos = repo.conteos_ocupacion(sorted({horario_id for horario_id, _, _ in slots}), desde, hasta)
+    
+    disponibilidad = {}
+    for horario_id, fecha, cupo_maximo in slots:
+        disponibilidad[f"{horario_id}_{fecha.isoformat()}"] = estado_slot(
+            horario_id, fecha, conteos.get((horario_id, fecha), 0), cupo_maximo)
+    
+    return disponibilidad
+
+def cargar_ocupacion(version=None):
+    """Recarga la tabla de ocupación compartida desde la base"""
+    # Cerrar la transacción de lectura abierta: con REPEATABLE READ (MySQL, sin
+    # autocommit) un reintento vería la misma foto que la lectura anterior
+    repo.conn.rollback()
+    # Desde una semana atrás, para cubrir siempre la semana en curso
+    fecha_desde = date.today() - timedelta(days=7)
+    horarios = repo.cupos_horarios()
+    return ocupacion.reconstruir(horarios, repo.conteos_desde(fecha_desde), fecha_desde, version)
+
+def ocupacion_vigente():
+    """Reconstruye la tabla compartida si corresponde (arranque, intervalo o invalidación)"""
+    version = ocupacion.reclamar_reconciliacion(app.config['OCUPACION_RECONCILIAR_SEGUNDOS'])
+    if version is None:
+        return
+    
+    # Si otro worker modificó la tabla mientras leíamos la base, reintentar
+    for _ in range(3):
+        if cargar_ocupacion(version):
+            break
+        version = ocupacion.version()
+
+def clase_completa(horario_id, fecha_clase, reconciliar=True):
+    """True si la tabla compartida muestra la clase sin cupo (False si no puede responder)"""
+    if reconciliar:
+        ocupacion_vigente()
+    resultado = ocupacion.consultar(horario_id, fecha_clase)
+    return resultado is not None and resultado[0] >= resultado[1]
+
+def descartar_comprobante(relativa):
+    """Borra el comprobante de una reserva no admitida si ninguna otra lo usa"""
+    try:
+        if not repo.comprobante_en_uso(relativa):
+            comprobantes.descartar(relativa)
+    except Exception:
+        app.logger.exception('No se pudo descartar el comprobante %s', relativa)
+
+def avisar_cambio(horario_id, fecha_clase):
+    """Publica la ocupación actual de una clase a las páginas de reserva abiertas"""
+    disciplina_id = catalogo.obtener(cargar_catalogo)['disciplina_de'].get(horario_id)
+    if disciplina_id is None:
+        return
+    resultado = ocupacion.consultar(horario_id, fecha_clase)
+    if resultado is None:
+        cupo_maximo = repo.cupo_horario(horario_id)
+        if cupo_maximo is None:
+            return
+        resultado = (repo.contar_reservas(horario_id, fecha_clase), cupo_maximo)
+    publicador.publicar(disciplina_id, horario_id, fecha_clase, *resultado)
+
+def respuesta_condicional(partes, generar, cache_control, sesion=False):
+    """Respuesta con ETag derivado de partes; 304 sin llamar a generar() si el cliente ya la tiene.
+
+    partes: tupla con todo lo que determina el contenido (versiones, ocupación,
+    fechas). sesion=True para HTML que depende de la sesión (barra de admin,
+    mensajes flash).
+    """
+    if sesion:
+        if session.get('_flashes'):
+            # Los mensajes se muestran una sola vez: sin validador
+            respuesta = make_response(generar())
+            respuesta.headers['Cache-Control'] = 'private, no-store'
+            return respuesta
+        partes += (bool(session.get('admin_logged_in')),)
+    
+    etag = hashlib.sha1(repr(partes).encode()).hexdigest()[:24]
+    if request.if_none_match.contains_weak(etag):
+        respuesta = Response(status=304)
+    else:
+        respuesta = make_response(generar())
+    respuesta.set_etag(etag)
+    respuesta.headers['Cache-Control'] = cache_control
+    return respuesta
+
+def sala_habilitada():
+    """True si el visitante puede reservar: sala de espera apagada o su turno ya pasó.
+
+    Quien llega sin turno toma uno; si no hay fila, queda habilitado en el acto.
+    """
+    if not app.config['SALA_ESPERA']:
+        return True
+    ahora = datetime.now().timestamp()
+    if session.get('sala_habilitado_hasta', 0) > ahora:
+        return True
+    if session.get('sala_turno') is None:
+        session['sala_turno'] = sala.tomar_turno()
+    if sala.posicion(session['sala_turno']) == 0:
+        session.pop('sala_turno')
+        session['sala_habilitado_hasta'] = ahora + app.config['SALA_ESPERA_VENTANA_SEGUNDOS']
+        return True
+    return False
+
+def ruta_local(ruta):
+    """ruta si es un path de esta aplicación (para redirigir sin salir del sitio)"""
+    return ruta if ruta and ruta.startswith('/') and not ruta.startswith('//') else url_for('index')
+
+def codificar_cursor(fecha_clase, hora_inicio, reserva_id):
+    """Cursor de paginación del listado admin: 'YYYY-MM-DD_HH:MM:SS_id'"""
+    return f"{fecha_clase.isoformat()}_{hora_inicio.strftime('%H:%M:%S')}_{reserva_id}"
+
+def decodificar_cursor(cursor):
+    """Inverso de codificar_cursor; None si el cursor falta o es inválido"""
+    if not cursor:
+        return None
+    try:
+        fecha, hora, reserva_id = cursor.split('_')
+        return (datetime.strptime(fecha, '%Y-%m-%d').date(),
+                datetime.strptime(hora, '%H:%M:%S').strftime('%H:%M:%S'),
+                int(reserva_id))
+    except ValueError:
+        return None
+
+def filtros_reservas(args):
+    """Lee los filtros del listado de reservas.
+
+    Devuelve (filtros, consulta): los valores válidos recibidos, como texto
+    para repetirlos en los links, y los mismos ya convertidos para
+    Repositorio (fechas como date).
+    """
+    filtros = {}
+    consulta = {}
+    
+    disciplina_id = args.get('disciplina_id', type=int)
+    if disciplina_id:
+        filtros['disciplina_id'] = consulta['disciplina_id'] = disciplina_id
+    
+    for campo in ('desde', 'hasta'):
+        valor = args.get(campo)
+        if not valor:
+            continue
+        try:
+            consulta[campo] = datetime.strptime(valor, '%Y-%m-%d').date()
+        except ValueError:
+            continue
+        filtros[campo] = valor
+    
+    estado = args.get('estado')
+    if estado in ESTADOS_RESERVA:
+        filtros['estado'] = consulta['estado'] = estado
+    
+    q = (args.get('q') or '').strip()
+    if q:
+        filtros['q'] = consulta['q'] = q
+    
+    return filtros, consulta
+
+def seleccion_lote(datos):
+    """Selección de una acción masiva: {'ids': [...]} o la clase (horario_id, fecha_clase).
+
+    Devuelve (seleccion, error).
+    """
+    if 'ids' in datos:
+        ids = datos['ids']
+        if not isinstance(ids, list) or not ids or \
+                not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            return None, 'ids debe ser una lista de números de reserva'
+        if len(ids) > lotes.MAX_RESERVAS:
+            return None, f'Máximo {lotes.MAX_RESERVAS} reservas por acción'
+        return {'ids': sorted(set(ids))}, None
+    horario_id = datos.get('horario_id')
+    if not isinstance(horario_id, int) or isinstance(horario_id, bool):
+        return None, 'Indicar ids, o horario_id y fecha_clase'
+    try:
+        fecha_clase = datetime.strptime(str(datos.get('fecha_clase')), '%Y-%m-%d').date()
+    except ValueError:
+        return None, 'Formato de fecha inválido, usar YYYY-MM-DD'
+    return {'horario_id': horario_id, 'fecha_clase': fecha_clase}, None
+
+def importar_csv(tipo, texto):
+    """Importa reservas u horarios e invalida las cachés afectadas"""
+    filas = importacion.leer_csv(texto)
+    if tipo == 'horarios':
+        resultado = repo.importar_horarios(filas)
+        if resultado.insertadas:
+            catalogo.invalidar()
+    else:
+        resultado = repo.importar_reservas(filas, ESTADOS_RESERVA)
+    if resultado.insertadas:
+        ocupacion.invalidar()
+    return resultado
+
+# Hasta que el esquema esté al día las consultas fallarían (por ejemplo, el
+# INSERT de la admisión usa columnas de la migración 0003): se responde 503 con
+# el motivo en lugar de un error 500 por request.
+esquema_al_dia = False
+
+@app.before_request
+def verificar_esquema():
+    global esquema_al_dia
+    if esquema_al_dia or request.endpoint == 'static':
+        return None
+    pendientes = repo.migraciones_pendientes()
+    if not pendientes:
+        esquema_al_dia = True
+        return None
+    mensaje = ('Faltan migraciones del esquema: '
+               + ', '.join(f'{version:04d}_{nombre}' for version, nombre in pendientes)
+               + '. Aplicarlas con: flask --app app migrar')
+    app.logger.error(mensaje)
+    return Response(mensaje, status=503, mimetype='text/plain')
+
 # ==================== RUTAS CLIENTE ====================
 
 @app.route('/')
 def index():
     """Página principal - Selección de disciplinas"""
-    cur = mysql.connection.cursor()
-    cur.execute("SELECT * FROM disciplinas WHERE activa = TRUE")
-    disciplinas = cur.fetchall()
-    cur.close()
-    return render_template('index.html', disciplinas=disciplinas)
+    version = catalogo.version()
+    
+    def renderizar():
+        cat = catalogo.obtener(cargar_catalogo)
+        grilla_disciplinas = catalogo.fragmento('index', lambda: Markup(
+            render_template('fragmentos/disciplinas.html', disciplinas=cat['activas'])))
+        return render_template('index.html', grilla_disciplinas=grilla_disciplinas)
+    
+    # El pie muestra el año: la fecha también entra en el validador
+    return respuesta_condicional(('index', version, date.today()), renderizar, CACHE_PAGINAS, sesion=True)
 
 @app.route('/reservar/<int:disciplina_id>')
 def reservar(disciplina_id):
     """Vista de calendario y reserva para una disciplina"""
-    cur = mysql.connection.cursor()
+    if not sala_habilitada():
+        return redirect(url_for('sala_espera', siguiente=request.path))
     
-    # Obtener disciplina
-    cur.execute("SELECT * FROM disciplinas WHERE id = %s", [disciplina_id])
-    disciplina = cur.fetchone()
+    version = catalogo.version()
+    cat = catalogo.obtener(cargar_catalogo)
+    disciplina = cat['disciplinas'].get(disciplina_id)
     
     if not disciplina:
         flash('Disciplina no encontrada', 'danger')
         return redirect(url_for('index'))
     
-    # Obtener horarios de la disciplina
-    cur.execute("""
-        SELECT id, dia_semana, hora_inicio, cupo_maximo 
-        FROM horarios 
-        WHERE disciplina_id = %s
-        ORDER BY FIELD(dia_semana, 'Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo'), hora_inicio
-    """, [disciplina_id])
-    horarios_raw = cur.fetchall()
-    cur.close()
-    
-    # Crear estructura de datos optimizada para el template
-    horarios_map = {}
-    horas_unicas = set()
-    
-    for h in horarios_raw:
-        horario_id = h[0]
-        dia_semana = h[1]
-        hora_inicio = h[2]
-        
-        # Convertir timedelta a string HH:MM
-        if isinstance(hora_inicio, timedelta):
-            total_seconds = int(hora_inicio.total_seconds())
-            hours = total_seconds // 3600
-            minutes = (total_seconds % 3600) // 60
-            hora_str = f"{hours:02d}:{minutes:02d}"
-        else:
-            hora_str = hora_inicio.strftime('%H:%M') if hasattr(hora_inicio, 'strftime') else str(hora_inicio)
-        
-        # Agregar al mapa
-        if dia_semana not in horarios_map:
-            horarios_map[dia_semana] = {}
-        horarios_map[dia_semana][hora_str] = horario_id
-        horas_unicas.add(hora_str)
-    
+    grilla = cat['grillas'][disciplina_id]
     week_dates = get_week_dates()
-    dias_semana = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
-    horas_ordenadas = sorted(list(horas_unicas))
+    
+    # Ocupación de toda la semana de una sola vez
+    disponibilidad = obtener_disponibilidad(
+        grilla['horarios'], week_dates[0].date(), week_dates[-1].date())
     
     # AGREGAR: Fecha y hora actual para comparar en el template
     now = datetime.now()
     
-    return render_template('reservar.html', 
+    # La página cambia con el catálogo, la ocupación de cada clase y las
+    # clases que ya pasaron (se muestran deshabilitadas)
+    pasadas = sum(1 for fecha in week_dates for hora in grilla['horas_ordenadas']
+                  if datetime.combine(fecha.date(), hora) < now)
+    ocupacion_semana = tuple(sorted((clave, slot['reservas'], slot['cupo_maximo'])
+                                    for clave, slot in disponibilidad.items()))
+    partes = ('reservar', disciplina_id, version, week_dates[0].date(), pasadas, ocupacion_semana)
+    
+    return respuesta_condicional(partes, lambda: render_template('reservar.html', 
                          disciplina=disciplina, 
-                         horarios_map=horarios_map,
-                         horas_ordenadas=horas_ordenadas,
+                         horarios_map=grilla['horarios_map'],
+                         horas_ordenadas=grilla['horas_ordenadas'],
                          week_dates=week_dates,
-                         dias_semana=dias_semana,
-                         current_datetime=now)
+                         dias_semana=DIAS_SEMANA,
+                         disponibilidad=disponibilidad,
+                         current_datetime=now), CACHE_PAGINAS, sesion=True)
 
 @app.route('/check_disponibilidad/<int:horario_id>/<fecha>')
 def check_disponibilidad(horario_id, fecha):
     """API para verificar disponibilidad de un horario"""
-    cur = mysql.connection.cursor()
+    try:
+        fecha_clase = datetime.strptime(fecha, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'Formato de fecha inválido, usar YYYY-MM-DD'}), 400
+    
+    # Responder desde la tabla compartida sin tocar la base
+    ocupacion_vigente()
+    resultado = ocupacion.consultar(horario_id, fecha_clase)
     
-    # Obtener cupo máximo
-    cur.execute("SELECT cupo_maximo FROM horarios WHERE id = %s", [horario_id])
-    horario = cur.fetchone()
+    if resultado is not None:
+        reservas_count, cupo_maximo = resultado
+    else:
+        cupo_maximo = repo.cupo_horario(horario_id)
+        if cupo_maximo is None:
+            return jsonify({'error': 'Horario no encontrado'}), 404
+        reservas_count = repo.contar_reservas(horario_id, fecha_clase)
     
-    if not horario:
-        return jsonify({'error': 'Horario no encontrado'}), 404
+    disponible = reservas_count < cupo_maximo
+    cupos_restantes = cupo_maximo - reservas_count
     
-    cupo_maximo = horario[0]
+    return respuesta_condicional(('check', horario_id, fecha_clase, reservas_count, cupo_maximo),
+                                 lambda: jsonify({
+                                     'disponible': disponible,
+                                     'cupos_restantes': cupos_restantes,
+                                     'cupo_maximo': cupo_maximo
+                                 }), CACHE_OCUPACION)
+
+@app.route('/disponibilidad/<int:disciplina_id>')
+def disponibilidad_semana(disciplina_id):
+    """API de ocupación de todos los horarios de una disciplina en un rango de fechas"""
+    week_dates = get_week_dates()
+    try:
+        desde = datetime.strptime(request.args.get('desde', week_dates[0].strftime('%Y-%m-%d')), '%Y-%m-%d').date()
+        hasta = datetime.strptime(request.args.get('hasta', week_dates[-1].strftime('%Y-%m-%d')), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'Formato de fecha inválido, usar YYYY-MM-DD'}), 400
     
-    # Contar reservas
-    cur.execute("""
-        SELECT COUNT(*) FROM reservas 
-        WHERE horario_id = %s AND fecha_clase = %s AND estado != 'cancelada'
-    """, [horario_id, fecha])
+    if hasta < desde or (hasta - desde).days >= MAX_DIAS_DISPONIBILIDAD:
+        return jsonify({'error': f'Rango inválido (máximo {MAX_DIAS_DISPONIBILIDAD} días)'}), 400
     
-    reservas_count = cur.fetchone()[0]
-    cur.close()
+    cat = catalogo.obtener(cargar_catalogo)
+    if disciplina_id not in cat['grillas']:
+        return jsonify({'error': 'Disciplina no encontrada'}), 404
     
-    disponible = reservas_count < cupo_maximo
-    cupos_restantes = cupo_maximo - reservas_count
+    disponibilidad = obtener_disponibilidad(cat['grillas'][disciplina_id]['horarios'], desde, hasta)
+    partes = ('disponibilidad', disciplina_id, desde, hasta,
+              tuple(sorted((clave, slot['reservas'], slot['cupo_maximo'])
+                           for clave, slot in disponibilidad.items())))
     
-    return jsonify({
-        'disponible': disponible,
-        'cupos_restantes': cupos_restantes,
-        'cupo_maximo': cupo_maximo
-    })
+    return respuesta_condicional(partes, lambda: jsonify({
+        'disciplina_id': disciplina_id,
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'disponibilidad': disponibilidad
+    }), CACHE_OCUPACION)
+
+@app.route('/disponibilidad/<int:disciplina_id>/eventos')
+def eventos_disponibilidad(disciplina_id):
+    """Stream SSE con la ocupación de una semana y cada cambio posterior"""
+    try:
+        semana = datetime.strptime(request.args['semana'], '%Y-%m-%d').date() \
+            if request.args.get('semana') else date.today()
+    except ValueError:
+        return jsonify({'error': 'Formato de fecha inválido, usar YYYY-MM-DD'}), 400
+    lunes = semana - timedelta(days=semana.weekday())
+    
+    cat = catalogo.obtener(cargar_catalogo)
+    if disciplina_id not in cat['grillas']:
+        return jsonify({'error': 'Disciplina no encontrada'}), 404
+    
+    suscripcion = publicador.suscribir(disciplina_id, lunes)
+    if suscripcion is None:
+        return Response('Demasiadas conexiones abiertas\n', status=503,
+                        headers={'Retry-After': '30'}, content_type='text/plain')
+    
+    # La semana completa se lee ahora: el stream no usa la base ni el request
+    inicial = obtener_disponibilidad(cat['grillas'][disciplina_id]['horarios'],
+                                     lunes, lunes + timedelta(days=6))
+    respuesta = Response(publicador.flujo(suscripcion, inicial, app.config['EVENTOS_DURACION_SEGUNDOS'],
+                                          app.config['EVENTOS_LATIDO_SEGUNDOS']),
+                         content_type='text/event-stream',
+                         headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    respuesta.call_on_close(lambda: publicador.cancelar(suscripcion))
+    return respuesta
 
 @app.route('/confirmar_reserva', methods=['POST'])
 def confirmar_reserva():
     """Procesar y confirmar una reserva"""
+    # El mismo envío repetido (doble toque, reintento) recibe el resultado del primero
+    comprobante = request.files.get('comprobante')
+    clave = idempotencia.clave_envio(request.form.get('token_envio'),
+                                     *(request.form.get(campo) for campo in CAMPOS_RESERVA),
+                                     comprobante.filename if comprobante else '')
+    try:
+        if clave:
+            mensaje, categoria, destino = envios_reserva.ejecutar(clave, procesar_reserva)
+        else:
+            (mensaje, categoria, destino), _ = procesar_reserva()
+    except idempotencia.EnvioEnCurso:
+        mensaje, categoria, destino = ('Tu reserva todavía se está procesando. Revisá en unos segundos '
+                                       'antes de volver a enviarla', 'info', request.referrer)
+    except idempotencia.RegistroLleno:
+        mensaje, categoria, destino = ('Hay muchas reservas en proceso. Intentá de nuevo en unos segundos',
+                                       'warning', request.referrer)
+    flash(mensaje, categoria)
+    return redirect(destino)
+
+def procesar_reserva():
+    """Valida y admite la reserva del formulario.
+
+    Devuelve ((mensaje, categoria, destino), guardar): guardar=False para los
+    resultados que un reintento debe volver a intentar.
+    """
     try:
         horario_id = request.form.get('horario_id')
         fecha_clase = request.form.get('fecha_clase')
@@ -210,91 +660,82 @@ def confirmar_reserva():
         
         # Validaciones básicas
         if not all([horario_id, fecha_clase, nombre, apellido, dni]):
-            flash('Todos los campos son obligatorios', 'danger')
-            return redirect(request.referrer)
-        
-        cur = mysql.connection.cursor()
-        
-        # AGREGAR: Obtener hora del horario
-        cur.execute("SELECT hora_inicio FROM horarios WHERE id = %s", [horario_id])
-        horario_data = cur.fetchone()
-        
-        if not horario_data:
-            flash('Horario no encontrado', 'danger')
-            cur.close()
-            return redirect(request.referrer)
-        
-        hora_inicio = horario_data[0]
+            return ('Todos los campos son obligatorios', 'danger', request.referrer), True
         
-        # Convertir hora_inicio a hora comparable
-        if isinstance(hora_inicio, timedelta):
-            total_seconds = int(hora_inicio.total_seconds())
-            hours = total_seconds // 3600
-            minutes = (total_seconds % 3600) // 60
-        else:
-            hours = hora_inicio.hour
-            minutes = hora_inicio.minute
-        
-        # Crear datetime de la clase
-        fecha_clase_dt = datetime.strptime(fecha_clase, '%Y-%m-%d')
-        fecha_hora_clase = fecha_clase_dt.replace(hour=hours, minute=minutes, second=0)
-        
-        # VALIDAR: No permitir reservas en horarios pasados
-        if fecha_hora_clase < datetime.now():
-            flash('No se puede reservar en horarios que ya pasaron', 'warning')
-            cur.close()
-            return redirect(request.referrer)
-        
-        # Verificar si ya existe reserva con ese DNI
-        cur.execute("""
-            SELECT id FROM reservas 
-            WHERE horario_id = %s AND fecha_clase = %s AND dni = %s
-        """, [horario_id, fecha_clase, dni])
-        
-        if cur.fetchone():
-            flash('Ya existe una reserva con este DNI para esta clase', 'warning')
-            cur.close()
-            return redirect(request.referrer)
-        
-        # Verificar disponibilidad
-        cur.execute("SELECT cupo_maximo FROM horarios WHERE id = %s", [horario_id])
-        cupo_maximo = cur.fetchone()[0]
+        if not sala_habilitada():
+            return ('Tu turno para reservar venció. Volvé a tomar un lugar en la fila', 'warning',
+                    url_for('sala_espera', siguiente=urlparse(request.referrer or '').path)), False
         
-        cur.execute("""
-            SELECT COUNT(*) FROM reservas 
-            WHERE horario_id = %s AND fecha_clase = %s AND estado != 'cancelada'
-        """, [horario_id, fecha_clase])
+        horario_id = int(horario_id)
+        fecha_clase_dt = datetime.strptime(fecha_clase, '%Y-%m-%d').date()
         
-        reservas_count = cur.fetchone()[0]
+        # Clase completa: rechazar con la tabla compartida, sin ir a la base
+        if clase_completa(horario_id, fecha_clase_dt):
+            return MENSAJES_RECHAZO[motor_reservas.COMPLETA] + (request.referrer,), True
         
-        if reservas_count >= cupo_maximo:
-            flash('Este horario ya no tiene cupos disponibles', 'danger')
-            cur.close()
-            return redirect(request.referrer)
-        
-        # Procesar comprobante
-        comprobante_filename = None
-        if comprobante and allowed_file(comprobante.filename):
-            filename = secure_filename(f"{dni}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{comprobante.filename}")
-            comprobante.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-            comprobante_filename = filename
+        try:
+            # Mientras espera turno solo se mira la tabla compartida (sin reconstruirla)
+            completa = lambda: clase_completa(horario_id, fecha_clase_dt, reconciliar=False)
+            with control_admision.permiso((horario_id, fecha_clase_dt), completa):
+                # Puede haberse completado mientras esperaba su turno
+                if clase_completa(horario_id, fecha_clase_dt):
+                    resultado = motor_reservas.ResultadoReserva(motor_reservas.COMPLETA, None)
+                else:
+                    # Procesar comprobante (antes de la transacción para no escribir
+                    # a disco con el horario bloqueado)
+                    comprobante_filename, comprobante_nuevo = None, False
+                    if comprobante and allowed_file(comprobante.filename):
+                        comprobante_filename, comprobante_nuevo = comprobantes.guardar(comprobante)
+                    
+                    # Validar e insertar en una sola transacción
+                    generacion = ocupacion.generacion()
+                    resultado = None
+                    try:
+                        resultado = repo.admitir_reserva(horario_id, fecha_clase_dt,
+                                                         nombre, apellido, dni, comprobante_filename)
+                    finally:
+                        # Un comprobante recién subido para una reserva rechazada no queda en disco
+                        if comprobante_nuevo and (resultado is None
+                                                  or resultado.estado != motor_reservas.CONFIRMADA):
+                            descartar_comprobante(comprobante_filename)
+                    # Antes de liberar el turno, para que el siguiente ya lo vea
+                    if resultado.estado == motor_reservas.CONFIRMADA:
+                        ocupacion.ajustar(horario_id, fecha_clase_dt, 1, generacion)
+        except admision.AdmisionRechazada as e:
+            resultado = motor_reservas.ResultadoReserva(e.motivo, None)
         
-        # Insertar reserva
-        cur.execute("""
-            INSERT INTO reservas (horario_id, fecha_clase, nombre, apellido, dni, comprobante_pago, estado)
-            VALUES (%s, %s, %s, %s, %s, %s, 'confirmada')
-        """, [horario_id, fecha_clase, nombre, apellido, dni, comprobante_filename])
+        if resultado.estado != motor_reservas.CONFIRMADA:
+            # Cola llena o espera agotada: el reintento puede entrar
+            guardar = resultado.estado not in (admision.COLA_LLENA, admision.ESPERA_AGOTADA)
+            return MENSAJES_RECHAZO[resultado.estado] + (request.referrer,), guardar
         
-        mysql.connection.commit()
-        reserva_id = cur.lastrowid
-        cur.close()
+        reserva_id = resultado.reserva_id
+        avisar_cambio(horario_id, fecha_clase_dt)
         
-        flash(f'¡Reserva confirmada! Número de reserva: {reserva_id}', 'success')
-        return redirect(url_for('index'))
+        return (f'¡Reserva confirmada! Número de reserva: {reserva_id}', 'success', url_for('index')), True
         
     except Exception as e:
-        flash(f'Error al procesar la reserva: {str(e)}', 'danger')
-        return redirect(request.referrer)
+        return (f'Error al procesar la reserva: {str(e)}', 'danger', request.referrer), False
+
+@app.route('/sala_espera')
+def sala_espera():
+    """Fila virtual: asigna un turno y espera a que se habilite"""
+    siguiente = ruta_local(request.args.get('siguiente'))
+    if sala_habilitada():
+        return redirect(siguiente)
+    
+    posicion = sala.posicion(session['sala_turno'])
+    return render_template('sala_espera.html', posicion=posicion,
+                         espera=sala.espera_estimada(posicion), siguiente=siguiente)
+
+@app.route('/sala_espera/estado')
+def sala_espera_estado():
+    """Posición actual en la fila (la consulta la página de la sala de espera)"""
+    if sala_habilitada():
+        return jsonify({'habilitado': True, 'posicion': 0, 'espera_segundos': 0})
+    posicion = sala.posicion(session['sala_turno'])
+    return jsonify({'habilitado': False, 'posicion': posicion,
+                    'espera_segundos': sala.espera_estimada(posicion)})
 
 # ==================== RUTAS ADMIN ====================
 
@@ -302,16 +743,32 @@ def confirmar_reserva():
 def admin_login():
     """Login del administrador"""
     if request.method == 'POST':
-        usuario = request.form.get('usuario')
-        password = request.form.get('password')
+        usuario = request.form.get('usuario') or ''
+        password = request.form.get('password') or ''
+        
+        # Los intentos de más se cortan antes de calcular ningún hash
+        if not intentos_login.permitir({('usuario', usuario): app.config['ADMIN_LOGIN_INTENTOS_USUARIO'],
+                                        ('ip', request.remote_addr): app.config['ADMIN_LOGIN_INTENTOS_IP']}):
+            flash('Demasiados intentos de ingreso. Esperá unos minutos e intentá de nuevo', 'danger')
+            return render_template('admin/login.html'), 429
+        
+        admin = repo.administrador(usuario)
         
-        cur = mysql.connection.cursor()
-        cur.execute("SELECT id, password_hash FROM administradores WHERE usuario = %s", [usuario])
-        admin = cur.fetchone()
-        cur.close()
+        try:
+            valido = admin is not None and verificador.verificar(admin.password_hash, password)
+        except credenciales.VerificadorSaturado:
+            flash('El servidor está ocupado. Intentá de nuevo en unos segundos', 'warning')
+            return render_template('admin/login.html'), 503
         
-        if admin and check_password_hash(admin[1], password):
-            session['admin_id'] = admin[0]
+        if valido:
+            intentos_login.olvidar(('usuario', usuario))
+            if verificador.necesita_rehash(admin.password_hash):
+                # Hash con parámetros viejos: se reemplaza ahora que tenemos la contraseña
+                try:
+                    repo.actualizar_password_hash(admin.id, verificador.generar(password))
+                except credenciales.VerificadorSaturado:
+                    pass  # se reintenta en el próximo login
+            session['admin_id'] = admin.id
             session['admin_logged_in'] = True
             return redirect(url_for('admin_dashboard'))
         else:
@@ -331,40 +788,74 @@ def admin_dashboard():
     if not session.get('admin_logged_in'):
         return redirect(url_for('admin_login'))
     
-    cur = mysql.connection.cursor()
-    
-    # Estadísticas
-    cur.execute("SELECT COUNT(*) FROM reservas WHERE estado = 'confirmada'")
-    total_reservas = cur.fetchone()[0]
-    
-    cur.execute("SELECT COUNT(*) FROM disciplinas WHERE activa = TRUE")
-    total_disciplinas = cur.fetchone()[0]
+    # Estadísticas (desde el resumen precalculado)
+    total_reservas = repo.total_por_estado('confirmada')
+    total_disciplinas = repo.contar_disciplinas_activas()
     
-    cur.close()
+    # Ocupación de las últimas semanas
+    hoy = date.today()
+    desde = hoy - timedelta(weeks=app.config['RESUMEN_SEMANAS']) + timedelta(days=1)
+    panel = repo.panel_ocupacion(desde, hoy)
     
     return render_template('admin/dashboard.html', 
                          total_reservas=total_reservas,
-                         total_disciplinas=total_disciplinas)
+                         total_disciplinas=total_disciplinas,
+                         panel=panel,
+                         panel_desde=desde,
+                         panel_hasta=hoy)
 
 @app.route('/admin/reservas')
 def admin_reservas():
-    """Listado de todas las reservas"""
+    """Listado paginado de reservas (paginación por clave, filtros en el servidor)"""
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('admin_login'))
+    
+    filtros, consulta = filtros_reservas(request.args)
+    por_pagina = min(max(request.args.get('por_pagina', RESERVAS_POR_PAGINA, type=int), 1), 500)
+    despues = decodificar_cursor(request.args.get('despues'))
+    
+    # Resumen del conjunto filtrado con agregados SQL
+    resumen = repo.resumen_reservas(consulta)
+    
+    # Página actual: seek sobre (fecha_clase, hora_inicio, id) descendente
+    reservas = repo.pagina_reservas(consulta, despues, por_pagina + 1)
+    disciplinas = repo.nombres_disciplinas()
+    
+    siguiente = None
+    if len(reservas) > por_pagina:
+        reservas = reservas[:por_pagina]
+        ultima = reservas[-1]
+        siguiente = codificar_cursor(ultima.fecha_clase, ultima.hora_inicio, ultima.id)
+    
+    return render_template('admin/reservas.html',
+                         reservas=reservas,
+                         resumen=resumen,
+                         filtros=filtros,
+                         disciplinas=disciplinas,
+                         siguiente=siguiente,
+                         es_primera_pagina=despues is None)
+
+@app.route('/admin/reservas/exportar')
+def admin_exportar_reservas():
+    """Descarga de reservas filtradas en CSV o NDJSON (streaming)"""
     if not session.get('admin_logged_in'):
         return redirect(url_for('admin_login'))
     
-    cur = mysql.connection.cursor()
-    cur.execute("""
-        SELECT r.id, r.nombre, r.apellido, r.dni, r.fecha_clase, 
-               h.hora_inicio, d.nombre as disciplina, r.estado, r.comprobante_pago
-        FROM reservas r
-        JOIN horarios h ON r.horario_id = h.id
-        JOIN disciplinas d ON h.disciplina_id = d.id
-        ORDER BY r.fecha_clase DESC, h.hora_inicio DESC
-    """)
-    reservas = cur.fetchall()
-    cur.close()
+    formato = request.args.get('formato', 'csv')
+    if formato not in exportacion.FORMATOS:
+        flash('Formato de exportación inválido', 'danger')
+        return redirect(url_for('admin_reservas'))
     
-    return render_template('admin/reservas.html', reservas=reservas)
+    _, consulta = filtros_reservas(request.args)
+    filas = repo.filas_exportacion(consulta)
+    nombre = f"reservas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{formato}"
+    
+    return Response(exportacion.GENERADORES[formato](filas),
+                    content_type=exportacion.FORMATOS[formato],
+                    headers={
+                        'Content-Disposition': f'attachment; filename={nombre}',
+                        'X-Accel-Buffering': 'no'  # que nginx no acumule la respuesta
+                    })
 
 @app.route('/admin/reservas/eliminar/<int:reserva_id>')
 def admin_eliminar_reserva(reserva_id):
@@ -372,24 +863,113 @@ def admin_eliminar_reserva(reserva_id):
     if not session.get('admin_logged_in'):
         return redirect(url_for('admin_login'))
     
-    cur = mysql.connection.cursor()
-    cur.execute("DELETE FROM reservas WHERE id = %s", [reserva_id])
-    mysql.connection.commit()
-    cur.close()
+    generacion = ocupacion.generacion()
+    reserva = repo.eliminar_reserva(reserva_id)
+    
+    if reserva and reserva.estado != 'cancelada':
+        ocupacion.ajustar(reserva.horario_id, reserva.fecha_clase, -1, generacion)
+        avisar_cambio(reserva.horario_id, reserva.fecha_clase)
     
     flash('Reserva eliminada correctamente', 'success')
     return redirect(url_for('admin_reservas'))
 
+@app.route('/admin/reservas/lote', methods=['POST'])
+def admin_reservas_lote():
+    """Cancela, elimina o cambia el estado de varias reservas en una transacción (JSON).
+
+    Devuelve las reservas afectadas y los totales del listado con los filtros
+    de la URL, para actualizar la página sin recargarla.
+    """
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Sesión vencida'}), 401
+    
+    # Solo JSON: un formulario de otro sitio no puede enviarlo sin pasar por CORS
+    datos = request.get_json(silent=True)
+    if not isinstance(datos, dict) or datos.get('accion') not in ACCIONES_LOTE:
+        return jsonify({'error': f"Acción inválida (usar {', '.join(ACCIONES_LOTE)})"}), 400
+    seleccion, error = seleccion_lote(datos)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    accion = datos['accion']
+    generacion = ocupacion.generacion()
+    try:
+        if ACCIONES_LOTE[accion] is None:
+            resultado = repo.eliminar_reservas(seleccion)
+        else:
+            resultado = repo.cambiar_estado_reservas(seleccion, ACCIONES_LOTE[accion])
+    except lotes.LoteRechazado as e:
+        return jsonify({'error': 'La acción dejaría clases sobre su cupo; no se aplicó',
+                        'clases': [{'horario_id': h, 'fecha_clase': f.isoformat()} for h, f in e.clases]}), 409
+    
+    hoy = date.today()
+    for (horario_id, fecha_clase), delta in resultado.clases.items():
+        ocupacion.ajustar(horario_id, fecha_clase, delta, generacion)
+        if fecha_clase >= hoy:
+            avisar_cambio(horario_id, fecha_clase)
+    
+    _, consulta = filtros_reservas(request.args)
+    return jsonify({
+        'accion': accion,
+        'estado': ACCIONES_LOTE[accion],
+        'afectadas': resultado.afectadas,
+        'ids': resultado.ids,
+        'clases': len(resultado.clases),
+        'resumen': repo.resumen_reservas(consulta),
+    })
+
+@app.route('/admin/importar', methods=['GET', 'POST'])
+def admin_importar():
+    """Importación masiva de reservas u horarios desde un CSV"""
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('admin_login'))
+    
+    if request.method == 'GET':
+        return render_template('admin/importar.html')
+    
+    tipo = request.form.get('tipo')
+    archivo = request.files.get('archivo')
+    if tipo not in ('reservas', 'horarios') or not archivo or not archivo.filename:
+        flash('Seleccioná el tipo de importación y un archivo CSV', 'danger')
+        return redirect(url_for('admin_importar'))
+    
+    texto = io.TextIOWrapper(archivo.stream, encoding='utf-8-sig', newline='')
+    try:
+        resultado = importar_csv(tipo, texto)
+    except UnicodeDecodeError:
+        flash('El archivo no está codificado en UTF-8', 'danger')
+        return redirect(url_for('admin_importar'))
+    
+    flash(f'{resultado.insertadas} de {resultado.procesadas} filas importadas',
+          'success' if not resultado.errores else 'warning')
+    return render_template('admin/importar.html', tipo=tipo, resultado=resultado)
+
+@app.route('/admin/pool')
+def admin_pool():
+    """Estadísticas del pool de conexiones, del control de admisión, de los envíos de reserva y del login"""
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('admin_login'))
+    
+    return jsonify(dict(db.estadisticas(), admision=control_admision.estadisticas(),
+                        envios=envios_reserva.estadisticas(),
+                        login=dict(verificador.estadisticas(), rechazos_intentos=intentos_login.rechazos)))
+
+@app.route('/metrics')
+def metrics():
+    """Métricas de latencia y SQL por ruta (formato Prometheus)"""
+    if not session.get('admin_logged_in') and \
+            not token_valido(request.headers.get('Authorization'), app.config['METRICAS_TOKEN']):
+        return Response('No autorizado\n', status=401, content_type='text/plain')
+    
+    return Response(metricas.exponer(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/admin/disciplinas')
 def admin_disciplinas():
     """Gestión de disciplinas"""
     if not session.get('admin_logged_in'):
         return redirect(url_for('admin_login'))
     
-    cur = mysql.connection.cursor()
-    cur.execute("SELECT * FROM disciplinas ORDER BY id DESC")
-    disciplinas = cur.fetchall()
-    cur.close()
+    disciplinas = repo.disciplinas('id_desc')
     
     return render_template('admin/disciplinas.html', disciplinas=disciplinas)
 
@@ -402,11 +982,8 @@ def admin_agregar_disciplina():
     nombre = request.form.get('nombre')
     descripcion = request.form.get('descripcion')
     
-    cur = mysql.connection.cursor()
-    cur.execute("INSERT INTO disciplinas (nombre, descripcion) VALUES (%s, %s)", 
-                [nombre, descripcion])
-    mysql.connection.commit()
-    cur.close()
+    repo.agregar_disciplina(nombre, descripcion)
+    catalogo.invalidar()
     
     flash('Disciplina agregada correctamente', 'success')
     return redirect(url_for('admin_disciplinas'))
@@ -417,10 +994,8 @@ def admin_toggle_disciplina(disciplina_id):
     if not session.get('admin_logged_in'):
         return redirect(url_for('admin_login'))
     
-    cur = mysql.connection.cursor()
-    cur.execute("UPDATE disciplinas SET activa = NOT activa WHERE id = %s", [disciplina_id])
-    mysql.connection.commit()
-    cur.close()
+    repo.alternar_disciplina(disciplina_id)
+    catalogo.invalidar()
     
     flash('Estado de disciplina actualizado', 'success')
     return redirect(url_for('admin_disciplinas'))
@@ -431,10 +1006,9 @@ def admin_eliminar_disciplina(disciplina_id):
     if not session.get('admin_logged_in'):
         return redirect(url_for('admin_login'))
     
-    cur = mysql.connection.cursor()
-    cur.execute("DELETE FROM disciplinas WHERE id = %s", [disciplina_id])
-    mysql.connection.commit()
-    cur.close()
+    repo.eliminar_disciplina(disciplina_id)
+    ocupacion.invalidar()
+    catalogo.invalidar()
     
     flash('Disciplina eliminada correctamente', 'success')
     return redirect(url_for('admin_disciplinas'))
@@ -445,27 +1019,12 @@ def admin_horarios(disciplina_id):
     if not session.get('admin_logged_in'):
         return redirect(url_for('admin_login'))
     
-    cur = mysql.connection.cursor()
-    
-    cur.execute("SELECT * FROM disciplinas WHERE id = %s", [disciplina_id])
-    disciplina = cur.fetchone()
-    
-    cur.execute("""
-        SELECT id, dia_semana, hora_inicio, cupo_maximo 
-        FROM horarios 
-        WHERE disciplina_id = %s
-        ORDER BY FIELD(dia_semana, 'Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo'), hora_inicio
-    """, [disciplina_id])
-    horarios = cur.fetchall()
-    
-    # Debug: ver qué datos estamos obteniendo
-    print("\nDEBUG - Horarios obtenidos:")
-    for h in horarios:
-        print(f"  ID: {h[0]}, Día: {h[1]}, Hora: {h[2]} (tipo: {type(h[2])}), Cupo: {h[3]}")
+    disciplina = repo.disciplina(disciplina_id)
+    horarios = repo.horarios_disciplina(disciplina_id)
     
-    cur.close()
-    
-    return render_template('admin/horarios.html', disciplina=disciplina, horarios=horarios)
+    otras = [d for d in catalogo.obtener(cargar_catalogo)['disciplinas'].values() if d.id != disciplina_id]
+    return render_template('admin/horarios.html', disciplina=disciplina, horarios=horarios,
+                         otras_disciplinas=otras, dias_semana=DIAS_SEMANA)
 
 @app.route('/admin/horarios/agregar/<int:disciplina_id>', methods=['POST'])
 def admin_agregar_horario(disciplina_id):
@@ -477,31 +1036,139 @@ def admin_agregar_horario(disciplina_id):
     hora_inicio = request.form.get('hora_inicio')
     cupo_maximo = request.form.get('cupo_maximo', 10)
     
-    cur = mysql.connection.cursor()
-    cur.execute("""
-        INSERT INTO horarios (disciplina_id, dia_semana, hora_inicio, cupo_maximo)
-        VALUES (%s, %s, %s, %s)
-    """, [disciplina_id, dia_semana, hora_inicio, cupo_maximo])
-    mysql.connection.commit()
-    cur.close()
+    try:
+        repo.agregar_horario(disciplina_id, dia_semana, hora_inicio or '', cupo_maximo)
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('admin_horarios', disciplina_id=disciplina_id))
+    ocupacion.invalidar()
+    catalogo.invalidar()
     
     flash('Horario agregado correctamente', 'success')
     return redirect(url_for('admin_horarios', disciplina_id=disciplina_id))
 
+@app.route('/admin/horarios/plantilla/<int:disciplina_id>', methods=['POST'])
+def admin_plantilla_horarios(disciplina_id):
+    """Generar horarios desde un patrón o copiándolos de otra disciplina"""
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('admin_login'))
+    
+    try:
+        if request.form.get('origen') == 'copia':
+            propuestos = repo.horarios_plantilla(int(request.form.get('copiar_de', 0)))
+        else:
+            dias = [d for d in request.form.getlist('dias') if d in DIAS_SEMANA]
+            horas = request.form.get('horas', '').replace(';', ',').split(',')
+            propuestos = plantillas.expandir_patron(dias, horas, int(request.form.get('cupo_maximo', 10)))
+    except ValueError as e:
+        flash(f'Plantilla inválida: {e}', 'danger')
+        return redirect(url_for('admin_horarios', disciplina_id=disciplina_id))
+    
+    if not propuestos:
+        flash('La plantilla no genera ningún horario', 'warning')
+        return redirect(url_for('admin_horarios', disciplina_id=disciplina_id))
+    
+    if request.form.get('accion') != 'aplicar':
+        disciplina = repo.disciplina(disciplina_id)
+        diferencia = repo.previsualizar_plantilla(disciplina_id, propuestos)
+        return render_template('admin/plantilla_horarios.html', disciplina=disciplina,
+                             diferencia=diferencia, formulario=request.form)
+    
+    diferencia = repo.aplicar_plantilla(disciplina_id, propuestos)
+    if diferencia is None:
+        flash('Disciplina no encontrada', 'danger')
+        return redirect(url_for('admin_disciplinas'))
+    if diferencia.nuevos:
+        ocupacion.invalidar()
+        catalogo.invalidar()
+    
+    mensaje = f'{len(diferencia.nuevos)} horario(s) agregado(s)'
+    if diferencia.conflictos:
+        mensaje += f'; {len(diferencia.conflictos)} conflicto(s) conservan su cupo actual'
+    flash(mensaje, 'success')
+    return redirect(url_for('admin_horarios', disciplina_id=disciplina_id))
+
 @app.route('/admin/horarios/eliminar/<int:horario_id>/<int:disciplina_id>')
 def admin_eliminar_horario(horario_id, disciplina_id):
     """Eliminar horario"""
     if not session.get('admin_logged_in'):
         return redirect(url_for('admin_login'))
     
-    cur = mysql.connection.cursor()
-    cur.execute("DELETE FROM horarios WHERE id = %s", [horario_id])
-    mysql.connection.commit()
-    cur.close()
+    repo.eliminar_horario(horario_id)
+    ocupacion.invalidar()
+    catalogo.invalidar()
     
     flash('Horario eliminado correctamente', 'success')
     return redirect(url_for('admin_horarios', disciplina_id=disciplina_id))
 
+# ==================== COMANDOS CLI ====================
+
+@app.cli.command('migrar')
+@click.option('--estado', is_flag=True, help='Solo listar las migraciones y si están aplicadas')
+@click.option('--hasta', type=int, help='Aplicar hasta esta versión (inclusive)')
+def migrar_command(estado, hasta):
+    """Aplica las migraciones pendientes del esquema (migraciones/<motor>/)"""
+    if estado:
+        for version, nombre, aplicada_en in repo.estado_migraciones():
+            print(f"{version:04d} {nombre:40} {aplicada_en or 'pendiente'}")
+        return
+    aplicadas = repo.migrar(hasta)
+    for version, nombre in aplicadas:
+        print(f'Aplicada {version:04d} {nombre}')
+    print(f'{len(aplicadas)} migraciones aplicadas' if aplicadas else 'El esquema está al día')
+
+@app.cli.command('reconstruir-ocupacion')
+def reconstruir_ocupacion_command():
+    """Recarga desde la base la tabla de ocupación compartida"""
+    cargar_ocupacion()
+    print('Tabla de ocupación reconstruida')
+
+@app.cli.command('reconstruir-resumen')
+def reconstruir_resumen_command():
+    """Recalcula la tabla ocupacion_resumen desde reservas"""
+    filas = repo.reconstruir_resumen()
+    print(f'Resumen de ocupación reconstruido ({filas} filas)')
+
+@app.cli.command('archivar-reservas')
+@click.option('--dias', type=int, help='Horizonte en días (por defecto ARCHIVO_HORIZONTE_DIAS)')
+@click.option('--lote', type=int, default=archivado.TAMANO_LOTE, show_default=True,
+              help='Reservas movidas por transacción')
+def archivar_reservas_command(dias, lote):
+    """Mueve a reservas_archivo las reservas de clases anteriores al horizonte"""
+    try:
+        corte = archivado.corte(dias if dias is not None else app.config['ARCHIVO_HORIZONTE_DIAS'])
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--dias')
+    movidas = repo.archivar_reservas(corte, lote)
+    print(f'{movidas} reservas anteriores al {corte.isoformat()} archivadas')
+
+@app.cli.command('exportar-reservas')
+@click.option('--formato', type=click.Choice(list(exportacion.FORMATOS)), default='csv')
+@click.option('--desde', help='Fecha de clase inicial (YYYY-MM-DD)')
+@click.option('--hasta', help='Fecha de clase final (YYYY-MM-DD)')
+@click.option('--disciplina-id', type=int)
+@click.option('--estado', type=click.Choice(ESTADOS_RESERVA))
+@click.option('--salida', type=click.File('w', encoding='utf-8'), default='-',
+              help='Archivo de salida (por defecto, la salida estándar)')
+def exportar_reservas_command(formato, desde, hasta, disciplina_id, estado, salida):
+    """Exporta reservas en CSV o NDJSON sin cargarlas en memoria"""
+    args = MultiDict({k: v for k, v in {
+        'desde': desde, 'hasta': hasta, 'disciplina_id': disciplina_id, 'estado': estado
+    }.items() if v is not None})
+    _, consulta = filtros_reservas(args)
+    for bloque in exportacion.GENERADORES[formato](repo.filas_exportacion(consulta)):
+        salida.write(bloque)
+
+@app.cli.command('importar')
+@click.argument('tipo', type=click.Choice(['reservas', 'horarios']))
+@click.argument('archivo', type=click.File('r', encoding='utf-8-sig'))
+def importar_command(tipo, archivo):
+    """Importa reservas u horarios desde un CSV, informando los errores por fila"""
+    resultado = importar_csv(tipo, archivo)
+    for numero, motivo in resultado.errores:
+        print(f'Línea {numero}: {motivo}')
+    print(f'{resultado.insertadas} de {resultado.procesadas} filas importadas')
+
 # ==================== INICIO DE LA APLICACIÓN ====================
 
 if __name__ == '__main__':
@@ -0,0 +1,85 @@
+"""
+Archivo de reservas de clases pasadas.
+
+`reservas` solo necesita las clases futuras y las recientes: ahí corren los
+conteos de disponibilidad, el control de duplicados y el listado admin. Las
+reservas de clases anteriores al horizonte se mueven por lotes a
+`reservas_archivo` (particionada por mes en MySQL), así la tabla caliente y
+sus índices quedan chicos.
+
+Cada reserva se copia tal cual, con su id, la disciplina y la hora del
+horario. El resumen de ocupación (ocupacion_resumen) no cambia al archivar:
+sigue contando las reservas archivadas.
+"""
+
+from datetime import date, timedelta
+
+import dialectos
+
+TAMANO_LOTE = 1000
+HORIZONTE_MINIMO_DIAS = 8  # la tabla de ocupación compartida lee desde hace 7 días
+
+COLUMNAS = 'id, horario_id, disciplina_id, hora_inicio, fecha_clase, nombre, apellido, dni, ' \
+           'comprobante_pago, fecha_reserva, estado'
+
+
+def _fecha(valor):
+    # MIN/MAX de una fecha llegan como texto en SQLite (el agregado no tiene tipo)
+    return date.fromisoformat(valor) if isinstance(valor, str) else valor
+
+
+def corte(horizonte_dias, hoy=None):
+    """Primera fecha de clase que se conserva en la tabla caliente"""
+    if horizonte_dias < HORIZONTE_MINIMO_DIAS:
+        raise ValueError(f'El horizonte mínimo es de {HORIZONTE_MINIMO_DIAS} días')
+    return (hoy or date.today()) - timedelta(days=horizonte_dias)
+
+
+def archivar(conn, corte, tamano_lote=TAMANO_LOTE):
+    """Mueve a reservas_archivo las reservas con fecha_clase < corte.
+
+    Cada lote es una transacción: si se interrumpe, lo ya movido queda
+    archivado y lo demás sigue en `reservas`. Devuelve la cantidad movida.
+    """
+    dialecto = dialectos.de(conn)
+    cur = conn.cursor()
+    total = 0
+    try:
+        cur.execute("SELECT MIN(fecha_clase) FROM reservas WHERE fecha_clase < %s", [corte])
+        desde = _fecha(cur.fetchone()[0])
+        conn.commit()
+        if desde is None:
+            return 0
+        # Antes de mover: el DDL de particiones no puede ir dentro de un lote
+        dialecto.particiones_mensuales(cur, 'reservas_archivo', desde, corte - timedelta(days=1))
+
+        while True:
+            conn.begin()
+            cur.execute("""
+                SELECT id FROM reservas
+                WHERE fecha_clase < %s
+                LIMIT %s
+            """ + dialecto.para_actualizar, [corte, tamano_lote])
+            ids = [fila[0] for fila in cur.fetchall()]
+            if not ids:
+                conn.commit()
+                return total
+            marcadores = ', '.join(['%s'] * len(ids))
+            cur.execute(f"""
+                INSERT INTO reservas_archivo ({COLUMNAS})
+                SELECT {COLUMNAS} FROM reservas WHERE id IN ({marcadores})
+            """, ids)
+            cur.execute(f"DELETE FROM reservas WHERE id IN ({marcadores})", ids)
+            conn.commit()
+            total += len(ids)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def ultima_fecha(cur):
+    """Fecha de clase más reciente del archivo, o None si está vacío"""
+    cur.execute("SELECT MAX(fecha_clase) FROM reservas_archivo")
+    return _fecha(cur.fetchone()[0])
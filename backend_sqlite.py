@@ -0,0 +1,193 @@
+"""
+Backend SQLite embebido (DB_BACKEND=sqlite).
+
+Envuelve sqlite3 con la misma interfaz que usan las consultas escritas para
+PyMySQL: marcadores %s, conn.begin()/commit()/rollback(), fechas como date,
+horas (TIME) como datetime.time. La base corre en modo WAL, así que las lecturas
+no esperan a las escrituras; las transacciones de escritura empiezan con
+BEGIN IMMEDIATE y se serializan entre sí (ver dialectos.SQLITE).
+
+PoolSQLite reutiliza el pool de PoolMySQL: cada request toma una conexión
+propia y la devuelve al terminar. Si la base está vacía, se crea con
+database_sqlite.sql; después se aplican las migraciones pendientes (ver
+esquema.py).
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, time as hora, timedelta
+
+import dialectos
+import esquema
+from metricas import anotar
+from modelos import como_hora
+from pool_mysql import PoolMySQL
+
+ESQUEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database_sqlite.sql')
+
+_MARCADORES = re.compile(r'%([s%])')
+
+
+def _hora_texto(valor):
+    total = int(valor.total_seconds())
+    return f"{total // 3600:02d}:{(total % 3600) // 60:02d}:{total % 60:02d}"
+
+
+def _convertir_hora(valor):
+    partes = [int(float(p)) for p in valor.decode().split(':')]
+    return como_hora(timedelta(hours=partes[0], minutes=partes[1], seconds=partes[2] if len(partes) > 2 else 0))
+
+
+# Mismos tipos que el pool MySQL
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda valor: valor.isoformat(' '))
+sqlite3.register_adapter(hora, lambda valor: valor.strftime('%H:%M:%S'))
+sqlite3.register_adapter(timedelta, _hora_texto)
+sqlite3.register_converter('DATE', lambda valor: date.fromisoformat(valor.decode()))
+sqlite3.register_converter('TIME', _convertir_hora)
+sqlite3.register_converter('TIMESTAMP', lambda valor: datetime.fromisoformat(valor.decode()))
+sqlite3.register_converter('BOOLEAN', int)
+
+
+def traducir(sql):
+    """Marcadores de PyMySQL a los de sqlite3: %s -> ?, %% -> %"""
+    return _MARCADORES.sub(lambda m: '?' if m.group(1) == 's' else '%', sql)
+
+
+class CursorSQLite:
+    def __init__(self, conexion):
+        self.connection = conexion
+        self._cur = conexion._conn.cursor()
+
+    def execute(self, sql, args=None):
+        inicio = time.perf_counter()
+        try:
+            self._cur.execute(traducir(sql), tuple(args) if args else ())
+            return self._cur.rowcount
+        finally:
+            anotar(sql, time.perf_counter() - inicio)
+
+    def executemany(self, sql, filas):
+        inicio = time.perf_counter()
+        try:
+            self._cur.executemany(traducir(sql), [tuple(fila) for fila in filas])
+            return self._cur.rowcount
+        finally:
+            anotar(sql, time.perf_counter() - inicio)
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+    def fetchmany(self, cantidad):
+        return self._cur.fetchmany(cantidad)
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+    @property
+    def lastrowid(self):
+        return self._cur.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    def close(self):
+        self._cur.close()
+
+
+class ConexionSQLite:
+    dialecto = dialectos.SQLITE
+
+    def __init__(self, path, timeout=5):
+        # isolation_level=None: sin transacciones implícitas, se abren con begin()
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None,
+                                     detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode = WAL')
+        self._conn.execute('PRAGMA synchronous = NORMAL')
+        self._conn.execute('PRAGMA foreign_keys = ON')
+        self.open = True
+
+    def cursor(self, *_):
+        return CursorSQLite(self)
+
+    @property
+    def en_transaccion(self):
+        return self._conn.in_transaction
+
+    def begin(self):
+        if self._conn.in_transaction:
+            self._conn.execute('COMMIT')  # como MySQL: BEGIN confirma la transacción abierta
+        self._conn.execute('BEGIN IMMEDIATE')
+
+    def commit(self):
+        if self._conn.in_transaction:
+            self._conn.execute('COMMIT')
+
+    def rollback(self):
+        if self._conn.in_transaction:
+            self._conn.execute('ROLLBACK')
+
+    def close(self):
+        self.open = False
+        self._conn.close()
+
+
+def _sentencias(script):
+    """Divide un script SQL en sentencias completas"""
+    actual = ''
+    for linea in script.splitlines(keepends=True):
+        actual += linea
+        if sqlite3.complete_statement(actual):
+            yield actual.strip()
+            actual = ''
+
+
+def inicializar(conn, esquema=ESQUEMA):
+    """Crea las tablas (y los datos de ejemplo) si la base está vacía"""
+    with open(esquema, encoding='utf-8') as f:
+        script = f.read()
+    conn.begin()
+    try:
+        existe = conn._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'disciplinas'").fetchone()
+        if not existe:
+            for sentencia in _sentencias(script):
+                conn._conn.execute(sentencia)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return not existe
+
+
+class PoolSQLite(PoolMySQL):
+    def init_app(self, app):
+        self.path = app.config['SQLITE_PATH']
+        self.tamano = app.config['MYSQL_POOL_SIZE']
+        self.timeout = app.config['MYSQL_POOL_TIMEOUT']
+        self.espera_bloqueo = app.config.get('SQLITE_TIMEOUT', 5)  # busy_timeout (seg)
+        self.recycle = 0
+        self.ping = None
+        self._inicializada = False
+        self._lock_inicio = threading.Lock()
+        app.teardown_appcontext(self._teardown)
+
+    def _crear(self):
+        conn = ConexionSQLite(self.path, self.espera_bloqueo)
+        if not self._inicializada:
+            with self._lock_inicio:
+                if not self._inicializada:
+                    inicializar(conn)
+                    esquema.aplicar(conn)
+                    self._inicializada = True
+        conn._pool_creada = time.monotonic()
+        with self._cond:
+            self._stats['creadas'] += 1
+        return conn
+
+    def _en_transaccion(self, conn):
+        return conn.en_transaccion
@@ -0,0 +1,170 @@
+"""
+Benchmarks del flujo de reservas.
+
+Uso (desde la raíz del proyecto):
+
+    python -m bench --sembrar                  # crea y llena la base gimnasio_bench
+    python -m bench                            # corre los escenarios con la app en proceso
+    python -m bench --url http://127.0.0.1:8000 --comparar bench/resultados/anterior.json
+    python -m bench --planes                   # revisa con EXPLAIN los planes de las consultas frecuentes
+
+La conexión se toma de las mismas variables de entorno que la aplicación
+(MYSQL_HOST, MYSQL_USER, ...). MYSQL_DB es gimnasio_bench por defecto: la
+siembra borra y recrea las tablas, así que nunca debe apuntar a producción.
+Con DB_BACKEND=sqlite se usa el archivo SQLITE_PATH (gimnasio_bench.db).
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+from datetime import datetime
+
+os.environ.setdefault('MYSQL_DB', 'gimnasio_bench')
+os.environ.setdefault('SQLITE_PATH', 'gimnasio_bench.db')
+SQLITE = os.environ.get('DB_BACKEND') == 'sqlite'
+
+from bench import datos, escenarios, planes
+
+CARPETA_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resultados')
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(prog='python -m bench', description='Benchmarks del flujo de reservas')
+    parser.add_argument('--sembrar', action='store_true', help='Recrear el esquema y generar datos antes de medir')
+    parser.add_argument('--solo-sembrar', action='store_true', help='Sembrar y salir sin medir')
+    parser.add_argument('--planes', action='store_true',
+                        help='Revisar los planes de las consultas frecuentes en lugar de medir; '
+                             'sale con error si alguna recorre una tabla grande u ordena aparte')
+    parser.add_argument('--disciplinas', type=int, default=30)
+    parser.add_argument('--horarios', type=int, default=15, help='Horarios por disciplina')
+    parser.add_argument('--semanas', type=int, default=26, help='Semanas de reservas históricas')
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--url', help='Medir una aplicación ya levantada (ej. gunicorn) en lugar de la app en proceso')
+    parser.add_argument('--escenarios', default=','.join(escenarios.ESCENARIOS),
+                        help='Escenarios a correr, separados por coma')
+    parser.add_argument('--concurrencia', type=int, default=32)
+    parser.add_argument('--rafaga', type=int, default=200, help='Pedidos de la ráfaga de reservas')
+    parser.add_argument('--pedidos', type=int, default=300, help='Iteraciones de los demás escenarios')
+    parser.add_argument('--salida', help='Archivo JSON de resultados (por defecto, bench/resultados/<fecha>.json)')
+    parser.add_argument('--comparar', help='JSON de una corrida anterior para comparar el p95 por ruta')
+    parser.add_argument('--umbral', type=float, default=20.0, help='Aumento de p95 (%%) que se marca como regresión')
+    return parser.parse_args()
+
+
+def _levantar_app(concurrencia):
+    """Sirve la app en un hilo, en un puerto libre; devuelve su URL"""
+    # Una conexión por hilo cliente, para medir la app y no la espera del pool
+    os.environ.setdefault('MYSQL_POOL_SIZE', str(concurrencia))
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    import app as aplicacion
+
+    class _Silencioso(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    servidor = make_server('127.0.0.1', 0, aplicacion.app, threaded=True, request_handler=_Silencioso)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{servidor.server_port}'
+
+
+def _comparar(anterior, actual, umbral):
+    regresiones = 0
+    for escenario, resultado in actual['escenarios'].items():
+        previas = anterior.get('escenarios', {}).get(escenario, {}).get('rutas', {})
+        for ruta, metricas in resultado['rutas'].items():
+            if ruta not in previas:
+                continue
+            antes, ahora = previas[ruta]['p95_ms'], metricas['p95_ms']
+            cambio = (ahora - antes) / antes * 100 if antes else 0
+            marca = '  REGRESIÓN' if cambio > umbral else ''
+            regresiones += bool(marca)
+            print(f'  {ruta:45} p95 {antes:8.2f} -> {ahora:8.2f} ms ({cambio:+.0f}%){marca}')
+    return regresiones
+
+
+def _conectar(con_base=True):
+    if SQLITE:
+        return datos.conectar_sqlite(os.environ['SQLITE_PATH'])
+    return datos.conectar(host=os.environ.get('MYSQL_HOST', 'localhost'),
+                          port=int(os.environ.get('MYSQL_PORT', 3306)),
+                          user=os.environ.get('MYSQL_USER', 'root'),
+                          password=os.environ.get('MYSQL_PASSWORD', ''),
+                          db=os.environ['MYSQL_DB'] if con_base else None)
+
+
+def main():
+    args = _argumentos()
+    db = os.path.basename(os.environ['SQLITE_PATH']) if SQLITE else os.environ['MYSQL_DB']
+
+    resultado = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'base': db,
+        'parametros': {k: v for k, v in vars(args).items() if k not in ('salida', 'comparar')},
+        'escenarios': {},
+    }
+
+    if args.sembrar or args.solo_sembrar:
+        if 'bench' not in db and 'test' not in db:
+            sys.exit(f'La siembra recrea las tablas de {db!r}; usá una base con "bench" o "test" en el nombre')
+        conn = _conectar(con_base=False)
+        if SQLITE:
+            datos.crear_esquema_sqlite(conn)
+        else:
+            datos.crear_esquema(conn, db)
+        resultado['datos'] = datos.sembrar(conn, args.disciplinas, args.horarios, args.semanas, args.semilla)
+        conn.close()
+        print('Datos generados:', resultado['datos'])
+        if args.solo_sembrar:
+            return
+
+    if args.planes:
+        conn = _conectar()
+        print(f'Planes de las consultas frecuentes en {db}:')
+        fallas = planes.revisar(conn)
+        conn.close()
+        if fallas:
+            sys.exit(f'{fallas} consulta(s) con recorridos completos u orden aparte')
+        return
+
+    url = args.url or _levantar_app(args.concurrencia)
+    conn = _conectar()
+    catalogo = datos.catalogo(conn)
+    azar = random.Random(args.semilla)
+    fallas = 0
+
+    for nombre in args.escenarios.split(','):
+        total = args.rafaga if nombre == 'rafaga_reservas' else args.pedidos
+        print(f'\n== {nombre}: {total} pedidos, concurrencia {args.concurrencia}')
+        medicion = escenarios.ESCENARIOS[nombre](url, conn, catalogo, total, args.concurrencia, azar)
+        resultado['escenarios'][nombre] = medicion
+        for ruta, m in medicion['rutas'].items():
+            print(f"  {ruta:45} {m['pedidos']:6d} ped {m['rps']:8.1f}/s  p50 {m['p50_ms']:8.2f}  "
+                  f"p95 {m['p95_ms']:8.2f}  p99 {m['p99_ms']:8.2f} ms  errores {m['errores']}")
+        verificacion = medicion.get('verificacion')
+        if verificacion:
+            print('  verificación:', verificacion)
+            fallas += not verificacion['cupo_respetado']
+    conn.close()
+
+    salida = args.salida or os.path.join(CARPETA_RESULTADOS, datetime.now().strftime('%Y%m%d_%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f'\nResultados guardados en {salida}')
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            anterior = json.load(f)
+        print(f"\nComparación contra {args.comparar} ({anterior.get('fecha')}):")
+        regresiones = _comparar(anterior, resultado, args.umbral)
+        print(f'{regresiones} ruta(s) con p95 más de {args.umbral:.0f}% peor')
+
+    if fallas:
+        sys.exit('La ráfaga de reservas superó el cupo')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+"""
+Datos para los benchmarks.
+
+Crea el esquema de database.sql (o database_sqlite.sql con DB_BACKEND=sqlite)
+más las migraciones en una base descartable y la llena con
+volúmenes realistas: muchas disciplinas, una grilla semanal por disciplina y
+varios meses de reservas históricas (respetando cupos y la clave única).
+Con la misma semilla se generan siempre los mismos datos.
+"""
+
+import os
+import random
+from datetime import date, timedelta
+
+import pymysql
+from werkzeug.security import generate_password_hash
+
+import esquema
+import resumenes
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ESQUEMA = os.path.join(RAIZ, 'database.sql')
+ESQUEMA_SQLITE = os.path.join(RAIZ, 'database_sqlite.sql')
+
+DIAS_SEMANA = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+HORAS = [f'{h:02d}:00:00' for h in range(7, 22)]
+NOMBRES = ['Ana', 'Juan', 'María', 'Pedro', 'Lucía', 'Martín', 'Sofía', 'Diego', 'Valentina', 'Tomás']
+APELLIDOS = ['García', 'Pérez', 'López', 'Gómez', 'Fernández', 'Díaz', 'Romero', 'Sosa', 'Álvarez', 'Torres']
+
+ADMIN_USUARIO = 'bench'
+ADMIN_PASSWORD = 'bench'
+
+TAMANO_LOTE = 5000
+
+
+def conectar(host, port, user, password, db=None):
+    return pymysql.connect(host=host, port=port, user=user, password=password,
+                           database=db, charset='utf8mb4', autocommit=False)
+
+
+def conectar_sqlite(path):
+    from backend_sqlite import ConexionSQLite
+    return ConexionSQLite(path)
+
+
+def _sentencias_create(esquema=ESQUEMA):
+    """Sentencias CREATE TABLE / CREATE INDEX del esquema, en orden"""
+    with open(esquema, encoding='utf-8') as f:
+        texto = '\n'.join(l for l in f.read().splitlines() if not l.strip().startswith('--'))
+    return [s.strip() for s in texto.split(';') if s.strip().upper().startswith(('CREATE TABLE', 'CREATE INDEX'))]
+
+
+def crear_esquema(conn, db):
+    """Crea (o vacía) la base db con las tablas de database.sql y las migraciones"""
+    cur = conn.cursor()
+    cur.execute(f"CREATE DATABASE IF NOT EXISTS `{db}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+    cur.execute(f"USE `{db}`")
+    cur.execute("SHOW TABLES")
+    tablas = [fila[0] for fila in cur.fetchall()]
+    cur.execute("SET FOREIGN_KEY_CHECKS = 0")
+    for tabla in tablas:
+        cur.execute(f"DROP TABLE IF EXISTS `{tabla}`")
+    cur.execute("SET FOREIGN_KEY_CHECKS = 1")
+    for sentencia in _sentencias_create():
+        cur.execute(sentencia)
+    conn.commit()
+    cur.close()
+    esquema.aplicar(conn)
+
+
+def crear_esquema_sqlite(conn):
+    """Recrea las tablas de database_sqlite.sql y las migraciones (sin datos de ejemplo)"""
+    cur = conn.cursor()
+    cur.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite!_%%' ESCAPE '!'")
+    tablas = [fila[0] for fila in cur.fetchall()]
+    cur.execute("PRAGMA foreign_keys = OFF")
+    for tabla in tablas:
+        cur.execute(f'DROP TABLE IF EXISTS "{tabla}"')
+    cur.execute("PRAGMA foreign_keys = ON")
+    conn.begin()
+    for sentencia in _sentencias_create(ESQUEMA_SQLITE):
+        cur.execute(sentencia)
+    conn.commit()
+    cur.close()
+    esquema.aplicar(conn)
+
+
+def sembrar(conn, disciplinas=30, horarios_por_disciplina=15, semanas=26, semilla=1):
+    """Llena la base y devuelve la cantidad de filas generadas por tabla"""
+    azar = random.Random(semilla)
+    cur = conn.cursor()
+
+    conn.begin()
+    cur.execute("INSERT INTO administradores (usuario, password_hash, email) VALUES (%s, %s, %s)",
+                [ADMIN_USUARIO, generate_password_hash(ADMIN_PASSWORD), 'bench@gimnasio.com'])
+
+    cur.executemany("INSERT INTO disciplinas (nombre, descripcion, activa) VALUES (%s, %s, %s)",
+                    [(f'Disciplina {i}', f'Clase de prueba número {i}', i % 10 != 0)
+                     for i in range(1, disciplinas + 1)])
+    cur.execute("SELECT id FROM disciplinas ORDER BY id")
+    ids_disciplinas = [fila[0] for fila in cur.fetchall()]
+
+    horarios = []
+    for disciplina_id in ids_disciplinas:
+        combinaciones = azar.sample([(d, h) for d in DIAS_SEMANA for h in HORAS], horarios_por_disciplina)
+        horarios += [(disciplina_id, dia, hora, azar.choice((8, 10, 12, 15, 20))) for dia, hora in combinaciones]
+    cur.executemany("""
+        INSERT INTO horarios (disciplina_id, dia_semana, hora_inicio, cupo_maximo)
+        VALUES (%s, %s, %s, %s)
+    """, horarios)
+    cur.execute("SELECT id, disciplina_id, dia_semana, hora_inicio, cupo_maximo FROM horarios")
+    por_dia = {}
+    for horario_id, disciplina_id, dia, hora, cupo in cur.fetchall():
+        por_dia.setdefault(dia, []).append((horario_id, disciplina_id, hora, cupo))
+    conn.commit()
+
+    # Reservas históricas: cada clase pasada con entre 0 y su cupo de inscriptos
+    reservas = 0
+    lote = []
+    dni = 20000000
+    hoy = date.today()
+    fecha = hoy - timedelta(weeks=semanas)
+    while fecha < hoy:
+        for horario_id, disciplina_id, hora, cupo in por_dia.get(DIAS_SEMANA[fecha.weekday()], []):
+            for _ in range(azar.randint(0, cupo)):
+                dni += 1
+                estado = azar.choices(('confirmada', 'cancelada', 'pendiente'), (85, 10, 5))[0]
+                lote.append((horario_id, disciplina_id, fecha, hora, azar.choice(NOMBRES), azar.choice(APELLIDOS),
+                             str(dni), estado))
+            if len(lote) >= TAMANO_LOTE:
+                reservas += _insertar_reservas(conn, cur, lote)
+                lote = []
+        fecha += timedelta(days=1)
+    reservas += _insertar_reservas(conn, cur, lote)
+    cur.close()
+
+    return {
+        'disciplinas': len(ids_disciplinas),
+        'horarios': len(horarios),
+        'reservas': reservas,
+        'ocupacion_resumen': resumenes.reconstruir(conn),
+    }
+
+
+def _insertar_reservas(conn, cur, filas):
+    if filas:
+        conn.begin()
+        cur.executemany("""
+            INSERT INTO reservas (horario_id, disciplina_id, fecha_clase, hora_inicio, nombre, apellido, dni, estado)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """, filas)
+        conn.commit()
+    return len(filas)
+
+
+def catalogo(conn):
+    """Disciplinas activas y sus horarios, para elegir qué pedir en los escenarios"""
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT h.id, h.disciplina_id, h.dia_semana, h.cupo_maximo
+        FROM horarios h JOIN disciplinas d ON h.disciplina_id = d.id
+        WHERE d.activa = TRUE
+    """)
+    horarios = cur.fetchall()
+    cur.close()
+    return {
+        'disciplinas': sorted({h[1] for h in horarios}),
+        'horarios': horarios,
+    }
+
+
+def slot_libre(conn, horario):
+    """Primera fecha futura del horario sin ninguna reserva (para la ráfaga)"""
+    horario_id, _, dia, _ = horario
+    cur = conn.cursor()
+    cur.execute("SELECT DISTINCT fecha_clase FROM reservas WHERE horario_id = %s AND fecha_clase > %s",
+                [horario_id, date.today()])
+    ocupadas = {fila[0] for fila in cur.fetchall()}
+    cur.close()
+    fecha = date.today() + timedelta(days=1)
+    while DIAS_SEMANA[fecha.weekday()] != dia or fecha in ocupadas:
+        fecha += timedelta(days=1)
+    return fecha
+
+
+def ocupados(conn, horario_id, fecha):
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT COUNT(*) FROM reservas
+        WHERE horario_id = %s AND fecha_clase = %s AND estado != 'cancelada'
+    """, [horario_id, fecha])
+    total = cur.fetchone()[0]
+    cur.close()
+    conn.commit()  # cerrar el snapshot para la próxima lectura
+    return total
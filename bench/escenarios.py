@@ -0,0 +1,203 @@
+"""
+Escenarios de carga contra la aplicación por HTTP.
+
+Cada escenario lanza N tareas con C hilos concurrentes; cada hilo usa su
+propio cliente (con sus cookies). Las latencias se agrupan por ruta y se
+resumen en p50/p95/p99 y pedidos por segundo.
+"""
+
+import http.cookiejar
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from bench import datos
+
+
+class _SinRedirecciones(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Cliente:
+    """Cliente HTTP mínimo: no sigue redirecciones y conserva cookies"""
+
+    def __init__(self, base):
+        self.base = base.rstrip('/')
+        self._opener = urllib.request.build_opener(
+            _SinRedirecciones, urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def pedir(self, ruta, datos=None, headers=None):
+        """Devuelve (status, headers, cuerpo). datos: dict -> POST de formulario"""
+        cuerpo = urllib.parse.urlencode(datos, doseq=True).encode() if datos is not None else None
+        pedido = urllib.request.Request(self.base + ruta, data=cuerpo, headers=headers or {})
+        try:
+            with self._opener.open(pedido, timeout=60) as respuesta:
+                return respuesta.status, respuesta.headers, respuesta.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers, e.read()
+
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return None
+    indice = min(len(ordenados) - 1, max(0, int(round(p / 100 * len(ordenados))) - 1))
+    return ordenados[indice]
+
+
+class Registro:
+    """Latencias por ruta, seguro entre hilos"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._muestras = {}
+        self._errores = {}
+
+    def medir(self, etiqueta, cliente, ruta, datos=None, headers=None):
+        inicio = time.perf_counter()
+        try:
+            status, cabeceras, cuerpo = cliente.pedir(ruta, datos, headers)
+            error = status >= 500
+        except OSError:
+            status, cabeceras, cuerpo, error = None, {}, b'', True
+        transcurrido = time.perf_counter() - inicio
+        with self._lock:
+            self._muestras.setdefault(etiqueta, []).append(transcurrido)
+            if error:
+                self._errores[etiqueta] = self._errores.get(etiqueta, 0) + 1
+        return status, cabeceras, cuerpo
+
+    def resumen(self, duracion):
+        rutas = {}
+        for etiqueta, muestras in sorted(self._muestras.items()):
+            ordenadas = sorted(muestras)
+            rutas[etiqueta] = {
+                'pedidos': len(ordenadas),
+                'errores': self._errores.get(etiqueta, 0),
+                'rps': round(len(ordenadas) / duracion, 1) if duracion else None,
+                'p50_ms': round(_percentil(ordenadas, 50) * 1000, 2),
+                'p95_ms': round(_percentil(ordenadas, 95) * 1000, 2),
+                'p99_ms': round(_percentil(ordenadas, 99) * 1000, 2),
+                'max_ms': round(ordenadas[-1] * 1000, 2),
+            }
+        return rutas
+
+
+def correr(url, tarea, total, concurrencia):
+    """Ejecuta tarea(registro, cliente, i) total veces; devuelve (registro, duración)"""
+    registro = Registro()
+    local = threading.local()
+
+    def ejecutar(i):
+        if not hasattr(local, 'cliente'):
+            local.cliente = Cliente(url)
+        tarea(registro, local.cliente, i)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as executor:
+        for futuro in [executor.submit(ejecutar, i) for i in range(total)]:
+            futuro.result()
+    return registro, time.perf_counter() - inicio
+
+
+# ---------- Escenarios ----------
+
+def rafaga_reservas(url, conn, catalogo, total, concurrencia, azar):
+    """Muchos clientes reservan a la vez la misma clase recién abierta.
+
+    Verifica después contra la base que no se haya superado el cupo y que
+    se hayan admitido exactamente min(cupo, pedidos) reservas.
+    """
+    horario = azar.choice(catalogo['horarios'])
+    horario_id, disciplina_id, _, cupo = horario
+    fecha = datos.slot_libre(conn, horario)
+    referer = {'Referer': f'{url}/reservar/{disciplina_id}'}
+    admitidas = []
+
+    def tarea(registro, cliente, i):
+        status, cabeceras, _ = registro.medir('POST /confirmar_reserva', cliente, '/confirmar_reserva', {
+            'horario_id': horario_id, 'fecha_clase': fecha.isoformat(),
+            'nombre': 'Bench', 'apellido': 'Rafaga', 'dni': str(90000000 + i),
+        }, referer)
+        # Éxito redirige al inicio; un rechazo vuelve al Referer
+        if status == 302 and urllib.parse.urlparse(cabeceras.get('Location', '')).path == '/':
+            admitidas.append(i)
+
+    registro, duracion = correr(url, tarea, total, concurrencia)
+    en_base = datos.ocupados(conn, horario_id, fecha)
+    return {
+        'duracion_s': round(duracion, 3),
+        'rutas': registro.resumen(duracion),
+        'verificacion': {
+            'horario_id': horario_id,
+            'fecha_clase': fecha.isoformat(),
+            'cupo': cupo,
+            'pedidos': total,
+            'admitidas_http': len(admitidas),
+            'ocupados_base': en_base,
+            'cupo_respetado': en_base <= cupo,
+            'admision_completa': en_base == min(cupo, total),
+        },
+    }
+
+
+def carga_reservar(url, conn, catalogo, total, concurrencia, azar):
+    """Página de reserva de una disciplina más sus consultas de disponibilidad"""
+    semilla = azar.random()
+    lunes = date.today() - timedelta(days=date.today().weekday())
+    domingo = lunes + timedelta(days=6)
+
+    def tarea(registro, cliente, i):
+        local = random.Random(semilla + i)
+        horario_id, disciplina_id, dia, _ = local.choice(catalogo['horarios'])
+        fecha = lunes + timedelta(days=datos.DIAS_SEMANA.index(dia))
+        registro.medir('GET /reservar/<id>', cliente, f'/reservar/{disciplina_id}')
+        registro.medir('GET /disponibilidad/<id>', cliente,
+                       f'/disponibilidad/{disciplina_id}?desde={lunes}&hasta={domingo}')
+        registro.medir('GET /check_disponibilidad/<id>/<fecha>', cliente,
+                       f'/check_disponibilidad/{horario_id}/{fecha}')
+
+    registro, duracion = correr(url, tarea, total, concurrencia)
+    return {'duracion_s': round(duracion, 3), 'rutas': registro.resumen(duracion)}
+
+
+def listado_admin(url, conn, catalogo, total, concurrencia, azar):
+    """Listado de reservas del admin con filtros variados y paginación"""
+    semilla = azar.random()
+
+    def tarea(registro, cliente, i):
+        if not getattr(cliente, 'logueado', False):
+            registro.medir('POST /admin/login', cliente, '/admin/login',
+                           {'usuario': datos.ADMIN_USUARIO, 'password': datos.ADMIN_PASSWORD})
+            cliente.logueado = True
+
+        local = random.Random(semilla + i)
+        filtros = local.choice([
+            {},
+            {'disciplina_id': local.choice(catalogo['disciplinas'])},
+            {'estado': local.choice(('confirmada', 'pendiente', 'cancelada'))},
+            {'q': str(local.randint(20, 29))},
+            {'q': local.choice(datos.APELLIDOS)[:3]},
+        ])
+        _, _, cuerpo = registro.medir('GET /admin/reservas', cliente,
+                                      '/admin/reservas?' + urllib.parse.urlencode(filtros))
+        siguiente = re.search(rb'href="(/admin/reservas\?[^"]*despues=[^"]*)"', cuerpo)
+        if siguiente:
+            ruta = siguiente.group(1).decode().replace('&amp;', '&')
+            registro.medir('GET /admin/reservas (página 2)', cliente, ruta)
+
+    registro, duracion = correr(url, tarea, total, concurrencia)
+    return {'duracion_s': round(duracion, 3), 'rutas': registro.resumen(duracion)}
+
+
+ESCENARIOS = {
+    'rafaga_reservas': rafaga_reservas,
+    'reservar': carga_reservar,
+    'admin_listado': listado_admin,
+}
@@ -0,0 +1,228 @@
+"""
+Revisión de los planes de las consultas frecuentes (python -m bench --planes).
+
+Corre las consultas del Repositorio que sostienen las rutas más usadas
+(disponibilidad, admisión de reservas, listado admin, totales y dashboard)
+contra la base de benchmark, ya sembrada con volumen, y pide el plan de cada
+SELECT que ejecutan (EXPLAIN en MySQL/MariaDB, EXPLAIN QUERY PLAN en SQLite).
+Las consultas que escriben (la admisión) se deshacen al terminar: la base no
+cambia. Falla si alguna recorre entera una tabla grande o necesita ordenar aparte
+(filesort, o árbol temporal para el ORDER BY), salvo lo permitido para esa
+consulta. Sirve como prueba de regresión al cambiar consultas o índices.
+
+Recorrer un índice en orden está bien si la consulta tiene LIMIT (es la
+paginación por clave): se corta al llenar la página.
+"""
+
+import re
+from collections import namedtuple
+from datetime import date, timedelta
+
+import dialectos
+from repositorio import DIAS_SEMANA, Repositorio
+
+RECORRIDO = 'recorrido'
+ORDEN = 'orden'
+
+# Tablas (o alias) que no crecen con el uso: no importa cómo se lean
+CHICAS = {'horarios', 'disciplinas', 'administradores', 'schema_migraciones', 'h', 'd'}
+
+_DETALLE_SQLITE = re.compile(r'^(SCAN|SEARCH) (?:TABLE )?(\w+)(?: AS (\w+))?')
+
+Consulta = namedtuple('Consulta', 'nombre ejecutar permitido escribe', defaults=(False,))
+Contexto = namedtuple('Contexto', 'hoy lunes horario_id disciplina_id ultima_clase proxima_clase')
+
+
+class _CursorGrabador:
+    def __init__(self, cur, sentencias):
+        self._cur = cur
+        self._sentencias = sentencias
+
+    def execute(self, sql, args=None):
+        if sql.lstrip().upper().startswith('SELECT'):
+            self._sentencias.append((sql, args))
+        return self._cur.execute(sql, args)
+
+    def __getattr__(self, nombre):
+        return getattr(self._cur, nombre)
+
+
+class _ConexionGrabadora:
+    """Conexión que anota los SELECT que se ejecutan con sus cursores.
+
+    Con descartar=True, commit() deshace la transacción en lugar de confirmarla.
+    """
+
+    def __init__(self, conn, sentencias):
+        self._conn = conn
+        self._sentencias = sentencias
+        self.descartar = False
+
+    def cursor(self, *args):
+        # Siempre el cursor común: con una sola conexión, dos lecturas streaming
+        # abiertas a la vez (la exportación con el archivo) no se podrían hacer
+        return _CursorGrabador(self._conn.cursor(), self._sentencias)
+
+    def commit(self):
+        if self.descartar:
+            self._conn.rollback()
+        else:
+            self._conn.commit()
+
+    def __getattr__(self, nombre):
+        return getattr(self._conn, nombre)
+
+
+class _PoolGrabador:
+    """Pool de una sola conexión, con la interfaz que usa el Repositorio"""
+
+    def __init__(self, conn):
+        self.sentencias = []
+        self.connection = _ConexionGrabadora(conn, self.sentencias)
+
+    def checkout(self):
+        return self.connection
+
+    def checkin(self, conn):
+        pass
+
+
+def _listado(filtros, siguiente=False):
+    def ejecutar(repo, ctx):
+        despues = None
+        if siguiente:
+            ultima = repo.pagina_reservas(filtros, None, 50)[-1]
+            despues = (ultima.fecha_clase, ultima.hora_inicio.strftime('%H:%M:%S'), ultima.id)
+        return repo.pagina_reservas(filtros, despues, 50)
+    return ejecutar
+
+
+CONSULTAS = [
+    Consulta('disponibilidad de una clase',
+             lambda repo, ctx: repo.contar_reservas(ctx.horario_id, ctx.ultima_clase), ()),
+    Consulta('disponibilidad de la semana',
+             lambda repo, ctx: repo.conteos_ocupacion(
+                 [h.id for h in repo.horarios_disciplina(ctx.disciplina_id)],
+                 ctx.lunes, ctx.lunes + timedelta(days=6)), ()),
+    Consulta('carga de la ocupación compartida',
+             lambda repo, ctx: repo.conteos_desde(ctx.hoy - timedelta(days=7)), ()),
+    Consulta('admisión de una reserva',
+             lambda repo, ctx: repo.admitir_reserva(ctx.horario_id, ctx.proxima_clase,
+                                                    'Plan', 'Revisión', '99999999'), (), True),
+    Consulta('listado admin', _listado({}), ()),
+    Consulta('listado admin, página siguiente', _listado({}, siguiente=True), ()),
+    Consulta('listado por disciplina', lambda repo, ctx: _listado({'disciplina_id': ctx.disciplina_id})(repo, ctx), ()),
+    Consulta('listado por estado', _listado({'estado': 'pendiente'}), ()),
+    Consulta('listado por rango de fechas',
+             lambda repo, ctx: _listado({'desde': ctx.hoy - timedelta(days=30), 'hasta': ctx.hoy})(repo, ctx), ()),
+    # Búsqueda por prefijo de DNI: usa el índice de dni y ordena las coincidencias
+    Consulta('búsqueda por DNI', _listado({'q': '2000'}), {ORDEN}),
+    # Sin filtros los totales cuentan todas las reservas: recorren un índice
+    Consulta('totales del listado', lambda repo, ctx: repo.resumen_reservas({}), {RECORRIDO}),
+    Consulta('totales por disciplina',
+             lambda repo, ctx: repo.resumen_reservas({'disciplina_id': ctx.disciplina_id}), ()),
+    Consulta('exportación por rango de fechas',
+             lambda repo, ctx: list(repo.filas_exportacion({'desde': ctx.hoy - timedelta(days=30),
+                                                             'hasta': ctx.hoy})), ()),
+    Consulta('dashboard: total por estado', lambda repo, ctx: repo.total_por_estado('confirmada'), ()),
+    Consulta('dashboard: panel de ocupación',
+             lambda repo, ctx: repo.panel_ocupacion(ctx.hoy - timedelta(days=27), ctx.hoy), ()),
+]
+
+
+def _analizar(conn):
+    """Actualiza las estadísticas del optimizador después de sembrar"""
+    cur = conn.cursor()
+    if dialectos.de(conn).nombre == 'sqlite':
+        cur.execute("ANALYZE")
+    else:
+        cur.execute("ANALYZE TABLE reservas, reservas_archivo, ocupacion_resumen, horarios, disciplinas")
+        cur.fetchall()
+    conn.commit()
+    cur.close()
+
+
+def _contexto(repo):
+    """Horario con historia y fechas de ejemplo para las consultas"""
+    hoy = date.today()
+    horario = repo.horarios()[0]
+    dia = DIAS_SEMANA.index(horario.dia_semana)
+    ultima = hoy - timedelta(days=(hoy.weekday() - dia) % 7 or 7)
+    return Contexto(hoy, hoy - timedelta(days=hoy.weekday()), horario.id, horario.disciplina_id,
+                    ultima, ultima + timedelta(weeks=2))
+
+
+def _problemas_mysql(cur, sql, args):
+    cur.execute('EXPLAIN ' + sql, args)
+    columnas = [c[0].lower() for c in cur.description]
+    filas = [dict(zip(columnas, fila)) for fila in cur.fetchall()]
+    con_limite = re.search(r'\bLIMIT\b', sql, re.IGNORECASE)
+    problemas = []
+    grandes = [f for f in filas if f['table'] and f['table'] not in CHICAS and not f['table'].startswith('<')]
+    for fila in grandes:
+        if fila['type'] == 'ALL' or (fila['type'] == 'index' and not con_limite):
+            problemas.append((RECORRIDO, f"recorre {fila['table']} ({fila['type']}, {fila['key'] or 'sin índice'})"))
+    if grandes and any('Using filesort' in (f['extra'] or '') for f in filas):
+        problemas.append((ORDEN, 'ordena aparte (Using filesort)'))
+    plan = [f"{f['table']}: {f['type']} {f['key'] or ''} {f['extra'] or ''}" for f in filas]
+    return problemas, plan
+
+
+def _problemas_sqlite(cur, sql, args):
+    cur.execute('EXPLAIN QUERY PLAN ' + sql, args)
+    detalles = [fila[-1] for fila in cur.fetchall()]
+    con_limite = re.search(r'\bLIMIT\b', sql, re.IGNORECASE)
+    problemas = []
+    grandes = False
+    for detalle in detalles:
+        coincidencia = _DETALLE_SQLITE.match(detalle)
+        if not coincidencia or coincidencia.group(2) == 'CONSTANT':
+            continue
+        if coincidencia.group(2) in CHICAS or coincidencia.group(3) in CHICAS:
+            continue
+        grandes = True
+        if coincidencia.group(1) == 'SCAN' and ('INDEX' not in detalle or not con_limite):
+            problemas.append((RECORRIDO, f'recorre: {detalle}'))
+    if grandes and any('TEMP B-TREE' in d and 'ORDER BY' in d for d in detalles):
+        problemas.append((ORDEN, 'ordena aparte (TEMP B-TREE FOR ORDER BY)'))
+    return problemas, detalles
+
+
+def revisar(conn, salida=print):
+    """Revisa los planes de CONSULTAS; devuelve la cantidad de consultas con problemas"""
+    _analizar(conn)
+    explicar = _problemas_sqlite if dialectos.de(conn).nombre == 'sqlite' else _problemas_mysql
+    pool = _PoolGrabador(conn)
+    repo = Repositorio(pool)
+    ctx = _contexto(repo)
+    fallas = 0
+    for consulta in CONSULTAS:
+        del pool.sentencias[:]
+        pool.connection.descartar = consulta.escribe
+        try:
+            consulta.ejecutar(repo, ctx)
+        finally:
+            pool.connection.descartar = False
+            conn.rollback()
+        encontrados = []
+        planes = []
+        cur = conn.cursor()
+        for sql, args in pool.sentencias:
+            problemas, plan = explicar(cur, sql, args)
+            planes.append((sql, plan))
+            encontrados += [(sql, descripcion) for tipo, descripcion in problemas
+                            if tipo not in consulta.permitido]
+        cur.close()
+        conn.commit()
+        if not encontrados:
+            salida(f'  ok     {consulta.nombre}')
+            continue
+        fallas += 1
+        salida(f'  FALLA  {consulta.nombre}')
+        for _, descripcion in encontrados:
+            salida(f'           {descripcion}')
+        for sql, plan in planes:
+            salida('           ' + ' '.join(sql.split())[:120])
+            for linea in plan:
+                salida(f'             {linea}')
+    return fallas
@@ -0,0 +1,52 @@
+"""
+Caché en proceso del catálogo: disciplinas y grillas de horarios.
+
+El catálogo solo cambia cuando un administrador lo edita, así que cada
+proceso lo guarda en memoria junto con las grillas ya armadas y los
+fragmentos de HTML renderizados. Todo queda asociado a un número de versión
+compartido entre procesos (ContadorCompartido); las rutas admin que modifican
+disciplinas u horarios lo incrementan y cada proceso recarga en su próximo
+request.
+"""
+
+import threading
+
+
+class CacheCatalogo:
+    def __init__(self, contador):
+        self._contador = contador
+        self._lock = threading.Lock()
+        self._version = None
+        self._datos = None
+        self._fragmentos = {}
+
+    def version(self):
+        return self._contador.valor()
+
+    def obtener(self, cargar):
+        """Devuelve el catálogo vigente; llama a cargar() si cambió la versión"""
+        version = self._contador.valor()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    # Si alguien invalida durante la carga, la versión guardada
+                    # queda vieja y el próximo request vuelve a cargar
+                    self._datos = cargar()
+                    self._fragmentos = {}
+                    self._version = version
+        return self._datos
+
+    def fragmento(self, clave, renderizar):
+        """HTML cacheado para la versión actual del catálogo"""
+        version = self._contador.valor()
+        fragmentos = self._fragmentos
+        if self._version == version and clave in fragmentos:
+            return fragmentos[clave]
+        html = renderizar()
+        if self._version == version:
+            fragmentos[clave] = html
+        return html
+
+    def invalidar(self):
+        """Incrementa la versión: todos los procesos descartan su caché"""
+        self._contador.incrementar()
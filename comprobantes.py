@@ -0,0 +1,128 @@
+"""
+Almacenamiento de comprobantes de pago.
+
+Los archivos se copian por bloques a un temporal mientras se calcula su
+SHA-256 y se guardan con el hash como nombre, en subcarpetas de dos niveles
+(ab/cd/abcd....pdf) para que ningún directorio junte decenas de miles de
+archivos. Si el mismo comprobante se sube dos veces, se guarda una sola.
+El temporal vive fuera de static/ (nunca se sirve a medio escribir), en el
+mismo sistema de archivos para que el paso al nombre final sea atómico.
+
+Un comprobante nuevo cuya reserva no se admite se descarta (ver descartar).
+
+La validación del contenido y la generación de miniaturas se hacen en un
+pool de hilos, fuera del request. Las miniaturas requieren Pillow; si no
+está instalado, solo se valida.
+"""
+
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow es opcional
+    Image = None
+
+TAMANO_BLOQUE = 64 * 1024
+TAMANO_MINIATURA = (160, 160)
+
+# Primeros bytes esperados según la extensión
+FIRMAS = {
+    'pdf': (b'%PDF-',),
+    'png': (b'\x89PNG\r\n\x1a\n',),
+    'jpg': (b'\xff\xd8\xff',),
+}
+
+
+def _extension(filename):
+    ext = filename.rsplit('.', 1)[1].lower()
+    return 'jpg' if ext == 'jpeg' else ext
+
+
+class AlmacenComprobantes:
+    def __init__(self, carpeta, temporal, workers=2):
+        self.carpeta = carpeta
+        self._tmp = temporal
+        os.makedirs(self._tmp, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='comprobantes')
+
+    def guardar(self, archivo):
+        """Guarda un FileStorage; devuelve (ruta relativa a la carpeta, nuevo).
+
+        nuevo es False si el mismo archivo ya estaba guardado.
+        """
+        ext = _extension(archivo.filename)
+        fd, tmp = tempfile.mkstemp(dir=self._tmp)
+        sha = hashlib.sha256()
+        try:
+            with os.fdopen(fd, 'wb') as destino:
+                while True:
+                    bloque = archivo.stream.read(TAMANO_BLOQUE)
+                    if not bloque:
+                        break
+                    sha.update(bloque)
+                    destino.write(bloque)
+
+            digest = sha.hexdigest()
+            relativa = f"{digest[:2]}/{digest[2:4]}/{digest}.{ext}"
+            final = os.path.join(self.carpeta, relativa)
+            if os.path.exists(final):
+                os.remove(tmp)  # Ya estaba guardado
+                return relativa, False
+            os.makedirs(os.path.dirname(final), exist_ok=True)
+            os.replace(tmp, final)
+            self._executor.submit(self._procesar, final, ext)
+            return relativa, True
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def _procesar(self, path, ext):
+        """Valida el contenido y genera la miniatura (en segundo plano)"""
+        try:
+            with open(path, 'rb') as f:
+                cabecera = f.read(16)
+        except FileNotFoundError:
+            return  # Descartado antes de procesarlo
+        if not cabecera.startswith(FIRMAS[ext]):
+            # No se borra: la reserva ya lo referencia. Se marca para el admin.
+            open(path + '.invalido', 'w').close()
+            return
+
+        if Image is None or ext == 'pdf':
+            return
+        try:
+            with Image.open(path) as img:
+                img.thumbnail(TAMANO_MINIATURA)
+                img.convert('RGB').save(path + '.thumb.jpg', 'JPEG', quality=80)
+        except (OSError, ValueError):
+            open(path + '.invalido', 'w').close()
+        if not os.path.exists(path):
+            self._borrar(path)  # Descartado mientras se procesaba
+
+    def _borrar(self, path):
+        for archivo in (path, path + '.thumb.jpg', path + '.invalido'):
+            try:
+                os.remove(archivo)
+            except FileNotFoundError:
+                pass
+
+    def descartar(self, relativa):
+        """Borra un comprobante y sus derivados.
+
+        Solo para uno recién guardado (nuevo) que ninguna reserva referencia:
+        el que llama lo verifica en la base.
+        """
+        self._borrar(os.path.join(self.carpeta, relativa))
+
+    def miniatura(self, relativa):
+        """Ruta relativa de la miniatura, o None si no existe (todavía)"""
+        if relativa and os.path.exists(os.path.join(self.carpeta, relativa + '.thumb.jpg')):
+            return relativa + '.thumb.jpg'
+        return None
+
+    def es_invalido(self, relativa):
+        return bool(relativa) and os.path.exists(os.path.join(self.carpeta, relativa + '.invalido'))
@@ -0,0 +1,193 @@
+"""
+Verificación de contraseñas de administrador fuera del worker web.
+
+Con los parámetros de werkzeug (scrypt, n=32768) cada verificación usa
+decenas de milisegundos de CPU y 32 MB de memoria. Para que una ráfaga de
+logins, legítima o no, no frene las rutas de reserva:
+
+- las verificaciones corren en un pool chico de procesos, con un límite de
+  pedidos pendientes; por encima se rechaza sin calcular nada. Los procesos
+  salen de un forkserver (spawn donde no lo hay), nunca de un fork del
+  worker con sus hilos y locks tomados,
+- LimitadorIntentos corta los intentos repetidos por usuario y por IP antes
+  de llegar al pool,
+- si el hash guardado usa otros parámetros que los configurados, se
+  recalcula después de un login correcto.
+
+Los límites son por proceso.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+METODO = 'scrypt:32768:8:1'  # el de generate_password.py, con sus parámetros
+MAX_CLAVES = 10000  # al superarlas se descartan las que ya no tienen intentos
+
+
+# Parámetros que werkzeug completa cuando el método no los trae
+PARAMETROS_POR_DEFECTO = {
+    'scrypt': ['32768', '8', '1'],
+    'pbkdf2': ['sha256', str(DEFAULT_PBKDF2_ITERATIONS)],
+}
+
+
+class VerificadorSaturado(Exception):
+    pass
+
+
+def normalizar_metodo(metodo):
+    """Método con todos sus parámetros explícitos: 'scrypt' -> 'scrypt:32768:8:1'"""
+    partes = metodo.split(':')
+    defecto = PARAMETROS_POR_DEFECTO.get(partes[0], [])
+    return ':'.join(partes + defecto[len(partes) - 1:])
+
+
+def _contexto_procesos():
+    metodos = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in metodos else 'spawn')
+
+
+def _verificar(password_hash, password):
+    return check_password_hash(password_hash, password)
+
+
+def _generar(password, metodo):
+    return generate_password_hash(password, method=metodo)
+
+
+class VerificadorPasswords:
+    def __init__(self, workers=2, cola=8, timeout=10.0, metodo=METODO):
+        self.workers = workers
+        self.cola = cola
+        self.timeout = timeout
+        self.metodo = metodo
+        self._metodo_normalizado = normalizar_metodo(metodo)
+        self._lock = threading.Lock()
+        self._lock_pool = threading.Lock()  # solo para crear el pool
+        self._executor = None
+        self._pid = None
+        self._pendientes = 0
+        self._stats = {'verificaciones': 0, 'rehash': 0, 'rechazos': 0}
+
+    def _pool(self):
+        # Uno por proceso: el creado antes de un fork no sirve en el hijo.
+        # Con su propio lock: crearlo arranca procesos y no debe frenar a _lock
+        with self._lock_pool:
+            if self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=_contexto_procesos())
+                self._pid = os.getpid()
+            return self._executor
+
+    def _descartar_pool(self, executor):
+        # Un proceso murió: se recrea el pool en el próximo pedido
+        with self._lock_pool:
+            if self._executor is executor:
+                self._pid = None
+
+    def _terminado(self, _):
+        with self._lock:
+            self._pendientes -= 1
+
+    def _ejecutar(self, funcion, *args):
+        """Corre funcion en el pool; VerificadorSaturado si no hay lugar o no termina a tiempo"""
+        # Bajo el lock solo se reserva el lugar; el pool y el submit van afuera
+        with self._lock:
+            if self._pendientes >= self.workers + self.cola:
+                self._stats['rechazos'] += 1
+                raise VerificadorSaturado()
+            self._pendientes += 1
+        executor = None
+        try:
+            executor = self._pool()
+            futuro = executor.submit(funcion, *args)
+        except BrokenProcessPool:
+            self._terminado(None)
+            self._descartar_pool(executor)
+            raise VerificadorSaturado()
+        except BaseException:
+            self._terminado(None)
+            raise
+        # Se descuenta al terminar de verdad, aunque el request ya no espere
+        # (fuera del lock: si ya terminó, el callback corre en el acto)
+        futuro.add_done_callback(self._terminado)
+        try:
+            return futuro.result(self.timeout)
+        except TimeoutError:
+            futuro.cancel()
+            raise VerificadorSaturado()
+        except BrokenProcessPool:
+            self._descartar_pool(executor)
+            raise VerificadorSaturado()
+
+    def verificar(self, password_hash, password):
+        resultado = self._ejecutar(_verificar, password_hash, password)
+        with self._lock:
+            self._stats['verificaciones'] += 1
+        return resultado
+
+    def generar(self, password):
+        """Hash nuevo con el método configurado"""
+        resultado = self._ejecutar(_generar, password, self.metodo)
+        with self._lock:
+            self._stats['rehash'] += 1
+        return resultado
+
+    def necesita_rehash(self, password_hash):
+        """True si el hash se generó con otro método o parámetros.
+
+        Se comparan los dos lados con los parámetros explícitos: PASSWORD_METODO
+        puede decir solo 'scrypt' y el hash guarda 'scrypt:32768:8:1'.
+        """
+        return normalizar_metodo(password_hash.split('$', 1)[0]) != self._metodo_normalizado
+
+    def estadisticas(self):
+        with self._lock:
+            return dict(self._stats, pendientes=self._pendientes)
+
+
+class LimitadorIntentos:
+    """Intentos por clave (usuario, IP) dentro de una ventana de `ventana` segundos"""
+
+    def __init__(self, ventana):
+        self.ventana = ventana
+        self._lock = threading.Lock()
+        self._intentos = {}  # clave -> deque de instantes
+        self.rechazos = 0
+
+    def _vigentes(self, clave, ahora):
+        intentos = self._intentos.get(clave)
+        if intentos is None:
+            return 0
+        while intentos and intentos[0] <= ahora - self.ventana:
+            intentos.popleft()
+        if not intentos:
+            del self._intentos[clave]
+            return 0
+        return len(intentos)
+
+    def permitir(self, limites):
+        """Anota un intento para cada clave de limites ({clave: máximo});
+        False, sin anotar nada, si alguna ya llegó a su máximo"""
+        ahora = time.monotonic()
+        with self._lock:
+            if any(self._vigentes(clave, ahora) >= maximo for clave, maximo in limites.items()):
+                self.rechazos += 1
+                return False
+            if len(self._intentos) >= MAX_CLAVES:
+                for clave in list(self._intentos):
+                    self._vigentes(clave, ahora)
+            for clave in limites:
+                self._intentos.setdefault(clave, deque()).append(ahora)
+            return True
+
+    def olvidar(self, clave):
+        with self._lock:
+            self._intentos.pop(clave, None)
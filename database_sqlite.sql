@@ -0,0 +1,124 @@
+-- Esquema equivalente a database.sql para el backend SQLite (DB_BACKEND=sqlite).
+-- La aplicación lo ejecuta sola la primera vez que abre una base vacía.
+-- Fechas y horas se guardan como texto ISO ('YYYY-MM-DD', 'HH:MM:SS'), así
+-- que ordenan y comparan igual que en MySQL.
+
+-- Tabla de disciplinas
+CREATE TABLE disciplinas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre VARCHAR(100) NOT NULL,
+    descripcion TEXT,
+    activa BOOLEAN DEFAULT 1,
+    fecha_creacion TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+CREATE INDEX idx_activa ON disciplinas (activa);
+
+-- Tabla de horarios por disciplina
+CREATE TABLE horarios (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    disciplina_id INTEGER NOT NULL REFERENCES disciplinas(id) ON DELETE CASCADE,
+    dia_semana TEXT NOT NULL CHECK (dia_semana IN ('Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo')),
+    hora_inicio TIME NOT NULL,
+    cupo_maximo INTEGER DEFAULT 10
+);
+CREATE INDEX idx_disciplina ON horarios (disciplina_id);
+CREATE INDEX idx_dia ON horarios (dia_semana);
+
+-- Tabla de reservas
+CREATE TABLE reservas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    horario_id INTEGER NOT NULL REFERENCES horarios(id) ON DELETE CASCADE,
+    fecha_clase DATE NOT NULL,
+    nombre VARCHAR(100) NOT NULL,
+    apellido VARCHAR(100) NOT NULL,
+    dni VARCHAR(20) NOT NULL,
+    comprobante_pago VARCHAR(255),
+    fecha_reserva TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    estado TEXT DEFAULT 'confirmada' CHECK (estado IN ('pendiente', 'confirmada', 'cancelada')),
+    CONSTRAINT unique_reserva UNIQUE (horario_id, fecha_clase, dni)
+);
+CREATE INDEX idx_fecha_clase ON reservas (fecha_clase);
+CREATE INDEX idx_dni ON reservas (dni);
+CREATE INDEX idx_estado ON reservas (estado);
+
+-- Tabla de administradores
+CREATE TABLE administradores (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    usuario VARCHAR(50) UNIQUE NOT NULL,
+    password_hash VARCHAR(255) NOT NULL,
+    email VARCHAR(100),
+    fecha_creacion TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+-- Insertar datos de ejemplo
+
+-- Disciplinas
+INSERT INTO disciplinas (nombre, descripcion, activa) VALUES
+('Yoga', 'Clases de yoga para todos los niveles. Mejora tu flexibilidad y encuentra tu paz interior.', 1),
+('Spinning', 'Entrenamiento cardiovascular intenso sobre bicicleta estática. ¡Quema calorías y mejora tu resistencia!', 1),
+('Funcional', 'Entrenamiento funcional y crossfit. Desarrolla fuerza, resistencia y agilidad.', 1),
+('Pilates', 'Fortalecimiento muscular y flexibilidad. Ideal para mejorar postura y core.', 1),
+('Zumba', 'Baile fitness con ritmos latinos. Divertite mientras te ejercitás.', 1),
+('Boxing', 'Boxeo recreativo y fitness. Libera estrés y ponte en forma.', 1);
+
+-- Horarios para Yoga (disciplina_id = 1)
+INSERT INTO horarios (disciplina_id, dia_semana, hora_inicio, cupo_maximo) VALUES
+(1, 'Lunes', '08:00:00', 10),
+(1, 'Lunes', '18:00:00', 10),
+(1, 'Miércoles', '08:00:00', 10),
+(1, 'Miércoles', '18:00:00', 10),
+(1, 'Viernes', '08:00:00', 10),
+(1, 'Viernes', '18:00:00', 10);
+
+-- Horarios para Spinning (disciplina_id = 2)
+INSERT INTO horarios (disciplina_id, dia_semana, hora_inicio, cupo_maximo) VALUES
+(2, 'Martes', '07:00:00', 10),
+(2, 'Martes', '19:00:00', 10),
+(2, 'Jueves', '07:00:00', 10),
+(2, 'Jueves', '19:00:00', 10),
+(2, 'Sábado', '09:00:00', 10);
+
+-- Horarios para Funcional (disciplina_id = 3)
+INSERT INTO horarios (disciplina_id, dia_semana, hora_inicio, cupo_maximo) VALUES
+(3, 'Lunes', '19:00:00', 10),
+(3, 'Miércoles', '19:00:00', 10),
+(3, 'Viernes', '19:00:00', 10);
+
+-- Horarios para Pilates (disciplina_id = 4)
+INSERT INTO horarios (disciplina_id, dia_semana, hora_inicio, cupo_maximo) VALUES
+(4, 'Martes', '09:00:00', 10),
+(4, 'Jueves', '09:00:00', 10);
+
+-- Horarios para Zumba (disciplina_id = 5)
+INSERT INTO horarios (disciplina_id, dia_semana, hora_inicio, cupo_maximo) VALUES
+(5, 'Lunes', '20:00:00', 10),
+(5, 'Miércoles', '20:00:00', 10),
+(5, 'Viernes', '20:00:00', 10);
+
+-- Horarios para Boxing (disciplina_id = 6)
+INSERT INTO horarios (disciplina_id, dia_semana, hora_inicio, cupo_maximo) VALUES
+(6, 'Martes', '20:00:00', 10),
+(6, 'Jueves', '20:00:00', 10),
+(6, 'Sábado', '10:00:00', 10);
+
+-- Crear usuario administrador
+-- Usuario: admin
+-- Contraseña: admin123
+-- IMPORTANTE: Cambiá esta contraseña en producción
+INSERT INTO administradores (usuario, password_hash, email) VALUES
+('admin', 'scrypt:32768:8:1$pQxmHvnOQDvvKvlr$b8b0c3c3e8f9e9e9e9e9e9e9e9e9e9e9e9e9e9e9e9e9e9e9e9e9e9e9e9e9e9e9e9e9e9e9e9e9e9e9e9e9e9e9', 'admin@gimnasio.com');
+
+-- Nota: Para generar un nuevo hash de contraseña, usá este código Python:
+-- from werkzeug.security import generate_password_hash
+-- print(generate_password_hash('tu_contraseña'))
+
+-- Reservas de ejemplo (opcional)
+-- Descomentar para tener datos de prueba
+/*
+INSERT INTO reservas (horario_id, fecha_clase, nombre, apellido, dni, estado) VALUES
+(1, '2024-11-25', 'Juan', 'Pérez', '12345678', 'confirmada'),
+(1, '2024-11-25', 'María', 'González', '23456789', 'confirmada'),
+(2, '2024-11-25', 'Carlos', 'López', '34567890', 'confirmada'),
+(3, '2024-11-27', 'Ana', 'Martínez', '45678901', 'confirmada'),
+(5, '2024-11-26', 'Luis', 'Rodríguez', '56789012', 'confirmada');
+*/
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""
+Diferencias de SQL entre los backends MySQL y SQLite.
+
+Las consultas se escriben en SQL común a los dos motores (CASE en lugar de
+FIELD, CAST(... AS CHAR) en lugar de TIME_FORMAT, LIKE con ESCAPE '!'). Lo
+que no tiene equivalente directo se le pide al dialecto de la conexión:
+`dialectos.de(conn)`.
+"""
+
+import sqlite3
+
+import pymysql
+
+ER_DUP_ENTRY = 1062
+# DDL repetido: tabla, columna o índice ya existente; índice o columna ya borrado
+ER_CAMBIO_APLICADO = (1050, 1060, 1061, 1091)
+
+
+class _MySQL:
+    nombre = 'mysql'
+    # Bloqueo de las filas leídas hasta el fin de la transacción
+    para_actualizar = ' FOR UPDATE'
+
+    def upsert(self, columnas_clave, asignaciones):
+        return f"ON DUPLICATE KEY UPDATE {asignaciones}"
+
+    def maximo(self, *valores):
+        return f"GREATEST({', '.join(valores)})"
+
+    def es_duplicado(self, error):
+        return isinstance(error, pymysql.err.IntegrityError) and error.args[0] == ER_DUP_ENTRY
+
+    def es_cambio_aplicado(self, error):
+        """True si el error de un DDL indica que su cambio ya estaba hecho"""
+        return isinstance(error, pymysql.MySQLError) and bool(error.args) and error.args[0] in ER_CAMBIO_APLICADO
+
+    def cursor_streaming(self, conn):
+        """Cursor que trae las filas del servidor a medida que se leen"""
+        return conn.cursor(pymysql.cursors.SSCursor)
+
+    def particiones_mensuales(self, cur, tabla, desde, hasta):
+        """Agrega a una tabla particionada por RANGE COLUMNS(fecha) una partición
+        por mes, de desde a hasta (inclusive), antes de la partición pmax.
+
+        Solo agrega meses posteriores a la última partición existente: las
+        fechas anteriores caen en la primera. Es DDL: confirma la transacción
+        abierta.
+        """
+        cur.execute("""
+            SELECT PARTITION_NAME FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        """, [tabla])
+        nombres = [fila[0] for fila in cur.fetchall() if fila[0]]
+        if 'pmax' not in nombres:
+            return 0  # tabla sin particionar
+        meses = sorted(nombre for nombre in nombres if nombre != 'pmax')
+        anio, mes = desde.year, desde.month
+        if meses:
+            ultimo = int(meses[-1][1:])
+            anio, mes = divmod(ultimo, 100)
+            anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+        nuevas = []
+        while (anio, mes) <= (hasta.year, hasta.month):
+            siguiente = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+            nuevas.append(f"PARTITION p{anio}{mes:02d} VALUES LESS THAN ('{siguiente[0]}-{siguiente[1]:02d}-01')")
+            anio, mes = siguiente
+        if nuevas:
+            # pmax está vacía (se archiva solo hasta el último mes agregado): es instantáneo
+            cur.execute(f"""
+                ALTER TABLE {tabla} REORGANIZE PARTITION pmax INTO
+                ({', '.join(nuevas)}, PARTITION pmax VALUES LESS THAN (MAXVALUE))
+            """)
+        return len(nuevas)
+
+
+class _SQLite:
+    nombre = 'sqlite'
+    # BEGIN IMMEDIATE ya toma el bloqueo de escritura de toda la base
+    para_actualizar = ''
+
+    def upsert(self, columnas_clave, asignaciones):
+        return f"ON CONFLICT ({columnas_clave}) DO UPDATE SET {asignaciones}"
+
+    def maximo(self, *valores):
+        return f"MAX({', '.join(valores)})"
+
+    def es_duplicado(self, error):
+        return isinstance(error, sqlite3.IntegrityError) and 'UNIQUE' in str(error)
+
+    def es_cambio_aplicado(self, error):
+        mensaje = str(error)
+        return isinstance(error, sqlite3.OperationalError) and (
+            'duplicate column name' in mensaje or 'already exists' in mensaje)
+
+    def cursor_streaming(self, conn):
+        return conn.cursor()
+
+    def particiones_mensuales(self, cur, tabla, desde, hasta):
+        return 0  # SQLite no particiona
+
+
+MYSQL = _MySQL()
+SQLITE = _SQLite()
+
+
+def de(conn):
+    """Dialecto de una conexión (las de PyMySQL sin marcar son MySQL)"""
+    return getattr(conn, 'dialecto', MYSQL)
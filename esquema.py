@@ -0,0 +1,127 @@
+"""
+Migraciones versionadas del esquema.
+
+database.sql (o database_sqlite.sql) crea el esquema base; los cambios
+posteriores son archivos `migraciones/<motor>/NNNN_nombre.sql` que se aplican
+en orden de versión. La tabla `schema_migraciones` registra las aplicadas,
+así que correr las migraciones otra vez solo aplica las pendientes.
+
+En MySQL el DDL confirma la transacción por su cuenta: si una migración se
+corta a la mitad, al repetirla se saltean las sentencias que ya habían
+tenido efecto (tabla, columna o índice existente, o índice ya borrado; ver
+dialectos.es_cambio_aplicado). Por eso cada migración se escribe para poder
+repetirse: los UPDATE de relleno filtran las filas que ya tienen valor.
+
+Los archivos de migración no usan '%' (los cursores lo tratan como marcador).
+"""
+
+import os
+import re
+
+import dialectos
+
+CARPETA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migraciones')
+
+_ARCHIVO = re.compile(r'^(\d{4})_(\w+)\.sql$')
+
+
+def _crear_registro(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migraciones (
+            version INT PRIMARY KEY,
+            nombre VARCHAR(200) NOT NULL,
+            aplicada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def disponibles(motor):
+    """[(version, nombre, path)] de las migraciones del motor, en orden"""
+    carpeta = os.path.join(CARPETA, motor)
+    migraciones = []
+    for archivo in sorted(os.listdir(carpeta)):
+        coincidencia = _ARCHIVO.match(archivo)
+        if coincidencia:
+            migraciones.append((int(coincidencia.group(1)), coincidencia.group(2), os.path.join(carpeta, archivo)))
+    return migraciones
+
+
+def sentencias(texto):
+    """Sentencias de un archivo de migración: terminan en ';' al final de la línea"""
+    actual = []
+    for linea in texto.splitlines():
+        if linea.strip().startswith('--'):
+            continue
+        actual.append(linea)
+        if linea.rstrip().endswith(';'):
+            sentencia = '\n'.join(actual).strip().rstrip(';').strip()
+            if sentencia:
+                yield sentencia
+            actual = []
+    resto = '\n'.join(actual).strip()
+    if resto:
+        yield resto
+
+
+def aplicadas(conn):
+    """{version: aplicada_en} de las migraciones registradas"""
+    cur = conn.cursor()
+    try:
+        _crear_registro(cur)
+        cur.execute("SELECT version, aplicada_en FROM schema_migraciones")
+        registradas = dict(cur.fetchall())
+        conn.commit()
+        return registradas
+    finally:
+        cur.close()
+
+
+def estado(conn):
+    """[(version, nombre, aplicada_en o None)] de todas las migraciones del motor"""
+    registradas = aplicadas(conn)
+    return [(version, nombre, registradas.get(version))
+            for version, nombre, _ in disponibles(dialectos.de(conn).nombre)]
+
+
+def pendientes(conn):
+    """[(version, nombre)] de las migraciones sin aplicar"""
+    return [(version, nombre) for version, nombre, aplicada_en in estado(conn) if aplicada_en is None]
+
+
+def aplicar(conn, hasta=None):
+    """Aplica las migraciones pendientes (hasta la versión indicada, si hay).
+
+    Cada una corre en su propia transacción y se registra al terminar; si
+    otro proceso la aplicó mientras tanto, se saltea. Devuelve
+    [(version, nombre)] de las aplicadas.
+    """
+    dialecto = dialectos.de(conn)
+    registradas = aplicadas(conn)
+    pendientes = [(version, nombre, path) for version, nombre, path in disponibles(dialecto.nombre)
+                  if version not in registradas and (hasta is None or version <= hasta)]
+    hechas = []
+    cur = conn.cursor()
+    try:
+        for version, nombre, path in pendientes:
+            with open(path, encoding='utf-8') as f:
+                texto = f.read()
+            conn.begin()
+            cur.execute("SELECT 1 FROM schema_migraciones WHERE version = %s", [version])
+            if cur.fetchone():
+                conn.commit()
+                continue
+            for sentencia in sentencias(texto):
+                try:
+                    cur.execute(sentencia)
+                except Exception as e:
+                    if not dialecto.es_cambio_aplicado(e):
+                        raise
+            cur.execute("INSERT INTO schema_migraciones (version, nombre) VALUES (%s, %s)", [version, nombre])
+            conn.commit()
+            hechas.append((version, nombre))
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return hechas
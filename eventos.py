@@ -0,0 +1,190 @@
+"""
+Eventos de disponibilidad (Server-Sent Events) para la página de reserva.
+
+Cada página abierta se suscribe a una disciplina y semana. Un único hilo por
+proceso (Publicador) lee los cambios de ocupación anotados en
+CambiosCompartidos, por cualquier worker, y los reparte a sus suscriptores:
+un cambio cuesta un evento por página interesada, sin consultas a la base.
+
+Cada suscripción guarda solo el último estado de cada clase, así que un
+cliente lento recibe el valor vigente y no una cola de cambios viejos. Si el
+proceso se atrasa más que el anillo compartido, se pide a los clientes que
+vuelvan a cargar la semana completa.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import date
+
+RECONEXION_MS = 3000  # espera del navegador antes de reconectar
+
+
+def estado_slot(horario_id, fecha, reservas, cupo_maximo):
+    """Disponibilidad de una clase, con el formato de /disponibilidad"""
+    return {
+        'horario_id': horario_id,
+        'fecha': fecha.isoformat(),
+        'reservas': reservas,
+        'disponible': reservas < cupo_maximo,
+        'cupos_restantes': cupo_maximo - reservas,
+        'cupo_maximo': cupo_maximo
+    }
+
+
+def _lunes(fecha):
+    return fecha.toordinal() - fecha.weekday()
+
+
+def _evento(nombre, datos):
+    return f"event: {nombre}\ndata: {json.dumps(datos, separators=(',', ':'))}\n\n"
+
+
+class Suscripcion:
+    def __init__(self, clave):
+        self.clave = clave
+        self._lock = threading.Lock()
+        self._pendientes = {}  # (horario_id, fecha ordinal) -> último estado
+        self._resincronizar = False
+        self._aviso = threading.Event()
+
+    def _entregar(self, horario_id, ordinal, estado):
+        with self._lock:
+            self._pendientes[(horario_id, ordinal)] = estado
+        self._aviso.set()
+
+    def _pedir_resincronizacion(self):
+        with self._lock:
+            self._resincronizar = True
+            self._pendientes = {}
+        self._aviso.set()
+
+    def esperar(self, timeout):
+        """(resincronizar, [estados]) recibidos; vacío si venció el timeout"""
+        self._aviso.wait(timeout)
+        with self._lock:
+            self._aviso.clear()
+            resincronizar, pendientes = self._resincronizar, self._pendientes
+            self._resincronizar, self._pendientes = False, {}
+        return resincronizar, list(pendientes.values())
+
+
+class Publicador:
+    def __init__(self, cambios, ocupacion, max_suscripciones=1000, intervalo=0.25):
+        self.cambios = cambios
+        self.ocupacion = ocupacion
+        self.max_suscripciones = max_suscripciones
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._suscriptores = {}  # (disciplina_id, lunes ordinal) -> set de Suscripcion
+        self._total = 0
+        self._despertar = threading.Event()
+        self._pid = None
+
+    # ---------- Escritores ----------
+
+    def publicar(self, disciplina_id, horario_id, fecha, reservas, cupo_maximo):
+        """Anota la nueva ocupación de una clase (visible para todos los workers)"""
+        self.cambios.anotar(disciplina_id, horario_id, fecha, reservas, cupo_maximo)
+        self._despertar.set()
+
+    # ---------- Suscriptores ----------
+
+    def suscribir(self, disciplina_id, lunes):
+        """Nueva Suscripcion a una disciplina y semana, o None si se alcanzó el máximo"""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._arrancar()
+            if self._total >= self.max_suscripciones:
+                return None
+            suscripcion = Suscripcion((disciplina_id, _lunes(lunes)))
+            self._suscriptores.setdefault(suscripcion.clave, set()).add(suscripcion)
+            self._total += 1
+            return suscripcion
+
+    def cancelar(self, suscripcion):
+        with self._lock:
+            grupo = self._suscriptores.get(suscripcion.clave)
+            if grupo is None or suscripcion not in grupo:
+                return
+            grupo.discard(suscripcion)
+            if not grupo:
+                del self._suscriptores[suscripcion.clave]
+            self._total -= 1
+
+    def suscripciones(self):
+        with self._lock:
+            return self._total
+
+    def flujo(self, suscripcion, inicial, duracion, latido):
+        """Texto SSE: la semana completa y después un evento por cambio.
+
+        Termina después de duracion segundos (el navegador reconecta solo y
+        recibe la semana de nuevo); cada latido segundos sin cambios envía un
+        comentario para detectar conexiones caídas.
+        """
+        yield f"retry: {RECONEXION_MS}\n\n"
+        yield _evento('disponibilidad', inicial)
+        fin = time.monotonic() + duracion
+        while True:
+            restante = fin - time.monotonic()
+            if restante <= 0:
+                return
+            resincronizar, estados = suscripcion.esperar(min(latido, restante))
+            if resincronizar:
+                yield _evento('resincronizar', {})
+            elif estados:
+                yield ''.join(_evento('cambio', estado) for estado in estados)
+            else:
+                yield ': ping\n\n'
+
+    # ---------- Reparto ----------
+
+    def _arrancar(self):
+        # Un hilo por proceso (después de un fork el del padre no existe)
+        self._pid = os.getpid()
+        self._suscriptores = {}
+        self._total = 0
+        self._visto = self.cambios.ultimo()
+        threading.Thread(target=self._bucle, name='publicador-eventos', daemon=True).start()
+
+    def _bucle(self):
+        while True:
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+            try:
+                self._repartir()
+            except Exception:
+                time.sleep(1)  # archivo compartido no disponible: reintentar
+
+    def _repartir(self):
+        with self._lock:
+            hay_suscriptores = bool(self._total)
+        if not hay_suscriptores:
+            self._visto = self.cambios.ultimo()
+            return
+
+        self._visto, cambios, completos = self.cambios.leer_desde(self._visto)
+        if not completos:
+            with self._lock:
+                grupos = [list(grupo) for grupo in self._suscriptores.values()]
+            for grupo in grupos:
+                for suscripcion in grupo:
+                    suscripcion._pedir_resincronizacion()
+            return
+
+        # Último valor de cada clase; si la tabla compartida responde se usa
+        # su valor actual, que incluye cambios anotados fuera de orden
+        ultimos = {}
+        for disciplina_id, horario_id, ordinal, reservas, cupo_maximo in cambios:
+            ultimos[(disciplina_id, horario_id, ordinal)] = (reservas, cupo_maximo)
+        for (disciplina_id, horario_id, ordinal), valores in ultimos.items():
+            fecha = date.fromordinal(ordinal)
+            with self._lock:
+                grupo = list(self._suscriptores.get((disciplina_id, _lunes(fecha)), ()))
+            if not grupo:
+                continue
+            estado = estado_slot(horario_id, fecha, *(self.ocupacion.consultar(horario_id, fecha) or valores))
+            for suscripcion in grupo:
+                suscripcion._entregar(horario_id, ordinal, estado)
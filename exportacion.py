@@ -0,0 +1,127 @@
+"""
+Exportación de reservas en CSV o NDJSON con memoria constante.
+
+Las filas se leen de a lotes con un cursor que avanza sobre la base
+(SSCursor en MySQL; en SQLite, el cursor común) y se van escribiendo a
+medida que llegan: nunca se arma el resultado completo en memoria y los
+primeros bytes salen de inmediato. Cada tabla se lee en el orden de su
+índice (fecha, hora, id), sin ordenar aparte, y las dos se mezclan al vuelo.
+"""
+
+import csv
+import heapq
+import io
+import json
+from datetime import date, datetime, time
+
+import dialectos
+
+COLUMNAS = ['id', 'fecha_clase', 'hora_inicio', 'disciplina', 'nombre', 'apellido',
+            'dni', 'estado', 'comprobante_pago', 'fecha_reserva']
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+TAMANO_LOTE = 1000
+FILAS_POR_BLOQUE = 500  # filas que se agrupan en cada escritura de la respuesta
+
+
+def _valor(valor):
+    if isinstance(valor, time):
+        return valor.strftime('%H:%M')
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return valor
+
+
+def _filas_tabla(conn, tabla, condiciones, params, tamano_lote):
+    """Filas de una tabla en orden (fecha_clase, hora_inicio, id), de a lotes"""
+    where = ('WHERE ' + ' AND '.join(condiciones)) if condiciones else ''
+    cur = dialectos.de(conn).cursor_streaming(conn)
+    # La disciplina con una subconsulta por clave: la lectura sigue siendo de
+    # una sola tabla y recorre su índice de orden
+    cur.execute(f"""
+        SELECT r.id, r.fecha_clase, r.hora_inicio,
+               (SELECT d.nombre FROM disciplinas d WHERE d.id = r.disciplina_id),
+               r.nombre, r.apellido, r.dni, r.estado, r.comprobante_pago, r.fecha_reserva
+        FROM {tabla} r
+        {where}
+        ORDER BY r.fecha_clase, r.hora_inicio, r.id
+    """, params)
+    while True:
+        lote = cur.fetchmany(tamano_lote)
+        if not lote:
+            break
+        yield from lote
+    cur.close()
+
+
+def _orden(fila):
+    return fila[1], fila[2], fila[0]
+
+
+def filas_reservas(pool, fuentes, tamano_lote=TAMANO_LOTE):
+    """Genera las reservas que cumplen las condiciones, en orden cronológico.
+
+    fuentes: lista de (tabla, condiciones sobre `r`, params), una por tabla a
+    leer (reservas y, si hace falta, reservas_archivo). Cada una se lee con
+    su propia conexión del pool (un cursor streaming ocupa la conexión hasta
+    terminar) y las filas se mezclan con heapq.merge.
+
+    Si el consumidor abandona antes de terminar (cliente desconectado), las
+    conexiones se cierran en lugar de leer el resto del resultado.
+    """
+    conexiones = []
+    completo = False
+    try:
+        lectores = []
+        for tabla, condiciones, params in fuentes:
+            conn = pool.checkout()
+            conexiones.append(conn)
+            lectores.append(_filas_tabla(conn, tabla, condiciones, params, tamano_lote))
+        for fila in heapq.merge(*lectores, key=_orden):
+            yield [_valor(v) for v in fila]
+        completo = True
+    finally:
+        for conn in conexiones:
+            if not completo:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            pool.checkin(conn)
+
+
+def generar_csv(filas):
+    """Texto CSV por bloques (con BOM para que Excel detecte UTF-8)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(COLUMNAS)
+    for i, fila in enumerate(filas, 1):
+        writer.writerow(fila)
+        if i % FILAS_POR_BLOQUE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def generar_ndjson(filas):
+    """Un objeto JSON por línea, agrupado por bloques"""
+    bloque = []
+    for fila in filas:
+        bloque.append(json.dumps(dict(zip(COLUMNAS, fila)), ensure_ascii=False))
+        if len(bloque) == FILAS_POR_BLOQUE:
+            yield '\n'.join(bloque) + '\n'
+            bloque = []
+    if bloque:
+        yield '\n'.join(bloque) + '\n'
+
+
+GENERADORES = {
+    'csv': generar_csv,
+    'ndjson': generar_ndjson,
+}
@@ -0,0 +1,131 @@
+"""
+Reintentos del mismo envío de /confirmar_reserva.
+
+El formulario de reserva lleva un token generado al abrir la página. Con el
+token y los datos enviados se arma una clave (ver clave_envio), y el primer
+pedido con esa clave es el único que procesa: los repetidos (doble toque,
+reintento del navegador) devuelven el mismo resultado sin ir a la base ni
+guardar otro comprobante. Si el original todavía está en curso, esperan su
+resultado.
+
+Los resultados se guardan en memoria, por proceso, durante `ttl` segundos y
+hasta `maximo` claves (se descartan primero los más viejos). Los envíos en
+curso también cuentan y no se pueden descartar: si llenan el registro, las
+claves nuevas se rechazan (RegistroLleno) hasta que alguno termine. Un reintento
+que cae en otro worker procesa de nuevo; ahí lo frena la clave única de la
+reserva.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class EnvioEnCurso(Exception):
+    """El pedido original no terminó dentro de la espera"""
+
+
+class RegistroLleno(Exception):
+    """Todas las claves del registro son envíos en curso: no hay lugar para otra"""
+
+
+class _Entrada:
+    __slots__ = ('listo', 'resultado', 'error', 'vence')
+
+    def __init__(self):
+        self.listo = threading.Event()
+        self.resultado = None
+        self.error = None
+        self.vence = None  # None mientras está en curso
+
+
+def clave_envio(token, *campos):
+    """Clave del envío: el mismo token con otros datos es otro envío"""
+    if not token:
+        return None
+    return hashlib.sha256('\x1f'.join([token, *map(str, campos)]).encode()).hexdigest()
+
+
+class RegistroEnvios:
+    def __init__(self, ttl=600, maximo=10000, espera=15.0):
+        self.ttl = ttl
+        self.maximo = maximo
+        self.espera = espera
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()  # clave -> _Entrada, las terminadas en orden de vencimiento
+        self._stats = {'procesados': 0, 'repetidos': 0, 'esperas': 0, 'esperas_agotadas': 0,
+                       'rechazos': 0}
+
+    def _purgar(self, ahora):
+        """Descarta las vencidas y, si no hay lugar para una clave más, las más
+        viejas de las terminadas. Devuelve False si aun así no hay lugar"""
+        sobrantes = len(self._entradas) + 1 - self.maximo
+        vencidas = []
+        for clave, entrada in self._entradas.items():
+            if entrada.vence is None:
+                continue
+            if entrada.vence > ahora and sobrantes <= 0:
+                break
+            vencidas.append(clave)
+            sobrantes -= 1
+        for clave in vencidas:
+            del self._entradas[clave]
+        return len(self._entradas) < self.maximo
+
+    def ejecutar(self, clave, funcion):
+        """Resultado de funcion() para la clave, calculado una sola vez.
+
+        funcion devuelve (resultado, guardar): con guardar=False el resultado
+        se entrega a los que estaban esperando, pero el próximo envío con la
+        misma clave vuelve a procesar (para rechazos pasajeros).
+
+        RegistroLleno si la clave es nueva y el registro está lleno de envíos
+        en curso; funcion no se llama.
+        """
+        with self._lock:
+            ahora = time.monotonic()
+            hay_lugar = self._purgar(ahora)
+            entrada = self._entradas.get(clave)
+            propia = entrada is None or (entrada.vence is not None and entrada.vence <= ahora)
+            if propia:
+                if entrada is None and not hay_lugar:
+                    self._stats['rechazos'] += 1
+                    raise RegistroLleno()
+                entrada = self._entradas[clave] = _Entrada()
+                self._stats['procesados'] += 1
+            else:
+                self._stats['repetidos'] += 1
+                if entrada.vence is None:
+                    self._stats['esperas'] += 1
+
+        if not propia:
+            if not entrada.listo.wait(self.espera):
+                with self._lock:
+                    self._stats['esperas_agotadas'] += 1
+                raise EnvioEnCurso()
+            if entrada.error is not None:
+                raise entrada.error
+            return entrada.resultado
+
+        try:
+            resultado, guardar = funcion()
+        except Exception as e:
+            entrada.error = e
+            with self._lock:
+                self._entradas.pop(clave, None)
+            entrada.listo.set()
+            raise
+        entrada.resultado = resultado
+        with self._lock:
+            if guardar:
+                entrada.vence = time.monotonic() + self.ttl
+                self._entradas.move_to_end(clave)
+            else:
+                self._entradas.pop(clave, None)
+        entrada.listo.set()
+        return resultado
+
+    def estadisticas(self):
+        with self._lock:
+            return dict(self._stats, claves=len(self._entradas))
@@ -0,0 +1,236 @@
+"""
+Importación masiva de reservas y horarios desde CSV.
+
+Las filas se validan en memoria y se insertan por lotes con executemany,
+un lote por transacción. Una fila inválida no aborta el archivo: se informa
+con su número de línea y el motivo, y el resto se importa.
+
+Para reservas, cada lote bloquea los horarios involucrados (FOR UPDATE) y
+relee su ocupación antes de validar cupos y DNI, así que la importación
+respeta los mismos límites que una reserva online aunque corran a la vez.
+"""
+
+import csv
+from collections import namedtuple
+from datetime import datetime
+
+import dialectos
+import resumenes
+
+TAMANO_LOTE = 500
+
+ResultadoImportacion = namedtuple('ResultadoImportacion', ['procesadas', 'insertadas', 'errores'])
+
+
+def leer_csv(archivo):
+    """Itera (número de línea, dict) de un archivo de texto CSV (',' o ';')"""
+    encabezado = archivo.readline()
+    try:
+        dialecto = csv.Sniffer().sniff(encabezado, delimiters=',;')
+    except csv.Error:
+        dialecto = csv.excel
+    columnas = [c.strip().lower() for c in next(csv.reader([encabezado], dialecto))]
+    for numero, valores in enumerate(csv.reader(archivo, dialecto), 2):
+        if not any(v.strip() for v in valores):
+            continue
+        yield numero, {c: v.strip() for c, v in zip(columnas, valores)}
+
+
+def _lotes(filas, tamano=TAMANO_LOTE):
+    for i in range(0, len(filas), tamano):
+        yield filas[i:i + tamano]
+
+
+def _marcadores(cantidad):
+    return ', '.join(['%s'] * cantidad)
+
+
+# ---------- Reservas ----------
+
+def _parsear_reserva(fila, estados):
+    for campo in ('horario_id', 'fecha_clase', 'nombre', 'apellido', 'dni'):
+        if not fila.get(campo):
+            raise ValueError(f'Falta {campo}')
+    try:
+        horario_id = int(fila['horario_id'])
+    except ValueError:
+        raise ValueError('horario_id inválido')
+    try:
+        fecha_clase = datetime.strptime(fila['fecha_clase'], '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('fecha_clase inválida (usar YYYY-MM-DD)')
+    dni = fila['dni']
+    if not dni.isdigit():
+        raise ValueError('DNI inválido')
+    estado = fila.get('estado') or 'confirmada'
+    if estado not in estados:
+        raise ValueError(f'Estado inválido: {estado}')
+    return (horario_id, fecha_clase, fila['nombre'], fila['apellido'], dni,
+            fila.get('comprobante_pago') or None, estado)
+
+
+def importar_reservas(conn, filas, estados):
+    """Importa reservas. filas: iterable de (línea, dict) como las de leer_csv.
+
+    Columnas: horario_id, fecha_clase, nombre, apellido, dni y opcionalmente
+    estado (confirmada por defecto) y comprobante_pago.
+    """
+    errores = []
+    validas = []
+    procesadas = 0
+    for numero, fila in filas:
+        procesadas += 1
+        try:
+            validas.append((numero, _parsear_reserva(fila, estados)))
+        except ValueError as e:
+            errores.append((numero, str(e)))
+
+    insertadas = 0
+    para_actualizar = dialectos.de(conn).para_actualizar
+    cur = conn.cursor()
+    try:
+        for lote in _lotes(validas):
+            aceptadas = []
+            conn.begin()
+
+            # Bloquear los horarios del lote y leer su estado actual
+            ids = sorted({r[0] for _, r in lote})
+            cur.execute(f"""
+                SELECT id, cupo_maximo, disciplina_id, hora_inicio FROM horarios
+                WHERE id IN ({_marcadores(len(ids))})
+            """ + para_actualizar, ids)
+            horarios = {fila[0]: fila[1:] for fila in cur.fetchall()}
+            cupos = {horario_id: cupo for horario_id, (cupo, _, _) in horarios.items()}
+
+            fechas = [r[1] for _, r in lote]
+            cur.execute(f"""
+                SELECT horario_id, fecha_clase, dni, estado FROM reservas
+                WHERE horario_id IN ({_marcadores(len(ids))}) AND fecha_clase BETWEEN %s AND %s
+            """, ids + [min(fechas), max(fechas)])
+            ocupados = {}
+            dnis = set()
+            for horario_id, fecha_clase, dni, estado in cur.fetchall():
+                dnis.add((horario_id, fecha_clase, dni))
+                if estado != 'cancelada':
+                    ocupados[(horario_id, fecha_clase)] = ocupados.get((horario_id, fecha_clase), 0) + 1
+
+            for numero, reserva in lote:
+                horario_id, fecha_clase, _, _, dni, _, estado = reserva
+                slot = (horario_id, fecha_clase)
+                if horario_id not in cupos:
+                    errores.append((numero, f'Horario {horario_id} inexistente'))
+                elif (horario_id, fecha_clase, dni) in dnis:
+                    errores.append((numero, 'DNI duplicado para esa clase'))
+                elif estado != 'cancelada' and ocupados.get(slot, 0) >= cupos[horario_id]:
+                    errores.append((numero, 'Clase sin cupo'))
+                else:
+                    dnis.add((horario_id, fecha_clase, dni))
+                    if estado != 'cancelada':
+                        ocupados[slot] = ocupados.get(slot, 0) + 1
+                    aceptadas.append(reserva)
+
+            if aceptadas:
+                # disciplina_id y hora_inicio se copian del horario en cada reserva
+                cur.executemany("""
+                    INSERT INTO reservas (horario_id, disciplina_id, fecha_clase, hora_inicio,
+                                          nombre, apellido, dni, comprobante_pago, estado)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, [(horario_id, horarios[horario_id][1], fecha_clase, horarios[horario_id][2]) + tuple(resto)
+                      for horario_id, fecha_clase, *resto in aceptadas])
+
+                deltas = {}
+                for horario_id, fecha_clase, _, _, _, _, estado in aceptadas:
+                    clave = (horario_id, fecha_clase, estado)
+                    deltas[clave] = deltas.get(clave, 0) + 1
+                for (horario_id, fecha_clase, estado), delta in deltas.items():
+                    resumenes.registrar(cur, horario_id, fecha_clase, estado, delta)
+
+            conn.commit()
+            insertadas += len(aceptadas)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    errores.sort()
+    return ResultadoImportacion(procesadas, insertadas, errores)
+
+
+# ---------- Horarios ----------
+
+def _parsear_horario(fila, dias_semana):
+    for campo in ('disciplina_id', 'dia_semana', 'hora_inicio'):
+        if not fila.get(campo):
+            raise ValueError(f'Falta {campo}')
+    try:
+        disciplina_id = int(fila['disciplina_id'])
+    except ValueError:
+        raise ValueError('disciplina_id inválido')
+    dia = fila['dia_semana'].capitalize()
+    if dia not in dias_semana:
+        raise ValueError(f'Día inválido: {fila["dia_semana"]}')
+    hora = None
+    for formato in ('%H:%M', '%H:%M:%S'):
+        try:
+            hora = datetime.strptime(fila['hora_inicio'], formato).strftime('%H:%M:%S')
+            break
+        except ValueError:
+            pass
+    if hora is None:
+        raise ValueError('hora_inicio inválida (usar HH:MM)')
+    try:
+        cupo = int(fila.get('cupo_maximo') or 10)
+    except ValueError:
+        raise ValueError('cupo_maximo inválido')
+    if cupo < 1:
+        raise ValueError('cupo_maximo debe ser mayor a 0')
+    return disciplina_id, dia, hora, cupo
+
+
+def importar_horarios(conn, filas, dias_semana):
+    """Importa horarios. Columnas: disciplina_id, dia_semana, hora_inicio, cupo_maximo"""
+    errores = []
+    validas = []
+    procesadas = 0
+    for numero, fila in filas:
+        procesadas += 1
+        try:
+            validas.append((numero, _parsear_horario(fila, dias_semana)))
+        except ValueError as e:
+            errores.append((numero, str(e)))
+
+    insertadas = 0
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT id FROM disciplinas")
+        disciplinas = {fila[0] for fila in cur.fetchall()}
+        cur.execute("SELECT disciplina_id, dia_semana, CAST(hora_inicio AS CHAR) FROM horarios")
+        existentes = set(cur.fetchall())
+
+        for lote in _lotes(validas):
+            aceptadas = []
+            for numero, horario in lote:
+                if horario[0] not in disciplinas:
+                    errores.append((numero, f'Disciplina {horario[0]} inexistente'))
+                elif horario[:3] in existentes:
+                    errores.append((numero, 'Horario ya existente'))
+                else:
+                    existentes.add(horario[:3])
+                    aceptadas.append(horario)
+            if aceptadas:
+                conn.begin()
+                cur.executemany("""
+                    INSERT INTO horarios (disciplina_id, dia_semana, hora_inicio, cupo_maximo)
+                    VALUES (%s, %s, %s, %s)
+                """, aceptadas)
+                conn.commit()
+                insertadas += len(aceptadas)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    errores.sort()
+    return ResultadoImportacion(procesadas, insertadas, errores)
@@ -0,0 +1,159 @@
+"""
+Acciones masivas del admin sobre reservas.
+
+Una selección es una lista de ids o una clase entera (horario_id,
+fecha_clase). Cada acción corre en una sola transacción: bloquea los horarios
+involucrados (como la admisión, así no se cruza con reservas nuevas), lee
+las filas afectadas para ajustar ocupacion_resumen y las modifica con una
+única sentencia por tabla. Las reservas archivadas se tratan igual.
+
+Volver a activar reservas canceladas respeta el cupo de las clases que
+siguen en `reservas`: si alguna se pasaría, no se aplica nada.
+"""
+
+from collections import namedtuple
+
+import dialectos
+import resumenes
+
+CANCELADA = 'cancelada'
+SIN_CUPO = 'sin_cupo'
+
+MAX_RESERVAS = 1000  # ids por pedido
+
+TABLAS = ('reservas', 'reservas_archivo')
+
+# clases: {(horario_id, fecha_clase): cambio en las reservas no canceladas}
+ResultadoLote = namedtuple('ResultadoLote', ['afectadas', 'ids', 'clases'])
+
+
+class LoteRechazado(Exception):
+    def __init__(self, motivo, clases=()):
+        super().__init__(motivo)
+        self.motivo = motivo
+        self.clases = list(clases)
+
+
+def _marcadores(cantidad):
+    return ', '.join(['%s'] * cantidad)
+
+
+def _condicion(seleccion):
+    """(SQL, params) de la selección: {'ids': [...]} o {'horario_id', 'fecha_clase'}"""
+    if 'ids' in seleccion:
+        return f"id IN ({_marcadores(len(seleccion['ids']))})", list(seleccion['ids'])
+    return "horario_id = %s AND fecha_clase = %s", [seleccion['horario_id'], seleccion['fecha_clase']]
+
+
+def _horarios_seleccion(cur, seleccion, condicion, params):
+    """Ids de los horarios de las reservas seleccionadas (lectura sin bloqueo)"""
+    if 'horario_id' in seleccion:
+        return {seleccion['horario_id']}
+    horario_ids = set()
+    for tabla in TABLAS:
+        cur.execute(f"SELECT DISTINCT horario_id FROM {tabla} WHERE {condicion}", params)
+        horario_ids.update(fila[0] for fila in cur.fetchall())
+    return horario_ids
+
+
+def _bloquear_horarios(cur, dialecto, horario_ids):
+    """Bloquea los horarios en orden de id; {id: cupo}"""
+    if not horario_ids:
+        return {}
+    ids = sorted(horario_ids)
+    cur.execute(f"SELECT id, cupo_maximo FROM horarios WHERE id IN ({_marcadores(len(ids))}) ORDER BY id"
+                + dialecto.para_actualizar, ids)
+    return dict(cur.fetchall())
+
+
+def _aplicar(conn, seleccion, estado=None):
+    """Cambia el estado de la selección (o la borra si estado es None)"""
+    if not seleccion.get('ids', True):
+        return ResultadoLote(0, [], {})
+    dialecto = dialectos.de(conn)
+    condicion, params = _condicion(seleccion)
+    cur = conn.cursor()
+    try:
+        # Los horarios se averiguan antes de la transacción: dentro, lo primero
+        # es bloquearlos (como en motor_reservas), así ninguna lectura de la
+        # transacción es anterior al bloqueo.
+        horario_ids = _horarios_seleccion(cur, seleccion, condicion, params)
+        while True:
+            conn.begin()
+            cupos = _bloquear_horarios(cur, dialecto, horario_ids)
+
+            filas_por_tabla = []
+            for tabla in TABLAS:
+                filtro = condicion
+                params_tabla = list(params)
+                if estado is not None:
+                    filtro += " AND estado != %s"
+                    params_tabla.append(estado)
+                cur.execute(f"SELECT id, horario_id, fecha_clase, estado FROM {tabla} WHERE {filtro}"
+                            + dialecto.para_actualizar, params_tabla)
+                filas_por_tabla.append((tabla, filtro, params_tabla, cur.fetchall()))
+
+            # Una reserva de otro horario apareció entre la lectura y el bloqueo:
+            # volver a empezar bloqueando también ese horario
+            faltantes = {fila[1] for _, _, _, filas in filas_por_tabla for fila in filas} - set(cupos)
+            if not faltantes:
+                break
+            conn.rollback()
+            horario_ids |= faltantes
+
+        ids = []
+        deltas = {}  # (horario_id, fecha_clase, estado): cambio en el resumen
+        clases = {}
+        calientes = set()
+        for tabla, filtro, params_tabla, filas in filas_por_tabla:
+            if not filas:
+                continue
+            if estado is None:
+                cur.execute(f"DELETE FROM {tabla} WHERE {filtro}", params_tabla)
+            else:
+                cur.execute(f"UPDATE {tabla} SET estado = %s WHERE {filtro}", [estado] + params_tabla)
+            for reserva_id, horario_id, fecha_clase, anterior in filas:
+                ids.append(reserva_id)
+                deltas[(horario_id, fecha_clase, anterior)] = deltas.get((horario_id, fecha_clase, anterior), 0) - 1
+                if estado is not None:
+                    deltas[(horario_id, fecha_clase, estado)] = deltas.get((horario_id, fecha_clase, estado), 0) + 1
+                activa_antes = anterior != CANCELADA
+                activa_despues = estado is not None and estado != CANCELADA
+                if activa_antes != activa_despues:
+                    clase = (horario_id, fecha_clase)
+                    clases[clase] = clases.get(clase, 0) + (1 if activa_despues else -1)
+                    if tabla == 'reservas':
+                        calientes.add(clase)
+
+        # Reservas reactivadas: verificar el cupo con los horarios ya bloqueados
+        completas = []
+        for horario_id, fecha_clase in sorted(c for c in calientes if clases[c] > 0):
+            cur.execute("""
+                SELECT COUNT(*) FROM reservas
+                WHERE horario_id = %s AND fecha_clase = %s AND estado != 'cancelada'
+            """ + dialecto.para_actualizar, [horario_id, fecha_clase])
+            if cur.fetchone()[0] > cupos[horario_id]:
+                completas.append((horario_id, fecha_clase))
+        if completas:
+            conn.rollback()
+            raise LoteRechazado(SIN_CUPO, completas)
+
+        for (horario_id, fecha_clase, estado_resumen), delta in deltas.items():
+            if delta:
+                resumenes.registrar(cur, horario_id, fecha_clase, estado_resumen, delta)
+        conn.commit()
+        return ResultadoLote(len(ids), sorted(ids), {c: d for c, d in clases.items() if d})
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def cambiar_estado(conn, seleccion, estado):
+    """Pasa la selección a estado; las que ya lo tenían no cuentan como afectadas"""
+    return _aplicar(conn, seleccion, estado)
+
+
+def eliminar(conn, seleccion):
+    return _aplicar(conn, seleccion)
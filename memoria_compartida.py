@@ -0,0 +1,436 @@
+"""
+Estructuras compartidas entre procesos.
+
+Los workers de gunicorn son procesos separados, así que estos datos viven en
+archivos mapeados en memoria (mmap) que todos abren:
+
+- OcupacionCompartida: por cada (horario_id, fecha_clase), la cantidad de
+  reservas no canceladas, y por cada horario su cupo máximo. Así las
+  consultas de disponibilidad se responden sin ir a MySQL. Es una caché: se
+  reconstruye desde la base al arrancar, cada cierto intervalo y cada vez que
+  se invalida. La base sigue siendo la fuente de verdad al confirmar una
+  reserva.
+- ContadorCompartido: un entero que todos los procesos ven igual, usado como
+  versión para invalidar cachés locales de cada proceso.
+- HistogramasCompartidos: latencias y consultas por ruta, sumadas entre todos
+  los workers para exponerlas en /metrics.
+- CambiosCompartidos: anillo con los últimos cambios de ocupación, para que
+  cada worker los reenvíe a sus suscriptores de eventos (ver eventos.py).
+- SalaEsperaCompartida: turnos emitidos y habilitados de la sala de espera
+  (ver admision.py).
+"""
+
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos (un solo proceso)
+    fcntl = None
+
+MAGIC = b'GIMOCUP2'
+
+# magic, cargada, desbordada, fecha_desde (ordinal), version, reconciliado_en, generacion
+HEADER = struct.Struct('<8sIIiQdQ')
+HORARIO = struct.Struct('<ii')   # horario_id, cupo_maximo
+SLOT = struct.Struct('<iii')     # horario_id, fecha (ordinal), reservas
+CONTADOR = struct.Struct('<Q')
+
+MAGIC_HISTOGRAMAS = b'GIMHIST1'
+HEADER_HISTOGRAMAS = struct.Struct('<8sI')  # magic, firma de series y límites
+
+MAGIC_CAMBIOS = b'GIMCAMB1'
+HEADER_CAMBIOS = struct.Struct('<8sQ')      # magic, último número de cambio
+CAMBIO = struct.Struct('<Qiiiii')           # número, disciplina_id, horario_id, fecha (ordinal), reservas, cupo
+
+MAGIC_SALA = b'GIMSALA1'
+SALA = struct.Struct('<8sQdd')              # magic, turnos emitidos, turnos habilitados, actualizado
+
+
+class _ArchivoCompartido:
+    """Archivo mmap abierto una vez por proceso, con bloqueo entre procesos"""
+
+    def __init__(self, path, tamano):
+        self.path = path
+        self._tamano = tamano
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _abrir(self):
+        # Se abre por proceso: con gunicorn --preload el fd heredado del
+        # master compartiría el flock entre todos los workers.
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._pid = os.getpid()
+        self._iniciado_en = time.time()
+        with self._bloqueo_archivo():
+            if os.fstat(self._fd).st_size != self._tamano:
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, self._tamano)
+            self._mm = mmap.mmap(self._fd, self._tamano)
+            self._inicializar()
+
+    def _inicializar(self):
+        """Prepara el contenido si el archivo es nuevo (con el bloqueo tomado)"""
+
+    # ---------- Bloqueo ----------
+
+    @contextmanager
+    def _bloqueo_archivo(self):
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _bloqueo(self):
+        # flock no excluye hilos del mismo proceso: hace falta también un Lock
+        with self._lock:
+            if self._pid != os.getpid():
+                self._abrir()
+            with self._bloqueo_archivo():
+                yield
+
+    def cerrar(self):
+        if self._pid == os.getpid():
+            self._mm.close()
+            os.close(self._fd)
+            self._pid = None
+
+
+class ContadorCompartido(_ArchivoCompartido):
+    """Entero de 64 bits compartido entre procesos"""
+
+    def __init__(self, path):
+        super().__init__(path, CONTADOR.size)
+
+    def valor(self):
+        with self._bloqueo():
+            return CONTADOR.unpack_from(self._mm, 0)[0]
+
+    def incrementar(self):
+        with self._bloqueo():
+            valor = CONTADOR.unpack_from(self._mm, 0)[0] + 1
+            CONTADOR.pack_into(self._mm, 0, valor)
+            return valor
+
+
+class OcupacionCompartida(_ArchivoCompartido):
+    """Tabla hash de direccionamiento abierto sobre un archivo mmap"""
+
+    def __init__(self, path, capacidad_horarios=4096, capacidad_slots=65536):
+        self.capacidad_horarios = capacidad_horarios
+        self.capacidad_slots = capacidad_slots
+        self._off_horarios = HEADER.size
+        self._off_slots = self._off_horarios + HORARIO.size * capacidad_horarios
+        super().__init__(path, self._off_slots + SLOT.size * capacidad_slots)
+
+    def _inicializar(self):
+        if self._mm[:len(MAGIC)] != MAGIC:
+            self._limpiar()
+
+    # ---------- Header ----------
+
+    def _leer_header(self):
+        _, cargada, desbordada, fecha_desde, version, reconciliado_en, _ = HEADER.unpack_from(self._mm, 0)
+        return cargada, desbordada, fecha_desde, version, reconciliado_en
+
+    def _leer_generacion(self):
+        return HEADER.unpack_from(self._mm, 0)[6]
+
+    def _escribir_header(self, cargada, desbordada, fecha_desde, version, reconciliado_en, generacion=None):
+        if generacion is None:
+            generacion = self._leer_generacion()
+        HEADER.pack_into(self._mm, 0, MAGIC, cargada, desbordada, fecha_desde, version, reconciliado_en,
+                         generacion)
+
+    def _limpiar(self):
+        self._mm[:] = bytes(self._tamano)
+        self._escribir_header(0, 0, 0, 0, 0.0, 0)
+
+    # ---------- Tablas hash ----------
+
+    def _buscar_horario(self, horario_id, crear=False):
+        cap = self.capacidad_horarios
+        i = (horario_id * 2654435761) % cap
+        for _ in range(cap):
+            off = self._off_horarios + i * HORARIO.size
+            hid, _ = HORARIO.unpack_from(self._mm, off)
+            if hid == horario_id:
+                return off
+            if hid == 0:
+                if crear:
+                    HORARIO.pack_into(self._mm, off, horario_id, 0)
+                    return off
+                return None
+            i = (i + 1) % cap
+        return None
+
+    def _buscar_slot(self, horario_id, fecha_ordinal, crear=False):
+        cap = self.capacidad_slots
+        i = (horario_id * 2654435761 + fecha_ordinal * 40503) % cap
+        for _ in range(cap):
+            off = self._off_slots + i * SLOT.size
+            hid, ordinal, _ = SLOT.unpack_from(self._mm, off)
+            if hid == horario_id and ordinal == fecha_ordinal:
+                return off
+            if hid == 0:
+                if crear:
+                    SLOT.pack_into(self._mm, off, horario_id, fecha_ordinal, 0)
+                    return off
+                return None
+            i = (i + 1) % cap
+        return None
+
+    # ---------- API ----------
+
+    def consultar(self, horario_id, fecha):
+        """Devuelve (reservas, cupo_maximo) o None si la tabla no puede responder"""
+        with self._bloqueo():
+            cargada, desbordada, fecha_desde, _, _ = self._leer_header()
+            if not cargada or desbordada or fecha.toordinal() < fecha_desde:
+                return None
+
+            off = self._buscar_horario(horario_id)
+            if off is None:
+                return None
+            _, cupo_maximo = HORARIO.unpack_from(self._mm, off)
+
+            off = self._buscar_slot(horario_id, fecha.toordinal())
+            reservas = SLOT.unpack_from(self._mm, off)[2] if off is not None else 0
+            return reservas, cupo_maximo
+
+    def generacion(self):
+        """Número de reconstrucción de la tabla; pedirlo antes de escribir en la base"""
+        with self._bloqueo():
+            return self._leer_generacion()
+
+    def ajustar(self, horario_id, fecha, delta, generacion=None):
+        """Suma delta a las reservas de (horario_id, fecha).
+
+        generacion: la de antes de escribir el cambio en la base. Si la tabla
+        se reconstruyó desde entonces, no se sabe si la reconstrucción ya lo
+        contó: en lugar de sumarlo se invalida la tabla, que se vuelve a leer
+        de la base en el próximo uso.
+        """
+        with self._bloqueo():
+            cargada, desbordada, fecha_desde, version, reconciliado_en = self._leer_header()
+            if not cargada or fecha.toordinal() < fecha_desde:
+                return
+            if generacion is not None and generacion != self._leer_generacion():
+                self._escribir_header(0, desbordada, fecha_desde, version + 1, 0.0)
+                return
+            off = self._buscar_slot(horario_id, fecha.toordinal(), crear=True)
+            if off is None:
+                # Tabla llena: deja de responder hasta la próxima reconstrucción
+                self._escribir_header(cargada, 1, fecha_desde, version + 1, reconciliado_en)
+                return
+            hid, ordinal, reservas = SLOT.unpack_from(self._mm, off)
+            SLOT.pack_into(self._mm, off, hid, ordinal, max(0, reservas + delta))
+            self._escribir_header(cargada, desbordada, fecha_desde, version + 1, reconciliado_en)
+
+    def version(self):
+        """Contador que aumenta con cada cambio de la tabla"""
+        with self._bloqueo():
+            return self._leer_header()[3]
+
+    def invalidar(self):
+        """Marca la tabla para reconstruir en el próximo uso"""
+        with self._bloqueo():
+            _, desbordada, fecha_desde, version, _ = self._leer_header()
+            self._escribir_header(0, desbordada, fecha_desde, version + 1, 0.0)
+
+    def reclamar_reconciliacion(self, intervalo):
+        """Indica si este proceso debe recargar la tabla desde la base.
+
+        Devuelve la versión actual (para pasarla a reconstruir) o None si no
+        hace falta. Solo un proceso la obtiene por intervalo: el resto ve la
+        marca de tiempo actualizada y sigue usando la tabla.
+        """
+        with self._bloqueo():
+            cargada, desbordada, fecha_desde, version, reconciliado_en = self._leer_header()
+            ahora = time.time()
+            if reconciliado_en >= self._iniciado_en:
+                if cargada and ahora - reconciliado_en < intervalo:
+                    return None
+                if ahora - reconciliado_en < 5:
+                    return None  # Otro proceso ya la está recargando
+            self._escribir_header(cargada, desbordada, fecha_desde, version, ahora)
+            return version
+
+    def reconstruir(self, horarios, ocupacion, fecha_desde, version=None):
+        """Reemplaza el contenido de la tabla.
+
+        horarios: iterable de (horario_id, cupo_maximo)
+        ocupacion: iterable de (horario_id, fecha_clase, reservas) con fecha_clase >= fecha_desde
+        Si se pasa version y la tabla cambió desde entonces, no escribe nada y
+        devuelve False: el llamador debe volver a leer la base.
+        """
+        with self._bloqueo():
+            actual = self._leer_header()[3]
+            if version is not None and actual != version:
+                return False
+
+            self._mm[HEADER.size:] = bytes(self._tamano - HEADER.size)
+            desbordada = 0
+            for horario_id, cupo_maximo in horarios:
+                off = self._buscar_horario(horario_id, crear=True)
+                if off is None:
+                    desbordada = 1
+                    break
+                HORARIO.pack_into(self._mm, off, horario_id, cupo_maximo)
+            for horario_id, fecha_clase, reservas in ocupacion:
+                off = self._buscar_slot(horario_id, fecha_clase.toordinal(), crear=True)
+                if off is None:
+                    desbordada = 1
+                    break
+                SLOT.pack_into(self._mm, off, horario_id, fecha_clase.toordinal(), reservas)
+            self._escribir_header(1, desbordada, fecha_desde.toordinal(), actual + 1, time.time(),
+                                  self._leer_generacion() + 1)
+            return True
+
+
+class HistogramasCompartidos(_ArchivoCompartido):
+    """Un histograma de latencia por serie, más contadores de errores y SQL.
+
+    Las series son fijas (las rutas de la app). Si cambian entre despliegues,
+    la firma del header no coincide y el archivo se reinicia en cero.
+    """
+
+    def __init__(self, path, series, limites):
+        self.series = list(series)
+        self.limites = tuple(limites)
+        self._indices = {serie: i for i, serie in enumerate(self.series)}
+        # cubetas (+Inf incluida), suma de segundos, errores, consultas, segundos de SQL
+        self._serie = struct.Struct('<' + 'Q' * (len(self.limites) + 1) + 'dQQd')
+        self._firma = zlib.crc32(repr((self.series, self.limites)).encode())
+        super().__init__(path, HEADER_HISTOGRAMAS.size + self._serie.size * len(self.series))
+
+    def _inicializar(self):
+        magic, firma = HEADER_HISTOGRAMAS.unpack_from(self._mm, 0)
+        if magic != MAGIC_HISTOGRAMAS or firma != self._firma:
+            self._mm[:] = bytes(self._tamano)
+            HEADER_HISTOGRAMAS.pack_into(self._mm, 0, MAGIC_HISTOGRAMAS, self._firma)
+
+    def registrar(self, serie, segundos, error=False, consultas=0, sql_segundos=0.0):
+        indice = self._indices.get(serie)
+        if indice is None:
+            return
+        cubeta = len(self.limites)
+        for i, limite in enumerate(self.limites):
+            if segundos <= limite:
+                cubeta = i
+                break
+        off = HEADER_HISTOGRAMAS.size + indice * self._serie.size
+        with self._bloqueo():
+            valores = list(self._serie.unpack_from(self._mm, off))
+            valores[cubeta] += 1
+            n = len(self.limites) + 1
+            valores[n] += segundos
+            valores[n + 1] += bool(error)
+            valores[n + 2] += consultas
+            valores[n + 3] += sql_segundos
+            self._serie.pack_into(self._mm, off, *valores)
+
+    def leer(self):
+        """{serie: (cubetas no acumuladas, suma, errores, consultas, sql_segundos)}"""
+        n = len(self.limites) + 1
+        with self._bloqueo():
+            datos = {}
+            for serie, indice in self._indices.items():
+                valores = self._serie.unpack_from(self._mm, HEADER_HISTOGRAMAS.size + indice * self._serie.size)
+                datos[serie] = (valores[:n],) + tuple(valores[n:])
+            return datos
+
+
+class CambiosCompartidos(_ArchivoCompartido):
+    """Anillo de los últimos cambios de ocupación, numerados en orden.
+
+    Quien modifica una clase anota su nueva ocupación; cada proceso lee los
+    cambios posteriores al último que vio. Si se atrasó más que la capacidad
+    del anillo, leer_desde lo indica para que el lector se resincronice.
+    """
+
+    def __init__(self, path, capacidad=4096):
+        self.capacidad = capacidad
+        super().__init__(path, HEADER_CAMBIOS.size + CAMBIO.size * capacidad)
+
+    def _inicializar(self):
+        if self._mm[:len(MAGIC_CAMBIOS)] != MAGIC_CAMBIOS:
+            self._mm[:] = bytes(self._tamano)
+            HEADER_CAMBIOS.pack_into(self._mm, 0, MAGIC_CAMBIOS, 0)
+
+    def _offset(self, numero):
+        return HEADER_CAMBIOS.size + (numero % self.capacidad) * CAMBIO.size
+
+    def ultimo(self):
+        with self._bloqueo():
+            return HEADER_CAMBIOS.unpack_from(self._mm, 0)[1]
+
+    def anotar(self, disciplina_id, horario_id, fecha, reservas, cupo_maximo):
+        """Agrega un cambio y devuelve su número"""
+        with self._bloqueo():
+            numero = HEADER_CAMBIOS.unpack_from(self._mm, 0)[1] + 1
+            CAMBIO.pack_into(self._mm, self._offset(numero), numero, disciplina_id, horario_id,
+                             fecha.toordinal(), reservas, cupo_maximo)
+            HEADER_CAMBIOS.pack_into(self._mm, 0, MAGIC_CAMBIOS, numero)
+            return numero
+
+    def leer_desde(self, numero):
+        """(último número, cambios posteriores a numero, completos).
+
+        Cada cambio es (disciplina_id, horario_id, fecha ordinal, reservas,
+        cupo). completos es False si se perdieron cambios por el tamaño del
+        anillo (o si el anillo se reinició).
+        """
+        with self._bloqueo():
+            ultimo = HEADER_CAMBIOS.unpack_from(self._mm, 0)[1]
+            if ultimo < numero:
+                return ultimo, [], False
+            desde = max(numero, ultimo - self.capacidad)
+            cambios = [CAMBIO.unpack_from(self._mm, self._offset(n))[1:] for n in range(desde + 1, ultimo + 1)]
+            return ultimo, cambios, desde == numero
+
+
+class SalaEsperaCompartida(_ArchivoCompartido):
+    """Turnos de una fila única: se emiten al llegar y se habilitan a una tasa fija.
+
+    Los habilitados avanzan con el tiempo (tasa por segundo) pero nunca pasan
+    a los emitidos, así que una fila vacía no acumula habilitaciones: quien
+    llega sin nadie adelante pasa en el acto y los siguientes, a la tasa.
+    """
+
+    def __init__(self, path):
+        super().__init__(path, SALA.size)
+
+    def _inicializar(self):
+        if self._mm[:len(MAGIC_SALA)] != MAGIC_SALA:
+            SALA.pack_into(self._mm, 0, MAGIC_SALA, 0, 0.0, 0.0)
+
+    def _avanzar(self, tasa):
+        _, emitidos, habilitados, actualizado = SALA.unpack_from(self._mm, 0)
+        ahora = time.time()
+        habilitados = min(float(emitidos), habilitados + max(0.0, ahora - actualizado) * tasa)
+        SALA.pack_into(self._mm, 0, MAGIC_SALA, emitidos, habilitados, ahora)
+        return emitidos, habilitados
+
+    def tomar_turno(self, tasa):
+        """Emite un turno nuevo y devuelve su número"""
+        with self._bloqueo():
+            _, emitidos, habilitados, actualizado = SALA.unpack_from(self._mm, 0)
+            SALA.pack_into(self._mm, 0, MAGIC_SALA, emitidos + 1, habilitados, actualizado)
+            self._avanzar(tasa)
+            return emitidos + 1
+
+    def habilitados(self, tasa):
+        """Último turno habilitado"""
+        with self._bloqueo():
+            return int(self._avanzar(tasa)[1])
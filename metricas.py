@@ -0,0 +1,140 @@
+"""
+Instrumentación de requests y consultas SQL.
+
+- CursorMedido: cursor de PyMySQL que mide cada sentencia y la anota en el
+  request actual (cantidad, tiempo total y tiempo por sentencia).
+- Metricas: al terminar cada request registra su latencia en un histograma
+  por ruta, compartido entre workers, y si supera METRICAS_LENTO_SEGUNDOS
+  deja en el log el desglose de consultas. Así se ven patrones N+1: la misma
+  sentencia repetida muchas veces en un request.
+- exponer(): texto en formato Prometheus para /metrics.
+"""
+
+import hmac
+import re
+import threading
+import time
+
+import pymysql
+from flask import g, has_app_context, request
+
+from memoria_compartida import HistogramasCompartidos
+
+# Límites de las cubetas de latencia (segundos)
+LIMITES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIN_RUTA = '(sin ruta)'
+LARGO_SENTENCIA = 160
+
+
+def anotar(sentencia, segundos):
+    if not has_app_context():
+        return
+    consultas = g.get('_metricas_consultas')
+    if consultas is None:
+        return
+    clave = re.sub(r'\s+', ' ', sentencia[:LARGO_SENTENCIA * 4]).strip()[:LARGO_SENTENCIA]
+    total = consultas.get(clave)
+    if total is None:
+        consultas[clave] = [1, segundos, segundos]
+    else:
+        total[0] += 1
+        total[1] += segundos
+        total[2] = max(total[2], segundos)
+
+
+class CursorMedido(pymysql.cursors.Cursor):
+    """Cursor que anota cada sentencia enviada al servidor en el request"""
+
+    def execute(self, query, args=None):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(query, args)
+        finally:
+            anotar(query, time.perf_counter() - inicio)
+
+
+class Metricas:
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._histogramas = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.path = app.config['METRICAS_SHM_PATH']
+        self.lento = app.config.get('METRICAS_LENTO_SEGUNDOS', 0.5)
+        app.before_request(self._inicio)
+        app.after_request(self._fin)
+
+    def histogramas(self):
+        # Las series son los endpoints de la app, que recién están completos
+        # cuando llega el primer request
+        if self._histogramas is None:
+            with self._lock:
+                if self._histogramas is None:
+                    series = sorted(self.app.view_functions) + [SIN_RUTA]
+                    self._histogramas = HistogramasCompartidos(self.path, series, LIMITES)
+        return self._histogramas
+
+    def _inicio(self):
+        g._metricas_inicio = time.perf_counter()
+        g._metricas_consultas = {}
+
+    def _fin(self, response):
+        inicio = g.get('_metricas_inicio')
+        if inicio is None:
+            return response
+        duracion = time.perf_counter() - inicio
+        consultas = g.pop('_metricas_consultas', None) or {}
+        cantidad = sum(c[0] for c in consultas.values())
+        sql_segundos = sum(c[1] for c in consultas.values())
+        ruta = request.endpoint or SIN_RUTA
+
+        self.histogramas().registrar(ruta, duracion, response.status_code >= 500, cantidad, sql_segundos)
+
+        if duracion >= self.lento:
+            desglose = sorted(consultas.items(), key=lambda c: c[1][1], reverse=True)
+            lineas = [f'  {n}x {total * 1000:.1f} ms (máx {maximo * 1000:.1f} ms): {sentencia}'
+                      for sentencia, (n, total, maximo) in desglose[:10]]
+            self.app.logger.warning(
+                'Request lento: %s %s (%s) %.0f ms, %d consultas, %.0f ms en SQL%s',
+                request.method, request.path, ruta, duracion * 1000, cantidad, sql_segundos * 1000,
+                ''.join('\n' + linea for linea in lineas))
+        return response
+
+    def exponer(self):
+        """Métricas acumuladas de todos los workers en formato Prometheus"""
+        datos = self.histogramas().leer()
+        lineas = [
+            '# HELP gimnasio_request_segundos Latencia de requests por ruta',
+            '# TYPE gimnasio_request_segundos histogram',
+        ]
+        for ruta, (cubetas, suma, _, _, _) in datos.items():
+            total = sum(cubetas)
+            if not total:
+                continue
+            acumulado = 0
+            for limite, cantidad in zip(LIMITES, cubetas):
+                acumulado += cantidad
+                lineas.append(f'gimnasio_request_segundos_bucket{{ruta="{ruta}",le="{limite}"}} {acumulado}')
+            lineas.append(f'gimnasio_request_segundos_bucket{{ruta="{ruta}",le="+Inf"}} {total}')
+            lineas.append(f'gimnasio_request_segundos_sum{{ruta="{ruta}"}} {suma:.6f}')
+            lineas.append(f'gimnasio_request_segundos_count{{ruta="{ruta}"}} {total}')
+
+        contadores = (
+            ('gimnasio_request_errores_total', 'Respuestas 5xx por ruta', 2, '{}'),
+            ('gimnasio_sql_consultas_total', 'Sentencias SQL ejecutadas por ruta', 3, '{}'),
+            ('gimnasio_sql_segundos_total', 'Tiempo en SQL por ruta', 4, '{:.6f}'),
+        )
+        for nombre, ayuda, campo, formato in contadores:
+            lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} counter']
+            for ruta, valores in datos.items():
+                if sum(valores[0]):
+                    lineas.append(f'{nombre}{{ruta="{ruta}"}} ' + formato.format(valores[campo]))
+        return '\n'.join(lineas) + '\n'
+
+
+def token_valido(encabezado, token):
+    """Compara 'Bearer <token>' sin filtrar tiempos"""
+    return bool(token) and hmac.compare_digest((encabezado or '').encode(), f'Bearer {token}'.encode())
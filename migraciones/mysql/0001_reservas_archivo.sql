@@ -0,0 +1,25 @@
+-- Reservas de clases pasadas, movidas desde `reservas` (flask --app app archivar-reservas).
+-- Guarda la disciplina y la hora del horario al archivar. Particionada por mes
+-- de fecha_clase: el archivado agrega las particiones que falten, y las tablas
+-- particionadas no admiten claves foráneas.
+CREATE TABLE IF NOT EXISTS reservas_archivo (
+    id INT NOT NULL,
+    horario_id INT NOT NULL,
+    disciplina_id INT NOT NULL,
+    hora_inicio TIME NOT NULL,
+    fecha_clase DATE NOT NULL,
+    nombre VARCHAR(100) NOT NULL,
+    apellido VARCHAR(100) NOT NULL,
+    dni VARCHAR(20) NOT NULL,
+    comprobante_pago VARCHAR(255),
+    fecha_reserva TIMESTAMP NULL,
+    estado ENUM('pendiente', 'confirmada', 'cancelada') NOT NULL,
+    PRIMARY KEY (id, fecha_clase),
+    INDEX idx_archivo_orden (fecha_clase, hora_inicio, id),
+    INDEX idx_archivo_disciplina (disciplina_id, fecha_clase),
+    INDEX idx_archivo_dni (dni),
+    INDEX idx_archivo_apellido (apellido)
+) ENGINE=InnoDB
+PARTITION BY RANGE COLUMNS (fecha_clase) (
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
@@ -0,0 +1,25 @@
+-- Resumen de reservas por clase y estado (lo mantiene la aplicación; ver resumenes.py).
+-- Para recalcularlo: flask --app app reconstruir-resumen
+CREATE TABLE IF NOT EXISTS ocupacion_resumen (
+    horario_id INT NOT NULL,
+    fecha_clase DATE NOT NULL,
+    estado ENUM('pendiente', 'confirmada', 'cancelada') NOT NULL,
+    disciplina_id INT NOT NULL,
+    cantidad INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (horario_id, fecha_clase, estado),
+    FOREIGN KEY (horario_id) REFERENCES horarios(id) ON DELETE CASCADE,
+    INDEX idx_fecha_clase (fecha_clase)
+) ENGINE=InnoDB;
+
+-- En una base existente la tabla nace vacía: contar las reservas que ya hay.
+-- Si ya tenía filas, la mantiene la aplicación y no se toca.
+INSERT INTO ocupacion_resumen (horario_id, fecha_clase, estado, disciplina_id, cantidad)
+SELECT r.horario_id, r.fecha_clase, r.estado, h.disciplina_id, COUNT(*)
+FROM (
+    SELECT horario_id, fecha_clase, estado FROM reservas
+    UNION ALL
+    SELECT horario_id, fecha_clase, estado FROM reservas_archivo
+) r
+JOIN horarios h ON r.horario_id = h.id
+WHERE NOT EXISTS (SELECT 1 FROM ocupacion_resumen)
+GROUP BY r.horario_id, r.fecha_clase, r.estado, h.disciplina_id;
@@ -0,0 +1,34 @@
+-- Disciplina y hora del horario copiadas en cada reserva (como en reservas_archivo):
+-- el listado admin ordena por fecha y hora, y filtra por disciplina, con un
+-- índice de `reservas`, sin unir horarios ni ordenar aparte.
+ALTER TABLE reservas
+    ADD COLUMN disciplina_id INT NULL AFTER horario_id,
+    ADD COLUMN hora_inicio TIME NULL AFTER fecha_clase;
+
+UPDATE reservas r
+JOIN horarios h ON r.horario_id = h.id
+SET r.disciplina_id = h.disciplina_id, r.hora_inicio = h.hora_inicio
+WHERE r.disciplina_id IS NULL OR r.hora_inicio IS NULL;
+
+-- Índices de las consultas frecuentes (revisados con python -m bench --planes):
+--   idx_reservas_clase: conteo de cupo y DNI repetido de una clase, sin leer filas
+--   idx_reservas_fecha: ocupación desde una fecha y archivado
+--   idx_reservas_orden / idx_reservas_disciplina: listado admin por clave, del más nuevo al más viejo
+-- idx_fecha_clase e idx_estado quedan cubiertos por los nuevos.
+ALTER TABLE reservas
+    MODIFY disciplina_id INT NOT NULL,
+    MODIFY hora_inicio TIME NOT NULL,
+    DROP INDEX idx_fecha_clase,
+    DROP INDEX idx_estado,
+    ADD INDEX idx_reservas_clase (horario_id, fecha_clase, estado, dni),
+    ADD INDEX idx_reservas_fecha (fecha_clase, horario_id, estado),
+    ADD INDEX idx_reservas_orden (fecha_clase, hora_inicio, id),
+    ADD INDEX idx_reservas_disciplina (disciplina_id, fecha_clase, hora_inicio, id);
+
+ALTER TABLE reservas_archivo
+    DROP INDEX idx_archivo_disciplina,
+    ADD INDEX idx_archivo_disciplina_orden (disciplina_id, fecha_clase, hora_inicio, id);
+
+-- Totales del dashboard por estado, leídos solo del índice
+ALTER TABLE ocupacion_resumen
+    ADD INDEX idx_resumen_estado (estado, cantidad);
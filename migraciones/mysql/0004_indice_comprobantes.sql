@@ -0,0 +1,4 @@
+-- Búsqueda de reservas por comprobante: al rechazar una reserva se borra el
+-- comprobante recién subido si ninguna otra reserva lo referencia.
+ALTER TABLE reservas ADD INDEX idx_reservas_comprobante (comprobante_pago);
+ALTER TABLE reservas_archivo ADD INDEX idx_archivo_comprobante (comprobante_pago);
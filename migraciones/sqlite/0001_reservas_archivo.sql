@@ -0,0 +1,19 @@
+-- Reservas de clases pasadas, movidas desde `reservas` (flask --app app archivar-reservas).
+-- Guarda la disciplina y la hora del horario al archivar (SQLite no particiona).
+CREATE TABLE IF NOT EXISTS reservas_archivo (
+    id INTEGER PRIMARY KEY,
+    horario_id INTEGER NOT NULL,
+    disciplina_id INTEGER NOT NULL,
+    hora_inicio TIME NOT NULL,
+    fecha_clase DATE NOT NULL,
+    nombre VARCHAR(100) NOT NULL,
+    apellido VARCHAR(100) NOT NULL,
+    dni VARCHAR(20) NOT NULL,
+    comprobante_pago VARCHAR(255),
+    fecha_reserva TIMESTAMP,
+    estado TEXT NOT NULL CHECK (estado IN ('pendiente', 'confirmada', 'cancelada'))
+);
+CREATE INDEX IF NOT EXISTS idx_archivo_orden ON reservas_archivo (fecha_clase, hora_inicio, id);
+CREATE INDEX IF NOT EXISTS idx_archivo_disciplina ON reservas_archivo (disciplina_id, fecha_clase);
+CREATE INDEX IF NOT EXISTS idx_archivo_dni ON reservas_archivo (dni);
+CREATE INDEX IF NOT EXISTS idx_archivo_apellido ON reservas_archivo (apellido);
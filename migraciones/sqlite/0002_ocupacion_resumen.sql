@@ -0,0 +1,24 @@
+-- Resumen de reservas por clase y estado (lo mantiene la aplicación; ver resumenes.py).
+-- Para recalcularlo: flask --app app reconstruir-resumen
+CREATE TABLE IF NOT EXISTS ocupacion_resumen (
+    horario_id INTEGER NOT NULL REFERENCES horarios(id) ON DELETE CASCADE,
+    fecha_clase DATE NOT NULL,
+    estado TEXT NOT NULL CHECK (estado IN ('pendiente', 'confirmada', 'cancelada')),
+    disciplina_id INTEGER NOT NULL,
+    cantidad INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (horario_id, fecha_clase, estado)
+);
+CREATE INDEX IF NOT EXISTS idx_resumen_fecha_clase ON ocupacion_resumen (fecha_clase);
+
+-- En una base existente la tabla nace vacía: contar las reservas que ya hay.
+-- Si ya tenía filas, la mantiene la aplicación y no se toca.
+INSERT INTO ocupacion_resumen (horario_id, fecha_clase, estado, disciplina_id, cantidad)
+SELECT r.horario_id, r.fecha_clase, r.estado, h.disciplina_id, COUNT(*)
+FROM (
+    SELECT horario_id, fecha_clase, estado FROM reservas
+    UNION ALL
+    SELECT horario_id, fecha_clase, estado FROM reservas_archivo
+) r
+JOIN horarios h ON r.horario_id = h.id
+WHERE NOT EXISTS (SELECT 1 FROM ocupacion_resumen)
+GROUP BY r.horario_id, r.fecha_clase, r.estado, h.disciplina_id;
@@ -0,0 +1,29 @@
+-- Disciplina y hora del horario copiadas en cada reserva (como en reservas_archivo):
+-- el listado admin ordena por fecha y hora, y filtra por disciplina, con un
+-- índice de `reservas`, sin unir horarios ni ordenar aparte.
+-- (SQLite no puede volver NOT NULL una columna agregada: la aplicación siempre las completa.)
+ALTER TABLE reservas ADD COLUMN disciplina_id INTEGER;
+ALTER TABLE reservas ADD COLUMN hora_inicio TIME;
+
+UPDATE reservas
+SET disciplina_id = (SELECT h.disciplina_id FROM horarios h WHERE h.id = reservas.horario_id),
+    hora_inicio = (SELECT h.hora_inicio FROM horarios h WHERE h.id = reservas.horario_id)
+WHERE disciplina_id IS NULL OR hora_inicio IS NULL;
+
+-- Índices de las consultas frecuentes (revisados con python -m bench --planes):
+--   idx_reservas_clase: conteo de cupo y DNI repetido de una clase, sin leer filas
+--   idx_reservas_fecha: ocupación desde una fecha y archivado
+--   idx_reservas_orden / idx_reservas_disciplina: listado admin por clave, del más nuevo al más viejo
+-- idx_fecha_clase e idx_estado quedan cubiertos por los nuevos.
+DROP INDEX IF EXISTS idx_fecha_clase;
+DROP INDEX IF EXISTS idx_estado;
+CREATE INDEX IF NOT EXISTS idx_reservas_clase ON reservas (horario_id, fecha_clase, estado, dni);
+CREATE INDEX IF NOT EXISTS idx_reservas_fecha ON reservas (fecha_clase, horario_id, estado);
+CREATE INDEX IF NOT EXISTS idx_reservas_orden ON reservas (fecha_clase, hora_inicio, id);
+CREATE INDEX IF NOT EXISTS idx_reservas_disciplina ON reservas (disciplina_id, fecha_clase, hora_inicio, id);
+
+DROP INDEX IF EXISTS idx_archivo_disciplina;
+CREATE INDEX IF NOT EXISTS idx_archivo_disciplina_orden ON reservas_archivo (disciplina_id, fecha_clase, hora_inicio, id);
+
+-- Totales del dashboard por estado, leídos solo del índice
+CREATE INDEX IF NOT EXISTS idx_resumen_estado ON ocupacion_resumen (estado, cantidad);
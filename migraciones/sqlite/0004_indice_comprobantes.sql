@@ -0,0 +1,4 @@
+-- Búsqueda de reservas por comprobante: al rechazar una reserva se borra el
+-- comprobante recién subido si ninguna otra reserva lo referencia.
+CREATE INDEX IF NOT EXISTS idx_reservas_comprobante ON reservas (comprobante_pago);
+CREATE INDEX IF NOT EXISTS idx_archivo_comprobante ON reservas_archivo (comprobante_pago);
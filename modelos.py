@@ -0,0 +1,30 @@
+"""
+Filas que devuelve el Repositorio.
+
+Son namedtuple: ocupan lo mismo que las tuplas del cursor (sin __dict__ por
+fila) y se leen por nombre en las rutas y los templates. Cada consulta pide
+exactamente las columnas del modelo, en su orden.
+
+Las columnas TIME llegan como datetime.time: los dos backends convierten al
+leer la fila (ver como_hora), así que nadie vuelve a parsear horas.
+"""
+
+from collections import namedtuple
+from datetime import time, timedelta
+
+Disciplina = namedtuple('Disciplina', 'id nombre descripcion activa fecha_creacion')
+NombreDisciplina = namedtuple('NombreDisciplina', 'id nombre')
+Horario = namedtuple('Horario', 'id disciplina_id dia_semana hora_inicio cupo_maximo')
+ReservaListado = namedtuple('ReservaListado',
+                            'id nombre apellido dni fecha_clase hora_inicio disciplina estado comprobante_pago '
+                            'horario_id')
+ReservaBorrada = namedtuple('ReservaBorrada', 'horario_id fecha_clase estado')
+Administrador = namedtuple('Administrador', 'id password_hash')
+
+
+def como_hora(valor):
+    """timedelta de un TIME a datetime.time; fuera del rango de un día se deja igual"""
+    if isinstance(valor, timedelta) and timedelta(0) <= valor < timedelta(days=1):
+        total = int(valor.total_seconds())
+        return time(total // 3600, (total % 3600) // 60, total % 60)
+    return valor
@@ -0,0 +1,93 @@
+"""
+Admisión atómica de reservas.
+
+Toda la validación y el INSERT ocurren en una única transacción. La fila del
+horario se bloquea con SELECT ... FOR UPDATE (en SQLite, BEGIN IMMEDIATE ya
+bloquea la base), así que las reservas concurrentes de un mismo horario se
+serializan y el cupo nunca se excede.
+La clave única `unique_reserva` es la garantía final contra DNI duplicados.
+"""
+
+from collections import namedtuple
+from datetime import datetime
+
+import dialectos
+import resumenes
+
+CONFIRMADA = 'confirmada'
+COMPLETA = 'completa'
+DUPLICADA = 'duplicada'
+PASADA = 'pasada'
+INEXISTENTE = 'inexistente'
+
+ResultadoReserva = namedtuple('ResultadoReserva', ['estado', 'reserva_id'])
+
+
+def _inicio_clase(fecha_clase, hora_inicio):
+    """datetime de inicio de la clase"""
+    return datetime.combine(fecha_clase, hora_inicio)
+
+
+def admitir_reserva(conn, horario_id, fecha_clase, nombre, apellido, dni,
+                    comprobante=None, ahora=None):
+    """Intenta admitir una reserva y devuelve un ResultadoReserva.
+
+    El estado es CONFIRMADA (con reserva_id) o el motivo del rechazo:
+    INEXISTENTE, PASADA, DUPLICADA o COMPLETA.
+    """
+    ahora = ahora or datetime.now()
+    dialecto = dialectos.de(conn)
+    cur = conn.cursor()
+    try:
+        conn.begin()
+
+        # Bloquear el horario: las demás reservas del mismo horario esperan acá
+        cur.execute("SELECT disciplina_id, hora_inicio, cupo_maximo FROM horarios WHERE id = %s"
+                    + dialecto.para_actualizar, [horario_id])
+        horario = cur.fetchone()
+        if not horario:
+            conn.rollback()
+            return ResultadoReserva(INEXISTENTE, None)
+
+        disciplina_id, hora_inicio, cupo_maximo = horario
+        if _inicio_clase(fecha_clase, hora_inicio) < ahora:
+            conn.rollback()
+            return ResultadoReserva(PASADA, None)
+
+        # Ocupación y DNI repetido en una sola lectura
+        cur.execute("""
+            SELECT COALESCE(SUM(estado != 'cancelada'), 0), COALESCE(SUM(dni = %s), 0)
+            FROM reservas
+            WHERE horario_id = %s AND fecha_clase = %s
+        """, [dni, horario_id, fecha_clase])
+        ocupados, mismo_dni = cur.fetchone()
+
+        if mismo_dni:
+            conn.rollback()
+            return ResultadoReserva(DUPLICADA, None)
+
+        if ocupados >= cupo_maximo:
+            conn.rollback()
+            return ResultadoReserva(COMPLETA, None)
+
+        try:
+            cur.execute("""
+                INSERT INTO reservas (horario_id, disciplina_id, fecha_clase, hora_inicio,
+                                      nombre, apellido, dni, comprobante_pago, estado)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 'confirmada')
+            """, [horario_id, disciplina_id, fecha_clase, hora_inicio, nombre, apellido, dni, comprobante])
+        except Exception as e:
+            if not dialecto.es_duplicado(e):
+                raise
+            conn.rollback()
+            return ResultadoReserva(DUPLICADA, None)
+
+        reserva_id = cur.lastrowid
+        resumenes.registrar(cur, horario_id, fecha_clase, 'confirmada', 1)
+        conn.commit()
+        return ResultadoReserva(CONFIRMADA, reserva_id)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
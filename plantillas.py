@@ -0,0 +1,105 @@
+"""
+Plantillas de horarios: generación en bloque a partir de un patrón
+(días × horas con un cupo) o copiando los horarios de otra disciplina.
+
+La plantilla primero se compara contra los horarios existentes (vista previa)
+y después se aplica en una sola transacción con executemany. Un horario del
+mismo día y hora que ya existe no se duplica: si el cupo coincide queda
+igual y si difiere se informa como conflicto y se conserva el existente.
+"""
+
+from collections import namedtuple
+from datetime import datetime
+
+import dialectos
+
+Diferencia = namedtuple('Diferencia', ['nuevos', 'sin_cambios', 'conflictos'])
+
+
+def normalizar_hora(texto):
+    """'8:00', '08:00' o '08:00:00' -> '08:00:00' (ValueError si es inválida)"""
+    texto = texto.strip()
+    for formato in ('%H:%M', '%H:%M:%S'):
+        try:
+            return datetime.strptime(texto, formato).strftime('%H:%M:%S')
+        except ValueError:
+            pass
+    raise ValueError(f'Hora inválida: {texto}')
+
+
+def expandir_patron(dias, horas, cupo):
+    """Lista de (dia, 'HH:MM:SS', cupo) para cada combinación día × hora"""
+    horas = sorted({normalizar_hora(h) for h in horas if h.strip()})
+    return [(dia, hora, cupo) for dia in dias for hora in horas]
+
+
+def horarios_de(cur, disciplina_id):
+    """Horarios de una disciplina como (dia, 'HH:MM:SS', cupo)"""
+    cur.execute("""
+        SELECT dia_semana, CAST(hora_inicio AS CHAR), cupo_maximo
+        FROM horarios WHERE disciplina_id = %s
+    """, [disciplina_id])
+    return [tuple(fila) for fila in cur.fetchall()]
+
+
+def comparar(existentes, propuestos, dias_semana):
+    """Clasifica la plantilla contra los horarios existentes.
+
+    nuevos y sin_cambios son (dia, hora, cupo); conflictos agrega el cupo
+    existente: (dia, hora, cupo_propuesto, cupo_actual).
+    """
+    actuales = {(dia, hora): cupo for dia, hora, cupo in existentes}
+    nuevos, sin_cambios, conflictos = [], [], []
+    vistos = set()
+    for dia, hora, cupo in propuestos:
+        if (dia, hora) in vistos:
+            continue
+        vistos.add((dia, hora))
+        actual = actuales.get((dia, hora))
+        if actual is None:
+            nuevos.append((dia, hora, cupo))
+        elif actual == cupo:
+            sin_cambios.append((dia, hora, cupo))
+        else:
+            conflictos.append((dia, hora, cupo, actual))
+
+    def orden(h):
+        return dias_semana.index(h[0]), h[1]
+    return Diferencia(sorted(nuevos, key=orden), sorted(sin_cambios, key=orden),
+                      sorted(conflictos, key=orden))
+
+
+def previsualizar(cur, disciplina_id, propuestos, dias_semana):
+    return comparar(horarios_de(cur, disciplina_id), propuestos, dias_semana)
+
+
+def aplicar(conn, disciplina_id, propuestos, dias_semana):
+    """Inserta los horarios nuevos de la plantilla en una sola transacción.
+
+    La fila de la disciplina se bloquea para que dos plantillas aplicadas a
+    la vez no generen el mismo horario dos veces. Devuelve la Diferencia
+    calculada dentro de la transacción (puede diferir de la vista previa si
+    alguien modificó los horarios entre medio).
+    """
+    cur = conn.cursor()
+    try:
+        conn.begin()
+        cur.execute("SELECT id FROM disciplinas WHERE id = %s" + dialectos.de(conn).para_actualizar,
+                    [disciplina_id])
+        if not cur.fetchone():
+            conn.rollback()
+            return None
+
+        diferencia = previsualizar(cur, disciplina_id, propuestos, dias_semana)
+        if diferencia.nuevos:
+            cur.executemany("""
+                INSERT INTO horarios (disciplina_id, dia_semana, hora_inicio, cupo_maximo)
+                VALUES (%s, %s, %s, %s)
+            """, [(disciplina_id, dia, hora, cupo) for dia, hora, cupo in diferencia.nuevos])
+        conn.commit()
+        return diferencia
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
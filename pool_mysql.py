@@ -0,0 +1,184 @@
+"""
+Pool de conexiones MySQL (PyMySQL) para Flask.
+
+Reemplaza a flask_mysqldb, que abre una conexión nueva en cada contexto de
+aplicación. Expone la misma propiedad `connection`, así que las rutas siguen
+usando `mysql.connection.cursor()`; la conexión se toma del pool la primera
+vez que se usa en el request y se devuelve al terminar.
+"""
+
+import threading
+import time
+
+import pymysql
+from flask import g
+from pymysql.constants import FIELD_TYPE, SERVER_STATUS
+from pymysql.converters import conversions, convert_timedelta
+
+import dialectos
+from modelos import como_hora
+
+# TIME como datetime.time (PyMySQL lo devuelve como timedelta)
+CONVERSIONES = dict(conversions)
+CONVERSIONES[FIELD_TYPE.TIME] = lambda valor: como_hora(convert_timedelta(valor))
+
+
+class PoolAgotado(Exception):
+    """No se liberó ninguna conexión dentro del tiempo de espera"""
+
+
+class PoolMySQL:
+    def __init__(self, app=None):
+        self._cond = threading.Condition()
+        self._libres = []  # (conexión, momento en que se devolvió)
+        self._abiertas = 0
+        self._en_uso = 0
+        self._stats = {
+            'checkouts': 0,
+            'creadas': 0,
+            'descartadas': 0,
+            'recicladas': 0,
+            'pings_fallidos': 0,
+            'esperas': 0,
+            'timeouts': 0,
+            'espera_total_seg': 0.0,
+        }
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.parametros = {
+            'host': app.config['MYSQL_HOST'],
+            'port': app.config['MYSQL_PORT'],
+            'user': app.config['MYSQL_USER'],
+            'password': app.config['MYSQL_PASSWORD'],
+            'database': app.config['MYSQL_DB'],
+            'charset': app.config.get('MYSQL_CHARSET', 'utf8mb4'),
+            'connect_timeout': app.config.get('MYSQL_CONNECT_TIMEOUT', 10),
+            'autocommit': False,
+            'cursorclass': app.config.get('MYSQL_CURSORCLASS', pymysql.cursors.Cursor),
+            'conv': CONVERSIONES,
+        }
+        self.tamano = app.config['MYSQL_POOL_SIZE']
+        self.timeout = app.config['MYSQL_POOL_TIMEOUT']
+        self.recycle = app.config['MYSQL_POOL_RECYCLE']
+        self.ping = app.config['MYSQL_POOL_PING']
+        app.teardown_appcontext(self._teardown)
+
+    # ---------- Integración con Flask ----------
+
+    @property
+    def connection(self):
+        """Conexión del request actual (se toma del pool en el primer uso)"""
+        if '_pool_conexion' not in g:
+            g._pool_conexion = self.checkout()
+        return g._pool_conexion
+
+    def _teardown(self, exception):
+        conn = g.pop('_pool_conexion', None)
+        if conn is not None:
+            self.checkin(conn)
+
+    # ---------- Pool ----------
+
+    def _crear(self):
+        conn = pymysql.connect(**self.parametros)
+        conn.dialecto = dialectos.MYSQL
+        conn._pool_creada = time.monotonic()
+        with self._cond:
+            self._stats['creadas'] += 1
+        return conn
+
+    def _validar(self, conn, devuelta_en):
+        """Recicla conexiones viejas y hace ping a las que estuvieron inactivas"""
+        ahora = time.monotonic()
+        if self.recycle and ahora - conn._pool_creada > self.recycle:
+            self._cerrar(conn)
+            with self._cond:
+                self._stats['recicladas'] += 1
+            return self._crear()
+        if self.ping is not None and ahora - devuelta_en > self.ping:
+            try:
+                conn.ping(reconnect=False)
+            except pymysql.MySQLError:
+                self._cerrar(conn)
+                with self._cond:
+                    self._stats['pings_fallidos'] += 1
+                return self._crear()
+        return conn
+
+    def _cerrar(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def checkout(self, timeout=None):
+        """Toma una conexión; espera hasta timeout segundos si el pool está lleno"""
+        timeout = self.timeout if timeout is None else timeout
+        inicio = time.monotonic()
+        entrada = None
+        with self._cond:
+            esperando = False
+            while True:
+                if self._libres:
+                    entrada = self._libres.pop()
+                    break
+                if self._abiertas < self.tamano:
+                    self._abiertas += 1
+                    break
+                restante = timeout - (time.monotonic() - inicio)
+                if restante <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolAgotado(f'Sin conexiones libres tras {timeout}s (tamaño {self.tamano})')
+                if not esperando:
+                    esperando = True
+                    self._stats['esperas'] += 1
+                self._cond.wait(restante)
+            self._en_uso += 1
+            self._stats['checkouts'] += 1
+            self._stats['espera_total_seg'] += time.monotonic() - inicio
+
+        try:
+            if entrada is None:
+                return self._crear()
+            return self._validar(*entrada)
+        except Exception:
+            with self._cond:
+                self._abiertas -= 1
+                self._en_uso -= 1
+                self._cond.notify()
+            raise
+
+    def _en_transaccion(self, conn):
+        return conn.server_status is None or conn.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS
+
+    def checkin(self, conn):
+        """Devuelve una conexión al pool (con rollback si quedó una transacción abierta)"""
+        reutilizable = conn.open
+        if reutilizable:
+            try:
+                if self._en_transaccion(conn):
+                    conn.rollback()
+            except Exception:
+                reutilizable = False
+
+        with self._cond:
+            self._en_uso -= 1
+            if reutilizable:
+                self._libres.append((conn, time.monotonic()))
+            else:
+                self._abiertas -= 1
+                self._stats['descartadas'] += 1
+            self._cond.notify()
+
+        if not reutilizable:
+            self._cerrar(conn)
+
+    def estadisticas(self):
+        with self._cond:
+            return dict(self._stats,
+                        tamano=self.tamano,
+                        abiertas=self._abiertas,
+                        en_uso=self._en_uso,
+                        libres=len(self._libres))
@@ -0,0 +1,403 @@
+"""
+Acceso a datos de la aplicación.
+
+Las rutas no arman SQL: piden datos al Repositorio, que usa la conexión del
+request tomada del pool (MySQL o SQLite, según DB_BACKEND). Las consultas se
+escriben en el SQL común a los dos motores; lo que cambia entre ellos lo
+resuelve dialectos.py. Las operaciones de varios pasos (admisión de
+reservas, importación, plantillas, resúmenes) siguen en sus módulos y acá
+solo se les pasa la conexión.
+
+Las filas que llegan a rutas y templates son los modelos de modelos.py, con
+las columnas listadas explícitamente en cada SELECT.
+
+El listado, los totales y la exportación de reservas leen también
+`reservas_archivo` (ver archivado.py) cuando el rango de fechas pedido llega a
+las clases archivadas. Las dos tablas guardan la disciplina y la hora del
+horario en cada reserva (los horarios no se editan, solo se agregan o
+borran), así que se leen igual y sin unir horarios.
+"""
+
+from datetime import date
+
+import archivado
+import esquema
+import exportacion
+import importacion
+import lotes
+import motor_reservas
+import plantillas
+import resumenes
+from modelos import Administrador, Disciplina, Horario, NombreDisciplina, ReservaBorrada, ReservaListado
+
+DIAS_SEMANA = ('Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo')
+
+# Orden de la semana sin FIELD() de MySQL
+ORDEN_DIA = 'CASE dia_semana {} END'.format(
+    ' '.join(f"WHEN '{dia}' THEN {i}" for i, dia in enumerate(DIAS_SEMANA)))
+
+
+def _marcadores(cantidad):
+    return ', '.join(['%s'] * cantidad)
+
+
+def escapar_like(texto):
+    """Escapa los comodines de LIKE (con ESCAPE '!') para buscar texto como prefijo"""
+    return texto.replace('!', '!!').replace('%', '!%').replace('_', '!_')
+
+
+def condiciones_reservas(filtros):
+    """Condiciones SQL sobre `r` (reservas o reservas_archivo) para los filtros del listado.
+
+    filtros: dict con disciplina_id, desde, hasta (date), estado y q (texto),
+    todos opcionales. Devuelve (condiciones, params).
+    """
+    condiciones = []
+    params = []
+    if filtros.get('disciplina_id'):
+        condiciones.append("r.disciplina_id = %s")
+        params.append(filtros['disciplina_id'])
+    for campo, operador in (('desde', '>='), ('hasta', '<=')):
+        if filtros.get(campo):
+            condiciones.append(f"r.fecha_clase {operador} %s")
+            params.append(filtros[campo])
+    if filtros.get('estado'):
+        condiciones.append("r.estado = %s")
+        params.append(filtros['estado'])
+    q = filtros.get('q')
+    if q:
+        prefijo = escapar_like(q) + '%'
+        if q.isdigit():
+            condiciones.append("r.dni LIKE %s ESCAPE '!'")
+            params.append(prefijo)
+        else:
+            condiciones.append("(r.apellido LIKE %s ESCAPE '!' OR r.nombre LIKE %s ESCAPE '!')")
+            params += [prefijo, prefijo]
+    return condiciones, params
+
+
+CALIENTE = 'reservas'
+ARCHIVO = 'reservas_archivo'
+
+COLUMNAS_DISCIPLINA = 'id, nombre, descripcion, activa, fecha_creacion'
+COLUMNAS_HORARIO = 'id, disciplina_id, dia_semana, hora_inicio, cupo_maximo'
+
+
+def _where(condiciones):
+    return ('WHERE ' + ' AND '.join(condiciones)) if condiciones else ''
+
+
+class Repositorio:
+    def __init__(self, pool):
+        self.pool = pool
+
+    @property
+    def conn(self):
+        return self.pool.connection
+
+    def _todas(self, sql, params=(), modelo=None):
+        """Todas las filas; como instancias de modelo si se indica"""
+        cur = self.conn.cursor()
+        try:
+            cur.execute(sql, params)
+            filas = cur.fetchall()
+        finally:
+            cur.close()
+        return list(map(modelo._make, filas)) if modelo else filas
+
+    def _una(self, sql, params=(), modelo=None):
+        cur = self.conn.cursor()
+        try:
+            cur.execute(sql, params)
+            fila = cur.fetchone()
+        finally:
+            cur.close()
+        return modelo._make(fila) if modelo and fila else fila
+
+    def _modificar(self, sql, params=()):
+        """Ejecuta una sentencia de escritura y la confirma; devuelve las filas afectadas"""
+        cur = self.conn.cursor()
+        try:
+            cur.execute(sql, params)
+            filas = cur.rowcount
+            self.conn.commit()
+            return filas
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    # ---------- Disciplinas ----------
+
+    def disciplinas(self, orden='id'):
+        """Todas las disciplinas; orden: 'id', 'id_desc' o 'nombre'"""
+        orden = {'id': 'id', 'id_desc': 'id DESC', 'nombre': 'nombre'}[orden]
+        return self._todas(f"SELECT {COLUMNAS_DISCIPLINA} FROM disciplinas ORDER BY {orden}",
+                           modelo=Disciplina)
+
+    def nombres_disciplinas(self):
+        return self._todas("SELECT id, nombre FROM disciplinas ORDER BY nombre", modelo=NombreDisciplina)
+
+    def disciplina(self, disciplina_id):
+        return self._una(f"SELECT {COLUMNAS_DISCIPLINA} FROM disciplinas WHERE id = %s", [disciplina_id],
+                         modelo=Disciplina)
+
+    def contar_disciplinas_activas(self):
+        return self._una("SELECT COUNT(*) FROM disciplinas WHERE activa = TRUE")[0]
+
+    def agregar_disciplina(self, nombre, descripcion):
+        self._modificar("INSERT INTO disciplinas (nombre, descripcion) VALUES (%s, %s)",
+                        [nombre, descripcion])
+
+    def alternar_disciplina(self, disciplina_id):
+        self._modificar("UPDATE disciplinas SET activa = CASE WHEN activa THEN 0 ELSE 1 END WHERE id = %s",
+                        [disciplina_id])
+
+    def eliminar_disciplina(self, disciplina_id):
+        self._modificar("DELETE FROM disciplinas WHERE id = %s", [disciplina_id])
+
+    # ---------- Horarios ----------
+
+    def horarios(self):
+        """Todos los horarios en orden de la semana"""
+        return self._todas(f"""
+            SELECT {COLUMNAS_HORARIO}
+            FROM horarios
+            ORDER BY {ORDEN_DIA}, hora_inicio
+        """, modelo=Horario)
+
+    def horarios_disciplina(self, disciplina_id):
+        return self._todas(f"""
+            SELECT {COLUMNAS_HORARIO}
+            FROM horarios
+            WHERE disciplina_id = %s
+            ORDER BY {ORDEN_DIA}, hora_inicio
+        """, [disciplina_id], modelo=Horario)
+
+    def cupos_horarios(self):
+        """(id, cupo_maximo) de todos los horarios"""
+        return self._todas("SELECT id, cupo_maximo FROM horarios")
+
+    def cupo_horario(self, horario_id):
+        fila = self._una("SELECT cupo_maximo FROM horarios WHERE id = %s", [horario_id])
+        return fila[0] if fila else None
+
+    def agregar_horario(self, disciplina_id, dia_semana, hora_inicio, cupo_maximo):
+        # Siempre HH:MM:SS, para que ordene y compare igual en los dos motores
+        self._modificar("""
+            INSERT INTO horarios (disciplina_id, dia_semana, hora_inicio, cupo_maximo)
+            VALUES (%s, %s, %s, %s)
+        """, [disciplina_id, dia_semana, plantillas.normalizar_hora(hora_inicio), cupo_maximo])
+
+    def eliminar_horario(self, horario_id):
+        self._modificar("DELETE FROM horarios WHERE id = %s", [horario_id])
+
+    # ---------- Ocupación ----------
+
+    def conteos_ocupacion(self, horario_ids, desde, hasta):
+        """{(horario_id, fecha): reservas no canceladas} de esos horarios en el rango"""
+        filas = self._todas(f"""
+            SELECT horario_id, fecha_clase, COUNT(*)
+            FROM reservas
+            WHERE horario_id IN ({_marcadores(len(horario_ids))})
+              AND fecha_clase BETWEEN %s AND %s
+              AND estado != 'cancelada'
+            GROUP BY horario_id, fecha_clase
+        """, list(horario_ids) + [desde, hasta])
+        return {(horario_id, fecha): cantidad for horario_id, fecha, cantidad in filas}
+
+    def conteos_desde(self, desde):
+        """(horario_id, fecha_clase, reservas no canceladas) desde una fecha.
+
+        Agrupa en el orden de idx_reservas_fecha: sin tabla temporal ni filesort.
+        """
+        return self._todas("""
+            SELECT horario_id, fecha_clase, COUNT(*) FROM reservas
+            WHERE fecha_clase >= %s AND estado != 'cancelada'
+            GROUP BY fecha_clase, horario_id
+        """, [desde])
+
+    def contar_reservas(self, horario_id, fecha_clase):
+        return self._una("""
+            SELECT COUNT(*) FROM reservas
+            WHERE horario_id = %s AND fecha_clase = %s AND estado != 'cancelada'
+        """, [horario_id, fecha_clase])[0]
+
+    # ---------- Reservas ----------
+
+    def admitir_reserva(self, horario_id, fecha_clase, nombre, apellido, dni, comprobante=None):
+        return motor_reservas.admitir_reserva(self.conn, horario_id, fecha_clase,
+                                              nombre, apellido, dni, comprobante)
+
+    def comprobante_en_uso(self, comprobante):
+        """True si alguna reserva (también archivada) referencia el comprobante"""
+        return any(self._una(f"SELECT 1 FROM {tabla} WHERE comprobante_pago = %s LIMIT 1", [comprobante])
+                   for tabla in (CALIENTE, ARCHIVO))
+
+    def _tablas_reservas(self, filtros):
+        """Tablas a leer para los filtros: el archivo solo si el rango llega a él"""
+        cur = self.conn.cursor()
+        try:
+            ultima_archivada = archivado.ultima_fecha(cur)
+        finally:
+            cur.close()
+        if ultima_archivada is None or (filtros.get('desde') and filtros['desde'] > ultima_archivada):
+            return [CALIENTE]
+        return [CALIENTE, ARCHIVO]
+
+    def resumen_reservas(self, filtros):
+        """Totales del conjunto filtrado: {'total', 'proximas', 'confirmadas'}"""
+        resumen = {'total': 0, 'proximas': 0, 'confirmadas': 0}
+        for tabla in self._tablas_reservas(filtros):
+            condiciones, params = condiciones_reservas(filtros)
+            total, proximas, confirmadas = self._una(f"""
+                SELECT COUNT(*),
+                       COALESCE(SUM(r.fecha_clase >= %s), 0),
+                       COALESCE(SUM(r.estado = 'confirmada'), 0)
+                FROM {tabla} r
+                {_where(condiciones)}
+            """, [date.today()] + params)
+            resumen['total'] += total
+            resumen['proximas'] += proximas
+            resumen['confirmadas'] += confirmadas
+        return resumen
+
+    def pagina_reservas(self, filtros, despues, limite):
+        """Reservas filtradas, de la más nueva a la más vieja.
+
+        Paginación por clave: despues es (fecha_clase, 'HH:MM:SS', id) de la
+        última fila de la página anterior, o None para la primera. Con el
+        archivo se pide una página a cada tabla y se mezclan. La disciplina
+        sale de una subconsulta por clave y no de un JOIN, para que el
+        optimizador no empiece por disciplinas y tenga que ordenar aparte.
+        """
+        filas = []
+        tablas = self._tablas_reservas(filtros)
+        for tabla in tablas:
+            condiciones, params = condiciones_reservas(filtros)
+            if despues:
+                fecha_c, hora_c, id_c = despues
+                condiciones.append("""(r.fecha_clase < %s OR (r.fecha_clase = %s AND
+                    (r.hora_inicio < %s OR (r.hora_inicio = %s AND r.id < %s))))""")
+                params += [fecha_c, fecha_c, hora_c, hora_c, id_c]
+            filas += self._todas(f"""
+                SELECT r.id, r.nombre, r.apellido, r.dni, r.fecha_clase, r.hora_inicio,
+                       (SELECT d.nombre FROM disciplinas d WHERE d.id = r.disciplina_id) as disciplina,
+                       r.estado, r.comprobante_pago, r.horario_id
+                FROM {tabla} r
+                {_where(condiciones)}
+                ORDER BY r.fecha_clase DESC, r.hora_inicio DESC, r.id DESC
+                LIMIT %s
+            """, params + [limite], modelo=ReservaListado)
+        if len(tablas) > 1:
+            filas.sort(key=lambda fila: (fila.fecha_clase, fila.hora_inicio, fila.id), reverse=True)
+            del filas[limite:]
+        return filas
+
+    def filas_exportacion(self, filtros):
+        """Generador de las reservas filtradas para exportar (conexión propia)"""
+        fuentes = []
+        for tabla in self._tablas_reservas(filtros):
+            condiciones, params = condiciones_reservas(filtros)
+            fuentes.append((tabla, condiciones, params))
+        return exportacion.filas_reservas(self.pool, fuentes)
+
+    def eliminar_reserva(self, reserva_id):
+        """Borra la reserva y la descuenta del resumen; devuelve la ReservaBorrada o None"""
+        conn = self.conn
+        cur = conn.cursor()
+        try:
+            conn.begin()
+            reserva = None
+            for tabla in (CALIENTE, ARCHIVO):
+                cur.execute(f"SELECT horario_id, fecha_clase, estado FROM {tabla} WHERE id = %s", [reserva_id])
+                fila = cur.fetchone()
+                if fila:
+                    reserva = ReservaBorrada._make(fila)
+                    cur.execute(f"DELETE FROM {tabla} WHERE id = %s", [reserva_id])
+                    resumenes.registrar(cur, reserva.horario_id, reserva.fecha_clase, reserva.estado, -1)
+                    break
+            conn.commit()
+            return reserva
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    def cambiar_estado_reservas(self, seleccion, estado):
+        """Estado de varias reservas en una transacción; ver lotes.py"""
+        return lotes.cambiar_estado(self.conn, seleccion, estado)
+
+    def eliminar_reservas(self, seleccion):
+        return lotes.eliminar(self.conn, seleccion)
+
+    # ---------- Resúmenes ----------
+
+    def total_por_estado(self, estado):
+        cur = self.conn.cursor()
+        try:
+            return resumenes.total_por_estado(cur, estado)
+        finally:
+            cur.close()
+
+    def panel_ocupacion(self, desde, hasta):
+        cur = self.conn.cursor()
+        try:
+            return resumenes.panel_ocupacion(cur, desde, hasta, list(DIAS_SEMANA))
+        finally:
+            cur.close()
+
+    def reconstruir_resumen(self):
+        return resumenes.reconstruir(self.conn)
+
+    def archivar_reservas(self, corte, tamano_lote=archivado.TAMANO_LOTE):
+        return archivado.archivar(self.conn, corte, tamano_lote)
+
+    # ---------- Esquema ----------
+
+    def migrar(self, hasta=None):
+        return esquema.aplicar(self.conn, hasta)
+
+    def estado_migraciones(self):
+        return esquema.estado(self.conn)
+
+    def migraciones_pendientes(self):
+        return esquema.pendientes(self.conn)
+
+    # ---------- Importación y plantillas ----------
+
+    def importar_reservas(self, filas, estados):
+        return importacion.importar_reservas(self.conn, filas, estados)
+
+    def importar_horarios(self, filas):
+        return importacion.importar_horarios(self.conn, filas, list(DIAS_SEMANA))
+
+    def horarios_plantilla(self, disciplina_id):
+        """Horarios de una disciplina como (dia, 'HH:MM:SS', cupo) para copiarlos"""
+        cur = self.conn.cursor()
+        try:
+            return plantillas.horarios_de(cur, disciplina_id)
+        finally:
+            cur.close()
+
+    def previsualizar_plantilla(self, disciplina_id, propuestos):
+        cur = self.conn.cursor()
+        try:
+            return plantillas.previsualizar(cur, disciplina_id, propuestos, list(DIAS_SEMANA))
+        finally:
+            cur.close()
+
+    def aplicar_plantilla(self, disciplina_id, propuestos):
+        return plantillas.aplicar(self.conn, disciplina_id, propuestos, list(DIAS_SEMANA))
+
+    # ---------- Administradores ----------
+
+    def administrador(self, usuario):
+        return self._una("SELECT id, password_hash FROM administradores WHERE usuario = %s", [usuario],
+                         modelo=Administrador)
+
+    def actualizar_password_hash(self, admin_id, password_hash):
+        self._modificar("UPDATE administradores SET password_hash = %s WHERE id = %s",
+                        [password_hash, admin_id])
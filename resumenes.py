@@ -0,0 +1,142 @@
+"""
+Resúmenes de ocupación para el dashboard.
+
+La tabla `ocupacion_resumen` guarda cuántas reservas hay por
+(horario_id, fecha_clase, estado). Se mantiene de forma incremental desde
+las mismas transacciones que insertan o borran reservas, y el comando
+`flask reconstruir-resumen` la vuelve a calcular desde `reservas`.
+
+El dashboard solo lee una ventana fija de fechas del resumen, así que su
+costo no depende del tamaño del historial.
+"""
+
+from datetime import timedelta
+
+import dialectos
+
+
+def registrar(cur, horario_id, fecha_clase, estado, delta):
+    """Suma delta al resumen de (horario_id, fecha_clase, estado).
+
+    Debe ejecutarse dentro de la transacción que modifica `reservas`.
+    """
+    dialecto = dialectos.de(cur.connection)
+    cur.execute(f"""
+        INSERT INTO ocupacion_resumen (horario_id, fecha_clase, estado, disciplina_id, cantidad)
+        SELECT id, %s, %s, disciplina_id, {dialecto.maximo('%s', '0')} FROM horarios WHERE id = %s
+        {dialecto.upsert('horario_id, fecha_clase, estado',
+                         'cantidad = ' + dialecto.maximo('cantidad + %s', '0'))}
+    """, [fecha_clase, estado, delta, horario_id, delta])
+
+
+def reconstruir(conn):
+    """Recalcula todo el resumen desde las reservas (incluidas las archivadas)"""
+    cur = conn.cursor()
+    try:
+        conn.begin()
+        cur.execute("DELETE FROM ocupacion_resumen")
+        cur.execute("""
+            INSERT INTO ocupacion_resumen (horario_id, fecha_clase, estado, disciplina_id, cantidad)
+            SELECT r.horario_id, r.fecha_clase, r.estado, h.disciplina_id, COUNT(*)
+            FROM (
+                SELECT horario_id, fecha_clase, estado FROM reservas
+                UNION ALL
+                SELECT horario_id, fecha_clase, estado FROM reservas_archivo
+            ) r
+            JOIN horarios h ON r.horario_id = h.id
+            GROUP BY r.horario_id, r.fecha_clase, r.estado, h.disciplina_id
+        """)
+        filas = cur.rowcount
+        conn.commit()
+        return filas
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def total_por_estado(cur, estado):
+    cur.execute("SELECT COALESCE(SUM(cantidad), 0) FROM ocupacion_resumen WHERE estado = %s", [estado])
+    return cur.fetchone()[0]
+
+
+def panel_ocupacion(cur, desde, hasta, dias_semana):
+    """Indicadores de ocupación entre desde y hasta (inclusive).
+
+    Devuelve un dict con:
+      disciplinas: [(nombre, reservas, capacidad, porcentaje)]
+      mapa_calor: {'horas': [...], 'filas': [(dia, [porcentaje o None por hora])]}
+      semanas: [(lunes, confirmadas, pendientes, canceladas, porcentaje_cancelacion)]
+    La capacidad de cada horario es cupo_maximo por cada vez que se dictó en el rango.
+    """
+    cur.execute("""
+        SELECT h.id, h.dia_semana, h.hora_inicio, h.cupo_maximo, d.nombre
+        FROM horarios h
+        JOIN disciplinas d ON h.disciplina_id = d.id
+    """)
+    horarios = cur.fetchall()
+
+    cur.execute("""
+        SELECT horario_id, fecha_clase, estado, cantidad
+        FROM ocupacion_resumen
+        WHERE fecha_clase BETWEEN %s AND %s
+    """, [desde, hasta])
+    resumen = cur.fetchall()
+
+    # Cantidad de veces que cae cada día de la semana en el rango
+    ocurrencias = [0] * 7
+    for offset in range((hasta - desde).days + 1):
+        ocurrencias[(desde + timedelta(days=offset)).weekday()] += 1
+
+    ocupados = {}
+    semanas = {}
+    for horario_id, fecha_clase, estado, cantidad in resumen:
+        if estado != 'cancelada':
+            ocupados[horario_id] = ocupados.get(horario_id, 0) + cantidad
+        lunes = fecha_clase - timedelta(days=fecha_clase.weekday())
+        semana = semanas.setdefault(lunes, {'confirmada': 0, 'pendiente': 0, 'cancelada': 0})
+        semana[estado] += cantidad
+
+    por_disciplina = {}
+    por_celda = {}
+    for horario_id, dia_semana, hora_inicio, cupo_maximo, disciplina in horarios:
+        dia = dias_semana.index(dia_semana)
+        capacidad = cupo_maximo * ocurrencias[dia]
+        reservas = ocupados.get(horario_id, 0)
+        hora = hora_inicio.hour
+
+        acumulado = por_disciplina.setdefault(disciplina, [0, 0])
+        acumulado[0] += reservas
+        acumulado[1] += capacidad
+
+        celda = por_celda.setdefault((dia, hora), [0, 0])
+        celda[0] += reservas
+        celda[1] += capacidad
+
+    def porcentaje(parte, total):
+        return round(100.0 * parte / total, 1) if total else None
+
+    horas = sorted({hora for _, hora in por_celda})
+    mapa_calor = {
+        'horas': horas,
+        'filas': [
+            (dias_semana[dia], [porcentaje(*por_celda[(dia, hora)]) if (dia, hora) in por_celda else None
+                                for hora in horas])
+            for dia in range(7)
+            if any((dia, hora) in por_celda for hora in horas)
+        ],
+    }
+
+    return {
+        'disciplinas': sorted(
+            [(nombre, reservas, capacidad, porcentaje(reservas, capacidad))
+             for nombre, (reservas, capacidad) in por_disciplina.items()],
+            key=lambda fila: fila[3] or 0, reverse=True),
+        'mapa_calor': mapa_calor,
+        'semanas': [
+            (lunes, s['confirmada'], s['pendiente'], s['cancelada'],
+             porcentaje(s['cancelada'], s['confirmada'] + s['pendiente'] + s['cancelada']))
+            for lunes, s in sorted(semanas.items())
+        ],
+    }
@@ -0,0 +1,114 @@
+"""
+Admisión concurrente de reservas sobre el backend SQLite (sin servidor).
+
+Muchos hilos, cada uno con su conexión, piden lugar en la misma clase a la
+vez: el cupo nunca se excede y se confirman exactamente cupo_maximo reservas.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from datetime import date, timedelta
+
+import esquema
+import motor_reservas
+from backend_sqlite import ConexionSQLite, inicializar
+
+CUPO = 5
+PEDIDOS = 40
+
+
+class AdmisionConcurrenteTest(unittest.TestCase):
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        self.path = os.path.join(self.carpeta, 'reservas.db')
+        conn = ConexionSQLite(self.path)
+        inicializar(conn)
+        esquema.aplicar(conn)
+        cur = conn.cursor()
+        cur.execute("SELECT MIN(id) FROM horarios")
+        self.horario_id = cur.fetchone()[0]
+        conn.begin()
+        cur.execute("UPDATE horarios SET cupo_maximo = %s WHERE id = %s", [CUPO, self.horario_id])
+        conn.commit()
+        cur.close()
+        conn.close()
+        self.fecha_clase = date.today() + timedelta(days=30)
+
+    def tearDown(self):
+        shutil.rmtree(self.carpeta)
+
+    def _contar(self, conn, condicion):
+        cur = conn.cursor()
+        cur.execute(f"SELECT COUNT(*) FROM reservas WHERE horario_id = %s AND fecha_clase = %s AND {condicion}",
+                    [self.horario_id, self.fecha_clase])
+        cantidad = cur.fetchone()[0]
+        cur.close()
+        return cantidad
+
+    def test_cupo_no_se_excede(self):
+        largada = threading.Barrier(PEDIDOS)
+        resultados = []
+        errores = []
+
+        def reservar(numero):
+            conn = ConexionSQLite(self.path, timeout=30)
+            try:
+                largada.wait()
+                resultado = motor_reservas.admitir_reserva(conn, self.horario_id, self.fecha_clase,
+                                                           'Prueba', f'Hilo {numero}', f'{30000000 + numero}')
+                resultados.append(resultado.estado)
+            except Exception as e:
+                errores.append(e)
+            finally:
+                conn.close()
+
+        hilos = [threading.Thread(target=reservar, args=(numero,)) for numero in range(PEDIDOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        conn = ConexionSQLite(self.path)
+        try:
+            activas = self._contar(conn, "estado != 'cancelada'")
+            self.assertLessEqual(activas, CUPO)
+            self.assertEqual(activas, CUPO)
+            self.assertEqual(resultados.count(motor_reservas.CONFIRMADA), CUPO)
+            self.assertEqual(resultados.count(motor_reservas.COMPLETA), PEDIDOS - CUPO)
+        finally:
+            conn.close()
+
+    def test_dni_repetido_entra_una_vez(self):
+        largada = threading.Barrier(10)
+        resultados = []
+
+        def reservar():
+            conn = ConexionSQLite(self.path, timeout=30)
+            try:
+                largada.wait()
+                resultados.append(motor_reservas.admitir_reserva(
+                    conn, self.horario_id, self.fecha_clase, 'Prueba', 'Repetida', '40000000').estado)
+            finally:
+                conn.close()
+
+        hilos = [threading.Thread(target=reservar) for _ in range(10)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(resultados.count(motor_reservas.CONFIRMADA), 1)
+        self.assertEqual(resultados.count(motor_reservas.DUPLICADA), 9)
+        conn = ConexionSQLite(self.path)
+        try:
+            self.assertEqual(self._contar(conn, "dni = '40000000'"), 1)
+        finally:
+            conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()